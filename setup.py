@@ -12,7 +12,7 @@ setup(
         author_email='karol.marcjan@gmail.com',
 
         install_requires=[
-            'pyglet>=1.1,<2',
+            'pyglet>=1.4,<2',
             'numpy>=1.8',
             'scipy==0.14'],
 
@@ -0,0 +1,10 @@
+# -*- coding: utf-8 -*-
+
+import sys
+
+from silica.bench.suite import main
+
+
+if __name__ == '__main__':
+
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,277 @@
+# -*- coding: utf-8 -*-
+
+__all__ = ['STAGES', 'run_stage', 'main']
+
+import os
+import sys
+import json
+import timeit
+import resource
+
+import pyglet
+
+
+# None of the stages draws anything. The one that needs OpenGL creates an
+# offscreen context of it's own, so that no display is needed.
+pyglet.options['shadow_window'] = False
+pyglet.options['headless'] = True
+
+
+from silica.viz.common.config import BaseConfig
+from silica.viz.common.constants import *
+from silica.viz.common import shaders
+from silica.viz.common.grid.load import GridCubeLoader
+from silica.viz.common.grid.surface import SurfaceDataGenerator
+from silica.viz.common.transform.dicts import common_transforms
+from silica.viz.common.camera import cam_transforms
+from silica.viz.glass import animation
+from silica.viz.glass.mesh import Sizer, ValueEqual
+
+
+UPLOAD_SOURCES = {
+    'v': '''#version 120
+
+attribute vec3 position;
+attribute vec3 normal;
+
+varying vec3 f_normal;
+
+void main(void) {
+
+	f_normal = normal;
+	gl_Position = vec4(position, 1.0);
+}
+''',
+    'f': '''#version 120
+
+varying vec3 f_normal;
+
+void main(void) {
+
+	gl_FragColor = vec4(f_normal, 1.0);
+}
+'''}
+
+# The window size the transform chain is set up for
+VIEWPORT = 800, 600
+
+
+def best_time(function, repeat):
+    """best_time(function, repeat) -> seconds, result
+
+    Calls the function repeat times and returns the shortest time a call took,
+    along with the result of the last call.
+    """
+
+    best = None
+
+    for __ in range(repeat):
+
+        start = timeit.default_timer()
+        result = function()
+        seconds = timeit.default_timer() - start
+
+        if best is None or seconds < best:
+            best = seconds
+
+    return best, result
+
+
+def load_grid(params):
+    """load_grid(params) -> grid, cubes
+
+    Loads the grid file the stage parameters name.
+    """
+
+    size = params['size']
+
+    with open(params['grid_file']) as input_file:
+
+        return GridCubeLoader(
+            input_file, ValueEqual(1), Sizer((size, ) * 3)).load()
+
+
+def triangle_count(positions):
+    """triangle_count(positions) -> number of triangles with the positions"""
+
+    return positions.size // (VERTICES_PER_TRIANGLE * COORDINATES_PER_VERTEX)
+
+
+def grid_load(params):
+    """grid_load(params) -> seconds, throughput
+
+    Loading a glass file.
+    """
+
+    seconds, __ = best_time(lambda: load_grid(params), params['repeat'])
+
+    return seconds, {'cells_per_s': params['size'] ** 3 / seconds}
+
+
+def meshing(params):
+    """meshing(params) -> seconds, throughput
+
+    Finding the visible glass surface.
+    """
+
+    generator = SurfaceDataGenerator(*load_grid(params))
+
+    seconds, (positions, __) = best_time(
+        generator.positions_and_normals, params['repeat'])
+
+    return seconds, {
+        'cells_per_s': params['size'] ** 3 / seconds,
+        'triangles_per_s': triangle_count(positions) / seconds}
+
+
+def upload(params):
+    """upload(params) -> seconds, throughput
+
+    Handing the glass surface over to OpenGL.
+    """
+
+    generator = SurfaceDataGenerator(*load_grid(params))
+    positions, normals = generator.positions_and_normals()
+
+    window = pyglet.window.Window(visible=False)
+
+    program = shaders.Program('bench', sources=UPLOAD_SOURCES)
+
+    for name in 'position', 'normal':
+
+        program.attribute(
+            name, shaders.GLSLType(shaders.GLSLType.Vector(3)))
+
+    triangles = program.triangle_list(
+        positions.shape[0] * TRIANGLES_PER_SQUARE)
+
+    seconds, __ = best_time(
+        lambda: triangles.from_arrays(
+            {'position': positions, 'normal': normals}),
+        params['repeat'])
+
+    window.close()
+
+    return seconds, {'triangles_per_s': triangle_count(positions) / seconds}
+
+
+def decode_animation(filename):
+    """decode_animation(filename) -> frame count
+
+    Opens a particle animation file, as if for the first time, and decodes all
+    of it's frames.
+    """
+
+    index_name = filename + animation.INDEX_SUFFIX
+
+    if os.path.exists(index_name):
+        os.remove(index_name)
+
+    frames = animation.animation_from_file(filename, cache_size=1, prefetch=0)
+
+    for frame_no in range(frames.frame_count()):
+        frames.frame(frame_no)
+
+    return frames.frame_count()
+
+
+def animation_decoding(params):
+    """animation_decoding(params) -> seconds, throughput
+
+    Opening and decoding a whole particle animation.
+    """
+
+    seconds, frame_count = best_time(
+        lambda: decode_animation(params['animation_file']), params['repeat'])
+
+    return seconds, {
+        'frames_per_s': frame_count / seconds,
+        'states_per_s': frame_count * params['particles'] / seconds}
+
+
+class FixedSize(object):
+
+    """Stands in for a window of the given size."""
+
+    def __init__(self, width, height):
+
+        self.__size = width, height
+
+    def get_size(self):
+
+        return self.__size
+
+
+def camera_updates(params):
+    """camera_updates(params) -> seconds, throughput
+
+    Recalculating the camera transform chain after the camera turns.
+    """
+
+    config = BaseConfig(None)
+
+    transforms = {}
+    common_transforms(transforms, config, FixedSize(*VIEWPORT))
+    cam_transforms(transforms, config)
+
+    rot, camera = transforms['rot'], transforms['camera']
+    horiz, up, forward = config.init_rot_basis()
+
+    def update():
+
+        rot.set_basis(horiz, up, forward)
+
+        for __ in range(params['updates']):
+
+            rot.rotate(up, 0.01)
+
+            camera.gl_matrix()
+
+    seconds, __ = best_time(update, params['repeat'])
+
+    return seconds, {'matrices_per_s': params['updates'] / seconds}
+
+
+STAGES = {
+    'grid_load': grid_load,
+    'meshing': meshing,
+    'upload': upload,
+    'animation': animation_decoding,
+    'transforms': camera_updates,
+}
+
+
+def run_stage(name, params):
+    """run_stage(name, params) -> result dict
+
+    Runs the named stage with the parameters and measures it. The peak memory
+    use is that of the whole process, so each stage should run in a process
+    of it's own.
+    """
+
+    seconds, throughput = STAGES[name](params)
+
+    # Kilobytes on Linux
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    return {
+        'seconds': seconds,
+        'peak_rss_mb': peak / 1024.,
+        'throughput': throughput}
+
+
+def main(argv):
+    """main(argv)
+
+    Runs the stage named by the first argument, with the JSON encoded
+    parameters given by the second, and prints the JSON encoded result.
+    """
+
+    name, params = argv[0], json.loads(argv[1])
+
+    json.dump(run_stage(name, params), sys.stdout)
+
+
+if __name__ == '__main__':
+
+    main(sys.argv[1:])
@@ -0,0 +1,326 @@
+# -*- coding: utf-8 -*-
+
+__all__ = ['benchmark_cases', 'run_suite', 'regressions', 'main']
+
+import os
+import sys
+import json
+import shutil
+import argparse
+import tempfile
+import subprocess
+
+from silica.bench import synthetic
+
+
+GRID_STAGES = ['grid_load', 'meshing', 'upload']
+
+DEFAULT_STAGES = GRID_STAGES + ['animation', 'transforms']
+DEFAULT_SIZES = [32, 64, 128, 256, 512]
+DEFAULT_POROSITIES = [0.2, 0.5, 0.8]
+DEFAULT_PARTICLES = [100, 1000, 10000]
+DEFAULT_FRAMES = 100
+DEFAULT_UPDATES = 10000
+DEFAULT_REPEAT = 3
+DEFAULT_THRESHOLD = 0.1
+
+# Measurements compared against the baseline -- lower is better for all
+COMPARED = ['seconds', 'peak_rss_mb']
+
+
+def case_name(params):
+    """case_name(params) -> str
+
+    Identifies a benchmark case by it's parameters, so that it can be found
+    in the baseline.
+    """
+
+    return ' '.join(
+        '%s=%s' % (key, params[key]) for key in sorted(params))
+
+
+def benchmark_cases(args):
+    """benchmark_cases(args) -> list of (stage, params) tuples
+
+    The cases to run for the parsed command line options. The data files the
+    stages need are not named in the parameters yet.
+    """
+
+    cases = []
+
+    for size in args.sizes:
+        for porosity in args.porosities:
+            for stage in GRID_STAGES:
+
+                if stage in args.stages:
+
+                    cases.append(
+                        (stage, {'size': size, 'porosity': porosity}))
+
+    if 'animation' in args.stages:
+
+        for particles in args.particles:
+
+            cases.append(
+                ('animation', {'particles': particles, 'frames': args.frames}))
+
+    if 'transforms' in args.stages:
+
+        cases.append(('transforms', {'updates': args.updates}))
+
+    return cases
+
+
+def data_file(directory, params, seed):
+    """data_file(directory, params, seed) -> filename
+
+    The synthetic input file for a case with the parameters, written into the
+    directory the first time it is needed.
+    """
+
+    if 'size' in params:
+
+        filename = os.path.join(
+            directory, 'grid-%(size)d-%(porosity)s.dat' % params)
+
+        if not os.path.exists(filename):
+
+            with open(filename, 'w') as output_file:
+
+                synthetic.write_grid(output_file, synthetic.porous_slabs(
+                    params['size'], params['porosity'], seed))
+
+        return filename
+
+    if 'particles' in params:
+
+        filename = os.path.join(
+            directory, 'particles-%(particles)d-%(frames)d.sim' % params)
+
+        if not os.path.exists(filename):
+
+            with open(filename, 'w') as output_file:
+
+                synthetic.write_animation(
+                    output_file, params['particles'],
+                    synthetic.particle_frames(
+                        params['particles'], params['frames'], seed=seed))
+
+        return filename
+
+    return None
+
+
+def run_case(stage, params, directory, args):
+    """run_case(stage, params, directory, args) -> result dict
+
+    Runs a benchmark case in a fresh process, so that it's peak memory use
+    can be measured.
+    """
+
+    stage_params = dict(params, repeat=args.repeat)
+
+    filename = data_file(directory, params, args.seed)
+
+    if 'size' in params:
+        stage_params['grid_file'] = filename
+
+    elif 'particles' in params:
+        stage_params['animation_file'] = filename
+
+    result = {'stage': stage, 'case': case_name(params), 'params': params}
+
+    try:
+
+        output = subprocess.check_output([
+            sys.executable, '-m', 'silica.bench.stages',
+            stage, json.dumps(stage_params)])
+
+    except subprocess.CalledProcessError as err:
+
+        result['error'] = 'exited with status %d' % err.returncode
+        return result
+
+    result.update(json.loads(output))
+
+    return result
+
+
+def run_suite(args):
+    """run_suite(args) -> list of result dicts
+
+    Runs all the benchmark cases for the parsed command line options. The
+    synthetic input data is generated into a temporary directory, removed
+    afterwards.
+    """
+
+    directory = tempfile.mkdtemp(prefix='silica-bench-')
+
+    try:
+
+        results = []
+
+        for stage, params in benchmark_cases(args):
+
+            results.append(run_case(stage, params, directory, args))
+
+            sys.stderr.write('%-10s %-28s %s\n' % (
+                stage, results[-1]['case'],
+                results[-1].get('error') or
+                '%.3f s' % results[-1]['seconds']))
+
+        return results
+
+    finally:
+
+        shutil.rmtree(directory)
+
+
+def regressions(results, baseline, threshold):
+    """regressions(results, baseline, threshold) -> list of dicts
+
+    The measurements that got worse than in the baseline results by more than
+    the threshold (a fraction of the baseline value).
+    """
+
+    known = dict(
+        ((result['stage'], result['case']), result) for result in baseline)
+
+    found = []
+
+    for result in results:
+
+        base = known.get((result['stage'], result['case']))
+
+        if base is None:
+
+            continue
+
+        for measurement in COMPARED:
+
+            if measurement not in result or measurement not in base or \
+                    not base[measurement]:
+
+                continue
+
+            change = result[measurement] / base[measurement] - 1
+
+            if change > threshold:
+
+                found.append({
+                    'stage': result['stage'],
+                    'case': result['case'],
+                    'measurement': measurement,
+                    'baseline': base[measurement],
+                    'value': result[measurement],
+                    'change': change})
+
+    return found
+
+
+class ArgsParser(argparse.ArgumentParser):
+
+    """Argument parser for the benchmark suite."""
+
+    def __init__(self):
+
+        super(ArgsParser, self).__init__(
+            description=''.join([
+                'benchmark loading glass and particle files, meshing the',
+                ' glass and setting up the camera on synthetic data']))
+
+        self.add_argument(
+            '--stages',
+            help='stages to benchmark',
+            nargs='+', choices=DEFAULT_STAGES, default=DEFAULT_STAGES)
+
+        self.add_argument(
+            '--sizes',
+            help='edge lengths of the synthetic glass grids',
+            nargs='+', type=int, default=DEFAULT_SIZES)
+
+        self.add_argument(
+            '--porosities',
+            help='fractions of empty cells in the synthetic glass grids',
+            nargs='+', type=float, default=DEFAULT_POROSITIES)
+
+        self.add_argument(
+            '--particles',
+            help='particle counts of the synthetic particle animations',
+            nargs='+', type=int, default=DEFAULT_PARTICLES)
+
+        self.add_argument(
+            '--frames',
+            help='frame count of the synthetic particle animations',
+            type=int, default=DEFAULT_FRAMES)
+
+        self.add_argument(
+            '--updates',
+            help='number of camera updates to time',
+            type=int, default=DEFAULT_UPDATES)
+
+        self.add_argument(
+            '--repeat',
+            help='number of times to run each case -- the fastest run counts',
+            type=int, default=DEFAULT_REPEAT)
+
+        self.add_argument(
+            '--seed',
+            help='seed of the synthetic data',
+            type=int, default=synthetic.DEFAULT_SEED)
+
+        self.add_argument(
+            '-o', '--output',
+            help='file to write the JSON report into, instead of stdout',
+            default=None)
+
+        self.add_argument(
+            '-b', '--baseline',
+            help='JSON report of an earlier run to compare against',
+            default=None)
+
+        self.add_argument(
+            '-t', '--threshold',
+            help=''.join([
+                'fraction by which a measurement may exceed the baseline',
+                ' before it counts as a regression']),
+            type=float, default=DEFAULT_THRESHOLD)
+
+
+def main(argv):
+    """main(argv) -> exit status
+
+    Runs the benchmark suite with the given command line arguments. The exit
+    status is 1 when regressions were found.
+    """
+
+    args = ArgsParser().parse_args(argv)
+
+    report = {'results': run_suite(args)}
+
+    if args.baseline is not None:
+
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)['results']
+
+        report['regressions'] = regressions(
+            report['results'], baseline, args.threshold)
+
+        for regression in report['regressions']:
+
+            sys.stderr.write(
+                'Regression: %(stage)s %(case)s %(measurement)s'
+                ' %(baseline).3f -> %(value).3f (%(change)+.0f%%)\n' % dict(
+                    regression, change=100 * regression['change']))
+
+    if args.output is None:
+
+        json.dump(report, sys.stdout, indent=2, sort_keys=True)
+        sys.stdout.write('\n')
+
+    else:
+
+        with open(args.output, 'w') as output_file:
+            json.dump(report, output_file, indent=2, sort_keys=True)
+
+    return 1 if report.get('regressions') else 0
@@ -0,0 +1,314 @@
+# -*- coding: utf-8 -*-
+
+__all__ = [
+    'porous_slabs', 'porous_grid', 'write_grid',
+    'smooth_potential_slabs', 'write_potential',
+    'particle_frames', 'write_animation', 'write_trajectory', 'main']
+
+import sys
+import math
+import argparse
+
+import numpy
+
+from silica.viz.glass.trajectory import TrajectoryWriter
+
+
+DEFAULT_SEED = 0
+DEFAULT_MODES = 8
+DEFAULT_BOX_SIZE = 50.
+
+# Lines are formatted this many at a time
+WRITE_CHUNK_SIZE = 1 << 18
+
+GRID_LINE = '%d %d %d 1\n'
+POTENTIAL_LINE = '%d %d %d %.6g\n'
+STATE_LINE = '%.6f %.6f %.6f %.6f %.6f %.6f\n'
+
+# The highest spatial frequency of the potential, in periods per grid edge
+MAX_WAVE_NUMBER = 3
+
+# How far the particles wobble around their drift, relative to the box size,
+# and the range of their angular frequencies, in radians per frame
+WOBBLE = 0.05
+MIN_FREQUENCY, MAX_FREQUENCY = 0.01, 0.1
+
+
+def porous_slabs(size, porosity, seed=DEFAULT_SEED):
+    """porous_slabs(size, porosity, seed=DEFAULT_SEED) -> iterator of arrays
+
+    The slabs (at increasing x) of a cubical grid with the given edge length,
+    as boolean arrays of shape (size, size). Each cell is independently left
+    empty with probability porosity, True marks glass. The grid only depends
+    on the seed, so it is the same however it's slabs are consumed.
+    """
+
+    random = numpy.random.RandomState(seed)
+
+    for __ in range(size):
+
+        yield random.random_sample((size, size)) >= porosity
+
+
+def porous_grid(size, porosity, seed=DEFAULT_SEED):
+    """porous_grid(size, porosity, seed=DEFAULT_SEED) -> boolean array
+
+    The whole grid of porous_slabs, with the shape (size, size, size).
+    """
+
+    grid = numpy.empty((size, size, size), dtype=bool)
+
+    for x, slab in enumerate(porous_slabs(size, porosity, seed)):
+        grid[x] = slab
+
+    return grid
+
+
+def write_lines(output_file, line_format, rows):
+    """write_lines(output_file, line_format, rows)
+
+    Writes a line per row of a 2D array, formatted with the line format.
+    Whole chunks of lines are formatted at once, which is much faster than
+    going line by line.
+    """
+
+    for start in range(0, len(rows), WRITE_CHUNK_SIZE):
+
+        chunk = rows[start:start + WRITE_CHUNK_SIZE]
+
+        output_file.write(
+            (line_format * len(chunk)) % tuple(chunk.ravel().tolist()))
+
+
+def slab_rows(x, *columns):
+    """slab_rows(x, *columns) -> array
+
+    Rows starting with the slab's x coordinate, followed by the columns.
+    """
+
+    return numpy.column_stack(
+        (numpy.repeat(x, len(columns[0])), ) + columns)
+
+
+def write_grid(output_file, slabs):
+    """write_grid(output_file, slabs)
+
+    Writes the glass cells of a grid as a glass file. The grid is given as an
+    iterable of boolean slabs at increasing x -- a 3D array will do.
+    """
+
+    for x, slab in enumerate(slabs):
+
+        write_lines(output_file, GRID_LINE, slab_rows(x, numpy.argwhere(slab)))
+
+
+def smooth_potential_slabs(size, modes=DEFAULT_MODES, seed=DEFAULT_SEED):
+    """smooth_potential_slabs(size, modes=DEFAULT_MODES, seed=DEFAULT_SEED) -> iterator of arrays
+
+    The slabs (at increasing x) of a smooth, periodic potential on a cubical
+    grid with the given edge length, as arrays of shape (size, size). The
+    potential is a sum of the given number of plane waves with random
+    directions, phases and amplitudes, ranging roughly from -1 to 1.
+    """
+
+    random = numpy.random.RandomState(seed)
+
+    wave_numbers = random.randint(
+        -MAX_WAVE_NUMBER, MAX_WAVE_NUMBER + 1, (modes, 3))
+    phases = random.uniform(0, 2 * math.pi, modes)
+    amplitudes = random.standard_normal(modes) / math.sqrt(modes)
+
+    y, z = numpy.mgrid[:size, :size]
+    k = 2 * math.pi / size * wave_numbers
+
+    # The part of the waves' phases not depending on x
+    yz_phases = phases[:, None, None] + \
+        k[:, 1, None, None] * y + k[:, 2, None, None] * z
+
+    for x in range(size):
+
+        yield numpy.tensordot(
+            amplitudes, numpy.cos(yz_phases + k[:, 0, None, None] * x), 1)
+
+
+def write_potential(output_file, size, slabs):
+    """write_potential(output_file, size, slabs)
+
+    Writes a cubical potential grid with the given edge length as a potential
+    file. The potential is given as an iterable of slabs at increasing x.
+    """
+
+    output_file.write('%d %d %d\n' % (size, size, size))
+
+    y, z = numpy.mgrid[:size, :size]
+    y, z = y.ravel(), z.ravel()
+
+    for x, slab in enumerate(slabs):
+
+        write_lines(
+            output_file, POTENTIAL_LINE, slab_rows(x, y, z, slab.ravel()))
+
+
+def particle_frames(particle_count, frame_count,
+                    box_size=DEFAULT_BOX_SIZE, seed=DEFAULT_SEED):
+    """particle_frames(particle_count, frame_count, box_size=DEFAULT_BOX_SIZE, seed=DEFAULT_SEED) -> iterator of arrays
+
+    The frames of a smooth particle animation, as arrays of shape
+    (particle_count, 6) holding positions and unit magnetic moments, like the
+    lines of particle animation files. The particles start spread over a cube
+    of the given edge length, drift slowly and wobble around their drift,
+    while their moments spin around random axes.
+    """
+
+    random = numpy.random.RandomState(seed)
+    shape = particle_count, 3
+
+    start = box_size * random.random_sample(shape)
+    drift = box_size / max(frame_count, 1) * random.standard_normal(shape)
+    wobble = WOBBLE * box_size * random.standard_normal(shape)
+    frequencies = random.uniform(MIN_FREQUENCY, MAX_FREQUENCY, shape)
+    phases = random.uniform(0, 2 * math.pi, shape)
+
+    # Each moment spins in the plane spanned by two orthonormal vectors
+    u = random.standard_normal(shape)
+    u /= numpy.sqrt((u ** 2).sum(axis=1))[:, None]
+
+    w = numpy.cross(u, random.standard_normal(shape))
+    w /= numpy.sqrt((w ** 2).sum(axis=1))[:, None]
+
+    spins = random.uniform(MIN_FREQUENCY, MAX_FREQUENCY, particle_count)
+
+    for frame_no in range(frame_count):
+
+        positions = start + drift * frame_no + \
+            wobble * numpy.sin(frequencies * frame_no + phases)
+
+        angles = (spins * frame_no)[:, None]
+        moments = numpy.cos(angles) * u + numpy.sin(angles) * w
+
+        yield numpy.hstack([positions, moments])
+
+
+def write_animation(output_file, particle_count, frames):
+    """write_animation(output_file, particle_count, frames)
+
+    Writes the frames of particle states as a particle animation text file.
+    """
+
+    output_file.write('%d\n' % particle_count)
+
+    for states in frames:
+
+        write_lines(output_file, STATE_LINE, states)
+
+
+def write_trajectory(filename, particle_count, frames, dtype=numpy.float32):
+    """write_trajectory(filename, particle_count, frames, dtype=numpy.float32)
+
+    Writes the frames of particle states as a trajectory file.
+    """
+
+    with TrajectoryWriter(filename, particle_count, dtype) as writer:
+
+        for states in frames:
+
+            writer.write_frame(states)
+
+
+def main(argv):
+    """main(argv)
+
+    Runs the generator with the given command line arguments.
+    """
+
+    parser = argparse.ArgumentParser(
+        description='generate synthetic glass, potential and particle files')
+
+    parser.add_argument(
+        '--seed',
+        help='seed of the random numbers -- equal seeds give equal files',
+        type=int, default=DEFAULT_SEED)
+
+    commands = parser.add_subparsers(dest='command')
+
+    glass = commands.add_parser(
+        'glass', help='porous glass grid as a glass file')
+
+    glass.add_argument('size', help='edge length of the grid', type=int)
+
+    glass.add_argument(
+        'porosity', help='fraction of empty cells', type=float)
+
+    glass.add_argument('destination', help='glass file to write')
+
+    potential = commands.add_parser(
+        'potential', help='smooth potential as a potential file')
+
+    potential.add_argument('size', help='edge length of the grid', type=int)
+
+    potential.add_argument('destination', help='potential file to write')
+
+    potential.add_argument(
+        '-m', '--modes',
+        help='number of plane waves the potential is made of',
+        type=int, default=DEFAULT_MODES)
+
+    particles = commands.add_parser(
+        'particles', help='particle animation')
+
+    particles.add_argument('particles', help='particle count', type=int)
+
+    particles.add_argument('frames', help='frame count', type=int)
+
+    particles.add_argument('destination', help='animation file to write')
+
+    particles.add_argument(
+        '-b', '--box-size',
+        help='edge length of the cube the particles start in',
+        type=float, default=DEFAULT_BOX_SIZE)
+
+    particles.add_argument(
+        '-f', '--format',
+        help='write a particle animation text file or a trajectory file',
+        choices=['text', 'trajectory'], default='text')
+
+    particles.add_argument(
+        '-d', '--dtype',
+        help='type of the numbers stored in a trajectory file',
+        choices=['float32', 'float64'], default='float32')
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'glass':
+
+        with open(args.destination, 'w') as output_file:
+
+            write_grid(output_file, porous_slabs(
+                args.size, args.porosity, args.seed))
+
+    elif args.command == 'potential':
+
+        with open(args.destination, 'w') as output_file:
+
+            write_potential(output_file, args.size, smooth_potential_slabs(
+                args.size, args.modes, args.seed))
+
+    else:
+
+        frames = particle_frames(
+            args.particles, args.frames, args.box_size, args.seed)
+
+        if args.format == 'text':
+
+            with open(args.destination, 'w') as output_file:
+                write_animation(output_file, args.particles, frames)
+
+        else:
+
+            write_trajectory(
+                args.destination, args.particles, frames, args.dtype)
+
+
+if __name__ == '__main__':
+
+    main(sys.argv[1:])
@@ -208,8 +208,7 @@ class Axes(object):
 
         with self.__triangles as triangles:
 
-            self.__camera.clear()
-            self.__camera.add(*self.__total_transform.gl_matrix())
+            self.__camera.load(self.__total_transform.gl_matrix())
             self.__camera.set()
 
             if not self.__sun.filled():
@@ -3,16 +3,13 @@
 __all__ = ['Cameraman', 'cam_transforms']
 
 
-import math
-
-import numpy
 from pyglet import gl
 from pyglet import clock
 from pyglet.window import mouse
 from pyglet.window import key
 
 from silica.viz.common import transform
-from silica.viz.common.constants import X_AXIS, Y_AXIS, Z_AXIS
+from silica.viz.common import vector
 
 
 def cam_transforms(transforms, config):
@@ -56,12 +53,11 @@ class Cameraman(object):
         self.__config = config
         self.__keys = keys
 
-        clock.schedule(self.tick)
+        self.__ticking = False
 
         self.__aspect = transforms['aspect']
         self.__look_at = transforms['look_at']
 
-        self.__sr = transforms['sr']
         self.__scale = transforms['scale']
 
         self.__rot = transforms['rot']
@@ -71,11 +67,27 @@ class Cameraman(object):
     def tick(self, dt):
         """C.tick(dt)
 
-        Perform operations in need of being done at short time intervals.
+        Perform operations in need of being done at short time intervals. The
+        tick is only scheduled while the keys moving the camera are held down.
         """
 
         self.move_along_sight_line(dt)
-        self.center()
+
+        if not (self.__keys[key.UP] or self.__keys[key.DOWN]):
+
+            clock.unschedule(self.tick)
+            self.__ticking = False
+
+    def on_key_press(self, symbol, modifiers):
+
+        if symbol == key.C:
+
+            self.center()
+
+        elif symbol in (key.UP, key.DOWN) and not self.__ticking:
+
+            clock.schedule_interval(self.tick, 1. / self.__config.max_fps())
+            self.__ticking = True
 
     def center(self):
         """C.center()
@@ -83,11 +95,9 @@ class Cameraman(object):
         Center the camera on the glass.
         """
 
-        if self.__keys[key.C]:
-
-            self.__shift.set_r(*self.__config.center_point())
-            self.__scale.set_scale(self.__config.init_scale())
-            self.__rot.set_basis(*config.init_rot_basis())
+        self.__shift.set_r(*self.__config.center_point())
+        self.__scale.set_scale(self.__config.init_scale())
+        self.__rot.set_basis(*self.__config.init_rot_basis())
 
     def move_along_sight_line(self, dt):
         """C.move_along_sight_line(dt)
@@ -105,19 +115,23 @@ class Cameraman(object):
                 self.__keys.get(key.UP, 0) - self.__keys.get(key.DOWN, 0)
             ) * dt
 
-            k = numpy.array([[0, 0, 1, 1]]).T
+            self.__shift_by(vector.Vector(0, 0, displacement))
 
-            SR = self.__sr.matrix()
+    def __shift_by(self, u):
+        """C.__shift_by(u)
 
-            move = numpy.linalg.inv(SR)
-
-            trans = numpy.array([self.__shift.r()]).T
+        Moves the camera shift by the vector u, given in the coordinates of
+        the scaled and rotated basis. The inverse of the scaling and rotation
+        is applied in closed form.
+        """
 
-            trans += displacement * move.dot(k)[:3]
+        move = self.__rot.input_vector(u)
+        scale = self.__scale.scale()
 
-            r_x, r_y, r_z = trans[0, 0], trans[1, 0], trans[2, 0]
+        r_x, r_y, r_z = self.__shift.r()
 
-            self.__shift.set_r(r_x, r_y, r_z)
+        self.__shift.set_r(
+            r_x + move.x / scale, r_y + move.y / scale, r_z + move.z / scale)
 
     def on_resize(self, width, height):
 
@@ -140,48 +154,16 @@ class Cameraman(object):
 
             horiz, up, forward = self.__rot.basis()
 
-            new_horiz = horiz.rotate(up, dx * self.__config.rot_z_speed())
-            new_up = up.rotate(horiz, -dy * self.__config.rot_z_speed())
-            new_forward = (forward.
-                           rotate(horiz, -dy * self.__config.rot_z_speed()).
-                           rotate(up, dx * self.__config.rot_z_speed()))
-
-            self.__rot.set_basis(new_horiz, new_up, new_forward)
+            # Tilt around the horizontal axis, then turn around the old up
+            self.__rot.rotate(horiz, -dy * self.__config.rot_z_speed())
+            self.__rot.rotate(up, dx * self.__config.rot_z_speed())
 
         elif buttons == mouse.RIGHT:
 
-            SR = self.__sr.matrix()
-
-            u = numpy.array([[
+            self.__shift_by(vector.Vector(
                 dx * self.__config.trans_speed(),
                 dy * self.__config.trans_speed(),
-                0, 0]]).T
-
-            r = numpy.array([self.__shift.r()]).T
-            r += numpy.linalg.inv(SR).dot(u)[:3]
-
-            self.__shift.set_r(r[0, 0], r[1, 0], r[2, 0])
-
-    def __dot(self, matrices, vect=numpy.array([[0], [0], [5], [1]])):
-
-        matrix = numpy.eye(4)
-
-        for other in reversed(matrices):
-
-            matrix = other.dot(matrix)
-
-        return matrix
-
-    def calculate(self):
-
-        self.set_matrix(self.__dot([
-            self.__foreshort.matrix(),
-            self.__aspect.matrix(),
-            self.__flip_hand.matrix(),
-            self.__look_at.matrix(),
-            self.__sr.matrix(),
-            self.__shift.matrix(),
-        ]))
+                0))
 
     def on_draw(self):
 
@@ -3,9 +3,9 @@
 __all__ = ['BaseArgsParser', 'SlicedGridArgsParser', 'CommonConfig']
 
 import argparse
+import ctypes as c
 
 import pyglet
-from pyglet import gl
 import numpy
 
 from silica.viz.common.constants import COORDINATES_PER_RAY
@@ -65,7 +65,7 @@ class BaseConfig(object):
 
         self._args = parsed_args
 
-        self.__sun = (gl.GLfloat * COORDINATES_PER_RAY)(
+        self.__sun = (c.c_float * COORDINATES_PER_RAY)(
             0.5, 1, 1.5)
 
     def create_window(self):
@@ -153,12 +153,12 @@ class BaseConfig(object):
     def axis_ambient(self):
         """C.axis_ambient() -> gl.GLfloat"""
 
-        return gl.GLfloat(0.4)
+        return c.c_float(0.4)
 
     def axis_diffuse(self):
         """C.axis_diffuse() -> gl.GLfloat"""
 
-        return gl.GLfloat(0.6)
+        return c.c_float(0.6)
 
     def axes_scale(self):
         """C.axes_scale() -> scaling factor for the axes"""
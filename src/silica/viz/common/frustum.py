@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+
+__all__ = ['Frustum', 'CullingCounter']
+
+import numpy
+
+
+class Frustum(object):
+
+    """The view frustum of a camera transform.
+
+    The planes are derived from the rows of the transform matrix, as every
+    visible point p satisfies -w <= x, y, z <= w for (x, y, z, w) = M p.
+    """
+
+    def __init__(self, camera):
+
+        self.__camera = camera
+
+    def planes(self):
+        """F.planes() -> array of shape (6, 4)
+
+        Each row holds the coefficients (a, b, c, d) of a plane. The points
+        inside the frustum are those for which a x + b y + c z + d >= 0 holds
+        for all the planes.
+        """
+
+        m = self.__camera.matrix()
+
+        return numpy.array([
+            m[3] + m[0], m[3] - m[0],
+            m[3] + m[1], m[3] - m[1],
+            m[3] + m[2], m[3] - m[2]])
+
+    def boxes_visible(self, lows, highs):
+        """F.boxes_visible(lows, highs) -> boolean array
+
+        Tests axis-aligned boxes against the frustum. Both arguments are
+        arrays of shape (N, 3) holding the minimal and maximal corners of N
+        boxes. A box is reported as visible when it might intersect the
+        frustum -- boxes near the frustum's corners may be let through even
+        though they are not actually visible.
+        """
+
+        planes = self.planes()
+
+        # For each plane, the box corner furthest along it's normal
+        furthest = numpy.where(
+            planes[:, None, :3] >= 0,
+            highs[None, :, :],
+            lows[None, :, :])
+
+        distances = (furthest * planes[:, None, :3]).sum(axis=-1)
+        distances += planes[:, None, 3]
+
+        return (distances >= 0).all(axis=0)
+
+
+class CullingCounter(object):
+
+    """Counts the objects drawn and culled since the last reset."""
+
+    def __init__(self):
+
+        self.reset()
+
+    def reset(self):
+        """CC.reset()
+
+        Zero the counters. Meant to be called at the start of each frame.
+        """
+
+        self.__drawn, self.__culled = 0, 0
+
+    def count(self, drawn, culled):
+        """CC.count(drawn, culled)
+
+        Record that some objects were drawn and some culled.
+        """
+
+        self.__drawn += drawn
+        self.__culled += culled
+
+    def drawn(self):
+        """CC.drawn() -> number of objects drawn"""
+
+        return self.__drawn
+
+    def culled(self):
+        """CC.culled() -> number of objects culled"""
+
+        return self.__culled
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+
+__all__ = ['GLState', 'gl_state']
+
+from pyglet import gl
+
+
+class GLState(object):
+
+    """Tracks a bit of OpenGL state to skip redundant changes to it.
+
+    Only the state changed through the tracker is known to it, so all the
+    changes to that state should go through it. After something else changes
+    it (like code drawing with pyglet's own facilities) forget should be
+    called.
+    """
+
+    def __init__(self):
+
+        self.forget()
+
+    def forget(self):
+        """GLS.forget()
+
+        Treat all the tracked state as unknown.
+        """
+
+        self.__program = None
+        self.__vertex_array = None
+        self.__capabilities = {}
+        self.__depth_mask = None
+
+    def use_program(self, program):
+        """GLS.use_program(program)
+
+        Makes the program with the given OpenGL name current. Zero stands for
+        the fixed function pipeline.
+        """
+
+        if program != self.__program:
+
+            gl.glUseProgram(program)
+            self.__program = program
+
+    def bind_vertex_array(self, vertex_array):
+        """GLS.bind_vertex_array(vertex_array)
+
+        Binds the vertex array object with the given OpenGL name.
+        """
+
+        if vertex_array != self.__vertex_array:
+
+            gl.glBindVertexArray(vertex_array)
+            self.__vertex_array = vertex_array
+
+    def enable(self, capability):
+        """GLS.enable(capability)
+
+        Enables the OpenGL capability.
+        """
+
+        if self.__capabilities.get(capability) is not True:
+
+            gl.glEnable(capability)
+            self.__capabilities[capability] = True
+
+    def disable(self, capability):
+        """GLS.disable(capability)
+
+        Disables the OpenGL capability.
+        """
+
+        if self.__capabilities.get(capability) is not False:
+
+            gl.glDisable(capability)
+            self.__capabilities[capability] = False
+
+    def depth_mask(self, flag):
+        """GLS.depth_mask(flag)
+
+        Enables or disables writing to the depth buffer.
+        """
+
+        flag = bool(flag)
+
+        if flag != self.__depth_mask:
+
+            gl.glDepthMask(gl.GL_TRUE if flag else gl.GL_FALSE)
+            self.__depth_mask = flag
+
+
+# There is a single OpenGL context per process
+gl_state = GLState()
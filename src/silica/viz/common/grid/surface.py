@@ -5,7 +5,6 @@ __all__ = ['SurfaceDataGenerator']
 import os.path
 
 import numpy
-from scipy import weave
 
 from silica.viz.common.constants import *
 from silica.viz.common.cube import *
@@ -15,8 +14,23 @@ INLINE_PATH = os.path.join(
     os.path.dirname(os.path.abspath(__file__)),
     'surface_inline.c')
 
-with open(INLINE_PATH) as glass_inline_c:
-    INLINE_CODE = glass_inline_c.read()
+_inline_code = None
+
+
+def inline_code():
+    """inline_code() -> the C code finding the hidden cube faces
+
+    Read from INLINE_PATH the first time it is needed.
+    """
+
+    global _inline_code
+
+    if _inline_code is None:
+
+        with open(INLINE_PATH) as glass_inline_c:
+            _inline_code = glass_inline_c.read()
+
+    return _inline_code
 
 
 class SurfaceDataGenerator(object):
@@ -80,9 +94,12 @@ class SurfaceDataGenerator(object):
             (CUBES, SQUARES_PER_CUBE),
             dtype=numpy.int)
 
+        # Importing SciPy takes long, so it is put off until it's needed
+        from scipy import weave
+
         grid = self.__grid
         weave.inline(
-            INLINE_CODE,
+            inline_code(),
             [
                 'grid', 'overlaps_grid', 'nonoverlap_mask',
                 'CUBES', 'SQUARES_PER_CUBE', 'W', 'H', 'D',
@@ -142,3 +159,47 @@ class SurfaceDataGenerator(object):
         return (
             raw_triangles[nonoverlap_mask.nonzero()],
             raw_normals[nonoverlap_mask.nonzero()])
+
+    def occlusion(self, positions, normals):
+        """SDG.occlusion(positions, normals) -> array
+
+        The ambient occlusion at each vertex of the surface, with the given
+        positions and normals (as returned by positions_and_normals). It is the
+        number of occupied cells among the four cells in front of the surface
+        around the vertex's corner, divided by 3 and capped at 1. The result has
+        the shape of the positions array, without the last axis.
+        """
+
+        shape = positions.shape[:-1]
+
+        corners = numpy.round(
+            positions.reshape((-1, COORDINATES_PER_VERTEX))).astype(numpy.intp)
+        normals = normals.reshape((-1, COORDINATES_PER_NORMAL))
+
+        # The cells are looked up in a grid padded with empty cells, so that
+        # the neighbours of the outermost cubes can be found
+        padded = numpy.pad(self.__grid != 0, 1, 'constant')
+
+        axis = numpy.abs(normals).argmax(axis=1)
+        vertices = numpy.arange(len(corners))
+
+        # Index of the layer of cells in front of the surface, along the axis
+        # it faces
+        front = numpy.where(normals[vertices, axis] > 0, 0, -1)
+
+        occupied = numpy.zeros(len(corners), dtype=numpy.intp)
+
+        # Each corner touches the eight cells around it -- four of them lie in
+        # front of the surface
+        for offset in numpy.ndindex(2, 2, 2):
+
+            offset = numpy.array(offset) - 1
+            cells = corners + offset + 1
+
+            in_front = offset[axis] == front
+
+            occupied += in_front & padded[
+                cells[:, 0], cells[:, 1], cells[:, 2]]
+
+        return numpy.minimum(occupied / 3., 1).reshape(shape)
+
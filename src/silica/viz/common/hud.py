@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+
+__all__ = ['TimingOverlay']
+
+import timeit
+
+import pyglet
+from pyglet import gl
+from pyglet.window import key
+
+from silica.viz.common.glstate import gl_state
+from silica.viz.common.timing import CPU_MS, GPU_MS, DRAW_CALLS, TRIANGLES
+
+
+PERCENTILES = (50, 95)
+
+# Seconds between updates of the text -- laying it out takes a while
+REFRESH_INTERVAL = 0.5
+
+MARGIN = 10
+
+HEADER = '%-10s %15s %15s %6s %10s' % (
+    'handler', 'cpu ms p50/p95', 'gpu ms p50/p95', 'draws', 'triangles')
+
+
+def format_milliseconds(values):
+    """format_milliseconds(values) -> str"""
+
+    return '/'.join(
+        '-' if value != value else '%.2f' % value for value in values)
+
+
+def format_count(value):
+    """format_count(value) -> str"""
+
+    return '-' if value != value else '%d' % value
+
+
+class TimingOverlay(object):
+
+    """Shows the statistics of frame timings over the scene. The overlay is
+    toggled with F2.
+    """
+
+    def __init__(self, timings, window):
+
+        self.__timings = timings
+        self.__shown = False
+        self.__refreshed = None
+
+        self.__label = pyglet.text.Label(
+            '', font_name=['Courier New', 'Courier', 'Monospace'],
+            font_size=10, color=(0, 0, 0, 255),
+            x=MARGIN, y=window.height - MARGIN, anchor_y='top',
+            width=window.width - 2 * MARGIN, multiline=True)
+
+    def on_key_press(self, symbol, modifiers):
+
+        if symbol == key.F2:
+
+            self.__shown = not self.__shown
+            self.__refreshed = None
+
+    def on_resize(self, width, height):
+
+        self.__label.y = height - MARGIN
+        self.__label.width = width - 2 * MARGIN
+
+    def __text(self):
+        """TO.__text() -> the statistics as text"""
+
+        lines = [HEADER]
+
+        for name in self.__timings.names():
+
+            draws, = self.__timings.statistics(name, DRAW_CALLS, [50])
+            triangles, = self.__timings.statistics(name, TRIANGLES, [50])
+
+            lines.append('%-10s %15s %15s %6s %10s' % (
+                name,
+                format_milliseconds(
+                    self.__timings.statistics(name, CPU_MS, PERCENTILES)),
+                format_milliseconds(
+                    self.__timings.statistics(name, GPU_MS, PERCENTILES)),
+                format_count(draws), format_count(triangles)))
+
+        return '\n'.join(lines)
+
+    def on_draw(self):
+
+        if not self.__shown:
+
+            return
+
+        now = timeit.default_timer()
+
+        if self.__refreshed is None or \
+                now - self.__refreshed > REFRESH_INTERVAL:
+
+            self.__label.text = self.__text()
+            self.__refreshed = now
+
+        gl_state.disable(gl.GL_DEPTH_TEST)
+
+        self.__label.draw()
+
+        gl_state.enable(gl.GL_DEPTH_TEST)
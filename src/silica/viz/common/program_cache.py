@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+
+__all__ = [
+    'probe_program_binaries', 'cache_directory', 'cache_key',
+    'load_program', 'store_program']
+
+import os
+import os.path
+import struct
+import hashlib
+import logging
+import ctypes as c
+
+from pyglet import gl
+
+
+# The binary format of a cached program, followed by the binary itself
+CACHE_HEADER = struct.Struct('<I')
+CACHE_SUFFIX = '.bin'
+
+
+def probe_program_binaries():
+    """probe_program_binaries() -> bool
+
+    Can linked programs be saved and loaded (ARB_get_program_binary)? Some
+    implementations support the extension without any binary formats, which
+    makes it useless.
+    """
+
+    if not (gl.gl_info.have_version(4, 1) or
+            gl.gl_info.have_extension('GL_ARB_get_program_binary')):
+
+        return False
+
+    formats = gl.GLint(0)
+    gl.glGetIntegerv(gl.GL_NUM_PROGRAM_BINARY_FORMATS, c.byref(formats))
+
+    return formats.value > 0
+
+
+def cache_directory():
+    """cache_directory() -> directory name
+
+    Where the program binaries are kept -- the silica directory in the user's
+    cache directory ($XDG_CACHE_HOME, ~/.cache by default).
+    """
+
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(
+        os.path.expanduser('~'), '.cache')
+
+    return os.path.join(base, 'silica')
+
+
+def cache_key(sources):
+    """cache_key(sources) -> str
+
+    Identifies a program built from the sources (a sequence of shader source
+    strings) by the OpenGL implementation in use. Binaries are only valid for
+    the implementation that produced them.
+    """
+
+    digest = hashlib.sha1()
+
+    for part in list(sources) + [
+            gl.gl_info.get_vendor(),
+            gl.gl_info.get_renderer(),
+            gl.gl_info.get_version()]:
+
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+
+    return digest.hexdigest()
+
+
+def cache_filename(key):
+    """cache_filename(key) -> filename of the program binary with the key"""
+
+    return os.path.join(cache_directory(), key + CACHE_SUFFIX)
+
+
+def load_program(key):
+    """load_program(key) -> program or None
+
+    Creates a program from the cached binary with the given key. None is
+    returned when there is no such binary or the implementation rejects it
+    (which happens, for example, after driver updates).
+    """
+
+    try:
+
+        with open(cache_filename(key), 'rb') as cache_file:
+
+            header = cache_file.read(CACHE_HEADER.size)
+            binary = cache_file.read()
+
+    except (IOError, OSError):
+
+        return None
+
+    if len(header) < CACHE_HEADER.size or not binary:
+
+        return None
+
+    binary_format, = CACHE_HEADER.unpack(header)
+
+    program = gl.glCreateProgram()
+
+    gl.glProgramBinary(program, binary_format, binary, len(binary))
+
+    link_ok = gl.GLint(0)
+    gl.glGetProgramiv(program, gl.GL_LINK_STATUS, c.byref(link_ok))
+
+    if not link_ok:
+
+        gl.glDeleteProgram(program)
+        return None
+
+    return program
+
+
+def store_program(program, key):
+    """store_program(program, key)
+
+    Saves the binary of a linked program in the cache under the key. The
+    binary is written to a temporary file first and then moved into place, so
+    that programs running at the same time never see a partial binary.
+    Failures are only logged -- the cache is just an optimization.
+    """
+
+    length = gl.GLint(0)
+    gl.glGetProgramiv(program, gl.GL_PROGRAM_BINARY_LENGTH, c.byref(length))
+
+    if not length.value:
+
+        return
+
+    binary = c.create_string_buffer(length.value)
+    binary_format, written = gl.GLuint(0), gl.GLint(0)
+
+    gl.glGetProgramBinary(
+        program, length, c.byref(written), c.byref(binary_format), binary)
+
+    filename = cache_filename(key)
+    temporary_name = '%s.%d.tmp' % (filename, os.getpid())
+
+    try:
+
+        if not os.path.isdir(cache_directory()):
+            os.makedirs(cache_directory())
+
+        with open(temporary_name, 'wb') as cache_file:
+
+            cache_file.write(CACHE_HEADER.pack(binary_format.value))
+            cache_file.write(binary.raw[:written.value])
+
+        os.rename(temporary_name, filename)
+
+    except (IOError, OSError) as err:
+
+        logging.info("Could not cache program binary '%s': %s", filename, err)
+
+        if os.path.exists(temporary_name):
+            os.remove(temporary_name)
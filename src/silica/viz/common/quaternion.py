@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+
+__all__ = ['Quaternion', 'from_axis_angle', 'from_basis']
+
+import math
+
+from silica.viz.common import vector
+
+
+class Quaternion(object):
+
+    """A quaternion w + xi + yj + zk. Unit quaternions represent rotations."""
+
+    __slots__ = ('w', 'x', 'y', 'z')
+
+    def __init__(self, w=1., x=0., y=0., z=0.):
+
+        self.w, self.x, self.y, self.z = w, x, y, z
+
+    def __repr__(self):
+
+        return "Quaternion(%s, %s, %s, %s)" % (self.w, self.x, self.y, self.z)
+
+    def __mul__(self, o):
+
+        if not isinstance(o, Quaternion):
+
+            return NotImplemented
+
+        return Quaternion(
+            self.w * o.w - self.x * o.x - self.y * o.y - self.z * o.z,
+            self.w * o.x + self.x * o.w + self.y * o.z - self.z * o.y,
+            self.w * o.y - self.x * o.z + self.y * o.w + self.z * o.x,
+            self.w * o.z + self.x * o.y - self.y * o.x + self.z * o.w)
+
+    def __abs__(self):
+
+        return math.sqrt(
+            self.w ** 2 + self.x ** 2 + self.y ** 2 + self.z ** 2)
+
+    def conjugate(self):
+        """Q.conjugate() -> conjugate quaternion
+
+        For a unit quaternion this is the inverse rotation.
+        """
+
+        return Quaternion(self.w, -self.x, -self.y, -self.z)
+
+    def unit(self):
+        """Q.unit() -> the quaternion scaled to unit length"""
+
+        length = abs(self)
+
+        return Quaternion(
+            self.w / length, self.x / length, self.y / length, self.z / length)
+
+    def rotate(self, v):
+        """Q.rotate(v) -> rotated vector
+
+        Rotates the Vector v by the rotation the unit quaternion represents.
+        """
+
+        # v + 2w (u x v) + 2u x (u x v), with u the vector part
+        t_x = 2 * (self.y * v.z - self.z * v.y)
+        t_y = 2 * (self.z * v.x - self.x * v.z)
+        t_z = 2 * (self.x * v.y - self.y * v.x)
+
+        return vector.Vector(
+            v.x + self.w * t_x + self.y * t_z - self.z * t_y,
+            v.y + self.w * t_y + self.z * t_x - self.x * t_z,
+            v.z + self.w * t_z + self.x * t_y - self.y * t_x)
+
+    def write_matrix(self, matrix):
+        """Q.write_matrix(matrix)
+
+        Writes the rotation matrix of the unit quaternion into the upper left
+        3x3 corner of the matrix (a numpy array), leaving the rest alone.
+        """
+
+        w, x, y, z = self.w, self.x, self.y, self.z
+
+        matrix[0, 0] = 1 - 2 * (y * y + z * z)
+        matrix[0, 1] = 2 * (x * y - w * z)
+        matrix[0, 2] = 2 * (x * z + w * y)
+
+        matrix[1, 0] = 2 * (x * y + w * z)
+        matrix[1, 1] = 1 - 2 * (x * x + z * z)
+        matrix[1, 2] = 2 * (y * z - w * x)
+
+        matrix[2, 0] = 2 * (x * z - w * y)
+        matrix[2, 1] = 2 * (y * z + w * x)
+        matrix[2, 2] = 1 - 2 * (x * x + y * y)
+
+
+def from_axis_angle(axis, angle):
+    """from_axis_angle(axis, angle) -> unit quaternion
+
+    The rotation to the right around the axis direction (a Vector) by the
+    given angle.
+    """
+
+    sin = math.sin(angle / 2) / abs(axis)
+
+    return Quaternion(
+        math.cos(angle / 2), axis.x * sin, axis.y * sin, axis.z * sin)
+
+
+def from_basis(e_0, e_1, e_2):
+    """from_basis(e_0, e_1, e_2) -> unit quaternion
+
+    The rotation whose matrix has the base vectors as it's rows. The basis
+    should be orthonormal and right-handed -- small deviations get evened out.
+    """
+
+    m = [[e.x, e.y, e.z] for e in (e_0, e_1, e_2)]
+
+    trace = m[0][0] + m[1][1] + m[2][2]
+
+    # Divide by the largest of the components, to keep the precision
+    if trace > 0:
+
+        s = 2 * math.sqrt(1 + trace)
+
+        q = Quaternion(
+            s / 4,
+            (m[2][1] - m[1][2]) / s,
+            (m[0][2] - m[2][0]) / s,
+            (m[1][0] - m[0][1]) / s)
+
+    elif m[0][0] > m[1][1] and m[0][0] > m[2][2]:
+
+        s = 2 * math.sqrt(1 + m[0][0] - m[1][1] - m[2][2])
+
+        q = Quaternion(
+            (m[2][1] - m[1][2]) / s,
+            s / 4,
+            (m[0][1] + m[1][0]) / s,
+            (m[0][2] + m[2][0]) / s)
+
+    elif m[1][1] > m[2][2]:
+
+        s = 2 * math.sqrt(1 + m[1][1] - m[0][0] - m[2][2])
+
+        q = Quaternion(
+            (m[0][2] - m[2][0]) / s,
+            (m[0][1] + m[1][0]) / s,
+            s / 4,
+            (m[1][2] + m[2][1]) / s)
+
+    else:
+
+        s = 2 * math.sqrt(1 + m[2][2] - m[0][0] - m[1][1])
+
+        q = Quaternion(
+            (m[1][0] - m[0][1]) / s,
+            (m[0][2] + m[2][0]) / s,
+            (m[1][2] + m[2][1]) / s,
+            s / 4)
+
+    return q.unit()
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+
+__all__ = ['Redraw', 'redraw']
+
+
+class DrawnWindow(object):
+
+    """Window event handlers keeping the window's invalid flag. It should be
+    pushed onto the window before the handlers drawing the scene, so that the
+    window is marked as drawn after all of them drew.
+    """
+
+    def __init__(self, window):
+
+        self.__window = window
+
+    def __invalidate(self, *args):
+
+        self.__window.invalid = True
+
+    on_resize = on_expose = on_show = on_key_press = __invalidate
+
+    def on_draw(self):
+
+        self.__window.invalid = False
+
+
+class Redraw(object):
+
+    """Keeps track of whether the windows showing the scene need to be
+    redrawn. The pyglet event loop only draws the windows with their invalid
+    flag set, so the windows watched stay as they are until something calls
+    invalidate, or the window gets resized, exposed or a key gets pressed.
+
+    Functions scheduled on the pyglet clock make the event loop redraw all
+    windows each time they are called, so they should only stay scheduled
+    while they change something.
+    """
+
+    def __init__(self):
+
+        self.__windows = []
+        self.__handlers = []
+
+    def watch(self, window):
+        """R.watch(window)
+
+        Starts redrawing the window only when needed. This must be done before
+        pushing the handlers drawing the scene onto the window.
+        """
+
+        handler = DrawnWindow(window)
+
+        # Newer pyglet versions only keep weak references to the handlers
+        self.__handlers.append(handler)
+        self.__windows.append(window)
+
+        window.push_handlers(handler)
+
+    def invalidate(self):
+        """R.invalidate()
+
+        Marks the scene as changed, so that the windows get redrawn.
+        """
+
+        for window in self.__windows:
+            window.invalid = True
+
+
+# The scene is shared by the windows of a process
+redraw = Redraw()
@@ -1,7 +1,10 @@
 # -*- coding: utf-8 -*-
 
 __all__ = [
-    'check_shader', 'check_program', 'load_shader', 'build_program',
+    'check_shader', 'check_program', 'find_shader_source', 'compile_shader',
+    'load_shader', 'build_program',
+    'have_instancing', 'have_instanced_arrays', 'have_vertex_array_objects',
+    'have_program_binaries',
     'Program', 'GLSLType']
 
 
@@ -13,6 +16,9 @@ import numpy
 from pyglet import gl
 
 from silica.viz.common.constants import *
+from silica.viz.common.glstate import gl_state
+from silica.viz.common.timing import draw_counter
+from silica.viz.common import program_cache
 
 
 SHADER_TYPES = {
@@ -79,10 +85,49 @@ def check_program(program):
                 program, log_buf.value))
 
 
-def load_shader(name, shader_type):
-    """load_shader(name, shader_type) -> compiled shader
+def insert_lines(source, inserted):
+    """insert_lines(source, inserted) -> shader source
 
-    Exits the program if the shader doesn't compile."""
+    Inserts the lines right after the #version directive of the source (if
+    there is one).
+    """
+
+    lines = source.split('\n')
+
+    at = 1 if lines and lines[0].startswith('#version') else 0
+    lines[at:at] = inserted
+
+    return '\n'.join(lines)
+
+
+def add_defines(source, defines):
+    """add_defines(source, defines) -> shader source
+
+    Inserts a #define directive for each of the names in defines right after
+    the #version directive of the source (if there is one).
+    """
+
+    return insert_lines(
+        source, ['#define %s' % define for define in defines])
+
+
+def add_prelude(source, prelude):
+    """add_prelude(source, prelude) -> shader source
+
+    Inserts the source of a prelude, such as functions shared by several
+    shaders, right after the #version directive of the source (if there is
+    one). The prelude must not have a #version directive of it's own.
+    """
+
+    return insert_lines(source, prelude.split('\n'))
+
+
+def find_shader_source(name, shader_type):
+    """find_shader_source(name, shader_type) -> source, filename
+
+    Reads the source of a shader from the first directory on the shader_path
+    holding a file for it.
+    """
 
     # Check that the shader type specifier is correct
     if shader_type not in SHADER_TYPES:
@@ -103,6 +148,14 @@ def load_shader(name, shader_type):
     if source is None and err is not None:
         raise err
 
+    return source, filename
+
+
+def compile_shader(source, shader_type, filename):
+    """compile_shader(source, shader_type, filename) -> compiled shader
+
+    The filename is only used in error messages."""
+
     # Perform ctypes enchantments
     source_buf = c.create_string_buffer(source)
     c_source = c.cast(source_buf,
@@ -119,16 +172,67 @@ def load_shader(name, shader_type):
     return shader
 
 
-def build_program(name):
-    """build_program(name)
+def load_shader(name, shader_type, defines=()):
+    """load_shader(name, shader_type, defines=()) -> compiled shader
+
+    Exits the program if the shader doesn't compile."""
+
+    source, filename = find_shader_source(name, shader_type)
+
+    return compile_shader(
+        add_defines(source, defines), shader_type, filename)
+
+
+def shader_sources(name, defines=(), sources=None):
+    """shader_sources(name, defines=(), sources=None) -> dict
+
+    The sources of the program's shaders, by shader type, with the defines
+    added. The sources not given in the sources dict are read from the
+    shader_path.
+    """
+
+    sources = dict(sources or {})
+
+    for shader_type in SHADER_TYPES:
+
+        if shader_type not in sources:
+
+            sources[shader_type], __ = find_shader_source(name, shader_type)
+
+        sources[shader_type] = add_defines(sources[shader_type], defines)
+
+    return sources
+
+
+def build_program(name, defines=(), sources=None):
+    """build_program(name, defines=(), sources=None)
 
     Loads and compiles the shaders and afterwards link them into a
-    program."""
+    program. The names in defines get #defined in both shaders. The sources
+    dict may hold the source code of some of the shaders (by shader type,
+    'v' or 'f'), which then are not looked up on the shader_path.
+
+    When the OpenGL implementation can save linked programs, they get cached
+    on disk and reused by later runs, skipping the compilation."""
+
+    sources = shader_sources(name, defines, sources)
+
+    cache = have_program_binaries()
+
+    if cache:
+
+        key = program_cache.cache_key(
+            [sources[shader_type] for shader_type in sorted(SHADER_TYPES)])
+
+        program = program_cache.load_program(key)
+
+        if program is not None:
+            return program
 
     # Compile the shaders
-    vs = load_shader(name, 'v')
+    vs = compile_shader(sources['v'], 'v', '%s.v.glsl' % name)
 
-    fs = load_shader(name, 'f')
+    fs = compile_shader(sources['f'], 'f', '%s.f.glsl' % name)
 
     # Create and link the program
     program = gl.glCreateProgram()
@@ -136,19 +240,45 @@ def build_program(name):
     gl.glAttachShader(program, vs)
     gl.glAttachShader(program, fs)
 
+    if cache:
+        gl.glProgramParameteri(
+            program, gl.GL_PROGRAM_BINARY_RETRIEVABLE_HINT, gl.GL_TRUE)
+
     gl.glLinkProgram(program)
 
     # If everything is ok -- return the program
     check_program(program)
+
+    if cache:
+        program_cache.store_program(program, key)
+
     return program
 
 
-def __max_vertex_attribute():
-    """__max_vertex_attribute() -> int
+# The capabilities of the OpenGL implementation, probed when first needed.
+# There is a single OpenGL context per process.
+_capabilities = {}
 
-    Maximal valid value for vertex attribute identifiers.
+
+def capability(name, probe):
+    """capability(name, probe) -> value
+
+    The capability of the OpenGL implementation with the name, as returned by
+    the probe function the first time it is asked for. Probing takes a current
+    OpenGL context and often some time, so it is done once and only as late
+    as possible.
     """
 
+    if name not in _capabilities:
+
+        _capabilities[name] = probe()
+
+    return _capabilities[name]
+
+
+def probe_max_vertex_attribute():
+    """probe_max_vertex_attribute() -> int"""
+
     buffy = (1 * gl.GLint)()
     gl.glGetIntegerv(
         gl.GL_MAX_VERTEX_ATTRIBS,
@@ -157,7 +287,55 @@ def __max_vertex_attribute():
     return buffy[0]
 
 
-_MAX_VERTEX_ATTRIB = __max_vertex_attribute()
+def max_vertex_attribute():
+    """max_vertex_attribute() -> int
+
+    Maximal valid value for vertex attribute identifiers.
+    """
+
+    return capability('max_vertex_attribute', probe_max_vertex_attribute)
+
+
+def have_instancing():
+    """have_instancing() -> bool
+
+    Can instanced draw calls (ARB_draw_instanced) be used?
+    """
+
+    return capability('instancing', lambda: gl.gl_info.have_extension(
+        'GL_ARB_draw_instanced'))
+
+
+def have_instanced_arrays():
+    """have_instanced_arrays() -> bool
+
+    Can per-instance attributes (ARB_instanced_arrays) be used?
+    """
+
+    return capability('instanced_arrays', lambda: (
+        have_instancing() and
+        gl.gl_info.have_extension('GL_ARB_instanced_arrays')))
+
+
+def have_vertex_array_objects():
+    """have_vertex_array_objects() -> bool
+
+    Can vertex array objects (ARB_vertex_array_object) be used?
+    """
+
+    return capability('vertex_array_objects', lambda: (
+        gl.gl_info.have_version(3, 0) or
+        gl.gl_info.have_extension('GL_ARB_vertex_array_object')))
+
+
+def have_program_binaries():
+    """have_program_binaries() -> bool
+
+    Can linked programs be cached on disk (see program_cache)?
+    """
+
+    return capability(
+        'program_binaries', program_cache.probe_program_binaries)
 
 
 class GLSLType(object):
@@ -218,7 +396,7 @@ class GLSLType(object):
 
     def __init__(self, shape=Scalar(), element_type=FLOAT):
 
-        if (shape not in [(1, 1), (2, 1), (3, 1), (4, 1)] and
+        if (isinstance(shape, GLSLType.Matrix) and
                 element_type == GLSLType.INT):
 
             raise ValueError(
@@ -267,10 +445,25 @@ class GLSLType(object):
 
         return self.__shape
 
+    def numpy_dtype(self):
+        """GT.numpy_dtype() -> numpy dtype matching the element type"""
+
+        if self.element_type() is gl.GLint:
+
+            return numpy.dtype(numpy.int32)
+
+        elif self.element_type() is gl.GLfloat:
+
+            return numpy.dtype(numpy.float32)
+
 
 class Uniform(object):
 
-    """A GLSL uniform value"""
+    """A GLSL uniform value
+
+    Programs keep the values of their uniforms, so set only calls OpenGL when
+    the contents changed since they were last uploaded.
+    """
 
     def __init__(self, program, uniform, type, count):
 
@@ -285,6 +478,8 @@ class Uniform(object):
         self.__buf = (element_type * (value_count * count))()
         self.__fill = 0
 
+        self.__changed, self.__uploaded = True, None
+
     def add(self, *values):
 
         if len(values) != self.__type.shape().value_count():
@@ -298,6 +493,30 @@ class Uniform(object):
             self.__buf[self.__fill + i] = value
 
         self.__fill += len(values)
+        self.__changed = True
+
+    def load(self, values):
+        """U.load(values)
+
+        Replaces the contents of the uniform with the values from a numpy
+        array, ctypes array or another object supporting the buffer protocol.
+        An array that is already contiguous and of the right element type gets
+        copied in with a single memmove.
+        """
+
+        source = numpy.ascontiguousarray(
+            values, dtype=self.__type.numpy_dtype())
+
+        if source.size > len(self.__buf):
+
+            raise ValueError(
+                'This uniform can hold at most %d components.' %
+                len(self.__buf))
+
+        c.memmove(self.__buf, source.ctypes.data, source.nbytes)
+
+        self.__fill = source.size
+        self.__changed = True
 
     def clear(self):
 
@@ -308,21 +527,52 @@ class Uniform(object):
         return self.__fill == len(self.__buf)
 
     def set(self):
+        """U.set()
+
+        Uploads the contents to the program, unless the program already has
+        them. The program must be in use.
+        """
+
+        if not self.__changed:
+
+            return
+
+        contents = c.string_at(self.__buf, c.sizeof(self.__buf))
+        self.__changed = False
+
+        if contents == self.__uploaded:
+
+            return
 
         setter = self.__type.uniform_setter()
 
         setter(self.__uniform, self.__count, self.__buf)
 
+        self.__uploaded = contents
+
 
 class Attribute(object):
 
-    """A GLSL attribute"""
+    """A GLSL attribute
+
+    A per-instance attribute advances once per instance of an instanced draw
+    call, instead of once per vertex.
+    """
 
-    def __init__(self, gl_id, gl_type, values_per_vertex):
+    def __init__(self, gl_id, gl_type, values_per_vertex, per_instance=False):
 
         self.__gl_id = gl_id
         self.__gl_type = gl_type
         self.__values_per_vertex = values_per_vertex
+        self.__per_instance = per_instance
+
+    def per_instance(self):
+        """A.per_instance() -> bool
+
+        Does the attribute change per instance rather than per vertex?
+        """
+
+        return self.__per_instance
 
     def components_per_vertex(self):
         """A.components_per_vertex() -> int
@@ -335,36 +585,114 @@ class Attribute(object):
 
         return components_per_value * values_per_vertex
 
-    def c_array_for(self, triangle_count):
-        """A.c_array_for(triangle_count) -> a ctypes array
+    def rows(self, triangle_count, instance_count=1):
+        """A.rows(triangle_count, instance_count=1) -> int
+
+        The number of values (vertices or instances) the attribute has to be
+        specified for.
+        """
+
+        if self.__per_instance:
 
-        Creates a ctypes array with size and type appropriate for this
+            return instance_count
+
+        return triangle_count * VERTICES_PER_TRIANGLE
+
+    def array_for(self, triangle_count, instance_count=1):
+        """A.array_for(triangle_count, instance_count=1) -> a numpy array
+
+        Creates a zeroed numpy array with shape and type appropriate for this
         attribute.
         """
 
-        element_type = self.__gl_type.element_type()
+        return numpy.zeros(
+            (self.rows(triangle_count, instance_count),
+             self.components_per_vertex()),
+            dtype=self.__gl_type.numpy_dtype())
+
+    def array_from(self, source, triangle_count, instance_count=1):
+        """A.array_from(source, triangle_count, instance_count=1) -> array
+
+        Returns a numpy array of shape (rows, components) with the data taken
+        from the source. When the source already is a numpy array of the right
+        type and size, with the components of each row laid out contiguously,
+        it is used as is, without any copying. The rows may be strided, so
+        several attributes can be interleaved in a single array. Otherwise the
+        data gets converted in a single, vectorized copy.
+        """
+
+        dtype = self.__gl_type.numpy_dtype()
+        rows = self.rows(triangle_count, instance_count)
+        components = self.components_per_vertex()
 
-        size = (triangle_count * VERTICES_PER_TRIANGLE *
-                self.components_per_vertex())
+        if (isinstance(source, numpy.ndarray) and
+                source.dtype == dtype and
+                source.size == rows * components):
 
-        return (element_type * size)()
+            if source.flags.c_contiguous:
 
-    def set(self, source):
-        """A.set(source)
+                return source.reshape((rows, components))
 
-        Set the given attribute's value using the source for data.
+            if (source.shape == (rows, components) and
+                    source.strides[1] == dtype.itemsize):
+
+                return source
+
+        array = numpy.ravel(numpy.asarray(source, dtype=dtype))
+
+        if array.size < rows * components:
+
+            raise ValueError(
+                'Got %d components when %d were required.' % (
+                    array.size, rows * components))
+
+        return numpy.ascontiguousarray(
+            array[:rows * components]).reshape((rows, components))
+
+    def pointer_to(self, array):
+        """A.pointer_to(array) -> ctypes pointer
+
+        A pointer to the data of a numpy array, as expected by set.
         """
 
-        if 0 <= self.__gl_id <= _MAX_VERTEX_ATTRIB:
+        return array.ctypes.data_as(
+            c.POINTER(self.__gl_type.element_type()))
+
+    def set(self, source, stride=0):
+        """A.set(source, stride=0)
+
+        Set the given attribute's value using the source for data. The source
+        should be a ctypes array or pointer. The stride is the distance in
+        bytes between consecutive values, with 0 meaning they're tightly
+        packed.
+        """
+
+        if 0 <= self.__gl_id <= max_vertex_attribute():
 
             gl.glEnableVertexAttribArray(self.__gl_id)
             gl.glVertexAttribPointer(
                 self.__gl_id,
                 self.components_per_vertex(),
                 self.__gl_type.element_type_tag(),
-                gl.GL_FALSE, 0,
+                gl.GL_FALSE, stride,
                 source)
 
+            if self.__per_instance:
+
+                gl.glVertexAttribDivisorARB(self.__gl_id, 1)
+
+    def unset(self):
+        """A.unset()
+
+        Undo the changes to OpenGL state made by set, which would affect other
+        programs using the same attribute location.
+        """
+
+        if 0 <= self.__gl_id <= max_vertex_attribute() and \
+                self.__per_instance:
+
+            gl.glVertexAttribDivisorARB(self.__gl_id, 0)
+
     def gl_type(self):
         """A.gl_type() -> GLSLType"""
 
@@ -373,13 +701,19 @@ class Attribute(object):
 
 class Program(object):
 
-    """A GLSL shader program"""
+    """A GLSL shader program
+
+    Used in a with block, the program stays in use until the outermost block
+    using it ends, so nested blocks (like drawing several triangle lists of
+    the same program) don't switch programs in between.
+    """
 
-    def __init__(self, name):
+    def __init__(self, name, defines=(), sources=None):
 
-        self.__program = build_program(name)
+        self.__program = build_program(name, defines, sources)
         self.__uniforms = {}
         self.__attributes = {}
+        self.__depth = 0
 
     def uniform(self, name, type, count=1):
 
@@ -393,7 +727,7 @@ class Program(object):
 
         return self.__uniforms[name]
 
-    def attribute(self, name, type, values_per_vertex=1):
+    def attribute(self, name, type, values_per_vertex=1, per_instance=False):
 
         if name not in self.__attributes:
 
@@ -401,18 +735,20 @@ class Program(object):
                 self.__program, name)
 
             self.__attributes[name] = Attribute(
-                location, type, values_per_vertex)
+                location, type, values_per_vertex, per_instance)
 
         return self.__attributes[name]
 
-    def triangle_list(self, count):
-        """P.triangle_list(count) -> a TriangleList
+    def triangle_list(self, count, instances=None):
+        """P.triangle_list(count, instances=None) -> a TriangleList
 
         Produces a triangle list that can be used to draw count triangles with
-        the given shader program.
+        the given shader program. When instances is not None, each draw
+        renders that many instances of the triangles, with the per-instance
+        attributes supplying the data that varies between them.
         """
 
-        return TriangleList(self, count, self.__attributes)
+        return TriangleList(self, count, self.__attributes, instances)
 
     def use(self):
         """P.use()
@@ -420,7 +756,7 @@ class Program(object):
         Enables the program for rendering.
         """
 
-        gl.glUseProgram(self.__program)
+        gl_state.use_program(self.__program)
 
     def unuse(self):
         """P.unuse()
@@ -428,71 +764,251 @@ class Program(object):
         Disable the program for rendering.
         """
 
-        gl.glUseProgram(0)
+        gl_state.use_program(0)
 
     def __enter__(self):
 
+        self.__depth += 1
         self.use()
         return self
 
     def __exit__(self, type, value, traceback):
 
+        self.__depth -= 1
+
+        if self.__depth:
+
+            return
+
+        # Leave no state behind for drawing done without shaders
+        if have_vertex_array_objects():
+            gl_state.bind_vertex_array(0)
+
         self.unuse()
 
 
 class TriangleList(object):
 
-    """A set of data that can be used with a program to draw something."""
+    """A set of data that can be used with a program to draw something.
+
+    An instanced triangle list draws several instances of the same triangles.
+    Without ARB_instanced_arrays the instances get expanded into one big
+    triangle list on the CPU right before drawing.
+
+    When vertex array objects are available, the attribute setup is recorded
+    in one the first time the list is used and then bound with a single call,
+    until the data changes.
+    """
 
-    def __init__(self, program, count, attrs):
+    def __init__(self, program, count, attrs, instances=None):
 
         self.__program = program
         self.__count = count
         self.__attrs = attrs
+        self.__instances = instances
 
-        self.__arrays = {}
+        self.__vertex_array = None
+        self.__recorded = False
+
+        self.__arrays, self.__pointers, self.__strides = {}, {}, {}
         for name, attr in self.__attrs.items():
-            self.__arrays[name] = attr.c_array_for(self.__count)
+            self.__store(name, attr.array_for(
+                self.__count, self.__instance_count()))
+
+        self.__expanded = None
+
+    def __instance_count(self):
+        """TL.__instance_count() -> number of instances drawn"""
+
+        return 1 if self.__instances is None else self.__instances
+
+    def __store(self, name, array):
+        """TL.__store(name, array)
+
+        Keeps the array as the data source for the named attribute.
+        """
+
+        stride = 0 if array.flags.c_contiguous else array.strides[0]
+
+        old = self.__arrays.get(name)
+        self.__arrays[name] = array
+
+        # The contents may have changed even if the memory stayed the same,
+        # so the instances have to be expanded again
+        self.__expanded = None
+
+        # A view of the same memory needs no new attribute setup
+        if (old is not None and
+                old.ctypes.data == array.ctypes.data and
+                old.shape == array.shape and
+                self.__strides[name] == stride):
+
+            return
+
+        self.__pointers[name] = self.__attrs[name].pointer_to(array)
+        self.__strides[name] = stride
+
+        self.__recorded = False
 
     def from_arrays(self, arrays):
         """TL.from_arrays(arrays)
 
-        Loads the data for all the attributes from an dictionary of ndarrays
-        and other sequences containing the data. The arrays get implicitly
-        flattened before use.
+        Loads the data for all the per-vertex attributes from an dictionary of
+        ndarrays and other sequences containing the data. The arrays get
+        implicitly flattened before use.
+
+        Contiguous ndarrays of the attribute's element type (numpy.float32 for
+        floats) are used directly, without copying -- they must not be
+        modified afterwards unless the change is meant to show up on screen.
         """
 
-        for name, array in self.__arrays.items():
+        for name, attr in self.__attrs.items():
 
-            source = arrays[name]
-            if isinstance(source, numpy.ndarray):
-                source = source.flatten()
+            if not attr.per_instance():
 
-            for i in range(len(array)):
-                array[i] = source[i]
+                self.__store(name, attr.array_from(
+                    arrays[name], self.__count))
 
-    def __enter__(self):
+    def from_instance_arrays(self, arrays, instances):
+        """TL.from_instance_arrays(arrays, instances)
+
+        Sets the number of instances to draw and loads the data for all the
+        per-instance attributes, the same way from_arrays does for per-vertex
+        ones. Arrays of shape (instances, components) with strided rows are
+        also used without copying.
+        """
+
+        if instances != self.__instances:
 
-        self.__program.use()
+            self.__instances = instances
+            self.__expanded = None
+            self.__recorded = False
 
         for name, attr in self.__attrs.items():
 
-            array = self.__arrays[name]
+            if attr.per_instance():
+
+                self.__store(name, attr.array_from(
+                    arrays[name], self.__count, instances))
+
+    def __native_instancing(self):
+        """TL.__native_instancing() -> bool
+
+        Can the instances be drawn with a single instanced draw call?
+        """
+
+        return self.__instances is None or have_instanced_arrays()
+
+    def __expand(self):
+        """TL.__expand() -> dict of arrays
+
+        The data for drawing all the instances as one big triangle list.
+        """
+
+        if self.__expanded is None:
+
+            vertices = self.__count * VERTICES_PER_TRIANGLE
+
+            self.__expanded = {}
+            for name, attr in self.__attrs.items():
+
+                array = self.__arrays[name]
+
+                if attr.per_instance():
+                    array = array.repeat(vertices, axis=0)
+                else:
+                    array = numpy.tile(array, (self.__instances, 1))
+
+                self.__expanded[name] = array
+
+        return self.__expanded
+
+    def __set_attributes(self):
+        """TL.__set_attributes()
+
+        Points the attributes at the data.
+        """
+
+        if self.__native_instancing():
+
+            for name, attr in self.__attrs.items():
 
-            attr.set(array)
+                attr.set(self.__pointers[name], self.__strides[name])
+
+        else:
+
+            for name, array in self.__expand().items():
+
+                self.__attrs[name].set(self.__attrs[name].pointer_to(array))
+
+    def __enter__(self):
+
+        self.__program.__enter__()
+
+        if not have_vertex_array_objects():
+
+            self.__set_attributes()
+
+            return self
+
+        if self.__vertex_array is None:
+
+            self.__vertex_array = gl.GLuint(0)
+            gl.glGenVertexArrays(1, c.byref(self.__vertex_array))
+
+        gl_state.bind_vertex_array(self.__vertex_array.value)
+
+        if not self.__recorded:
+
+            self.__set_attributes()
+            self.__recorded = True
 
         return self
 
-    def draw(self):
-        """TL.draw()
+    def draw(self, instances=None):
+        """TL.draw(instances=None)
 
-        Draws the triangle list on screen.
+        Draws the triangle list on screen. An instanced list can draw just the
+        given number of it's first instances, so that a varying number of them
+        can be drawn from the same data.
         """
 
-        gl.glDrawArrays(
+        if instances is None:
+            instances = self.__instance_count()
+
+        if self.__instances is not None and self.__native_instancing():
+
+            self.draw_instanced(instances)
+
+        else:
+
+            gl.glDrawArrays(
+                gl.GL_TRIANGLES, 0,
+                self.__count * VERTICES_PER_TRIANGLE * instances)
+
+            draw_counter.count(self.__count * instances)
+
+    def draw_instanced(self, instances):
+        """TL.draw_instanced(instances)
+
+        Draws the given number of instances of the triangle list with a
+        single call. Requires ARB_draw_instanced -- see have_instancing.
+        """
+
+        gl.glDrawArraysInstancedARB(
             gl.GL_TRIANGLES, 0,
-            self.__count * VERTICES_PER_TRIANGLE)
+            self.__count * VERTICES_PER_TRIANGLE,
+            instances)
+
+        draw_counter.count(self.__count * instances)
 
     def __exit__(self, type, value, traceback):
 
-        self.__program.unuse()
+        # The vertex array object keeps the attribute setup to itself
+        if not have_vertex_array_objects() and self.__native_instancing():
+
+            for attr in self.__attrs.values():
+
+                attr.unset()
+
+        self.__program.__exit__(type, value, traceback)
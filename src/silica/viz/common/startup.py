@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+
+__all__ = ['StartupProfile', 'startup_profile']
+
+import sys
+import timeit
+import contextlib
+
+try:
+    import __builtin__ as builtins
+except ImportError:
+    import builtins
+
+
+# Modules taking less time than this to import are left out of the report
+REPORT_THRESHOLD = 0.001
+
+
+class StartupProfile(object):
+
+    """Measures how long the modules take to import and the steps of the
+    program's initialization take to run.
+
+    Nothing is measured until start gets called. Imports are timed by wrapping
+    the import builtin, so only the modules imported after that are seen.
+    """
+
+    def __init__(self):
+
+        self.__started = None
+        self.__original_import = None
+
+        # Module name -> [total seconds, seconds minus nested imports]
+        self.__imports = {}
+        self.__nested = []
+        self.__importing = []
+
+        self.__steps = []
+
+    def started(self):
+        """SP.started() -> bool"""
+
+        return self.__started is not None
+
+    def start(self):
+        """SP.start()
+
+        Starts measuring.
+        """
+
+        self.__started = timeit.default_timer()
+        self.__original_import = builtins.__import__
+
+        builtins.__import__ = self.__import
+
+    def stop(self):
+        """SP.stop()
+
+        Stops timing the imports.
+        """
+
+        if self.__original_import is not None:
+
+            builtins.__import__ = self.__original_import
+            self.__original_import = None
+
+    def __import(self, name, globals=None, locals=None, fromlist=(),
+                 *args, **kwargs):
+
+        modules = len(sys.modules)
+
+        self.__nested.append(0.)
+        self.__importing.append(name)
+        start = timeit.default_timer()
+
+        try:
+
+            module = self.__original_import(
+                name, globals, locals, fromlist, *args, **kwargs)
+
+        finally:
+
+            total = timeit.default_timer() - start
+            nested = self.__nested.pop()
+            self.__importing.pop()
+
+            if self.__nested:
+                self.__nested[-1] += total
+
+        # With the from form the module imported from is returned, with it's
+        # name resolved
+        key = module.__name__ if fromlist else name
+
+        # Only the imports that loaded something are of interest. A package
+        # importing from itself while being imported is already being timed.
+        if len(sys.modules) > modules and key not in self.__importing:
+
+            timings = self.__imports.setdefault(key, [0., 0.])
+
+            timings[0] += total
+            timings[1] += total - nested
+
+        return module
+
+    @contextlib.contextmanager
+    def step(self, name):
+        """SP.step(name)
+
+        A context manager timing the initialization step with the name.
+        """
+
+        if not self.started():
+
+            yield
+            return
+
+        start = timeit.default_timer()
+
+        try:
+
+            yield
+
+        finally:
+
+            self.__steps.append((name, timeit.default_timer() - start))
+
+    def report(self, output_file=sys.stderr):
+        """SP.report(output_file=sys.stderr)
+
+        Stops measuring and writes the measurements into the file.
+        """
+
+        if not self.started():
+
+            return
+
+        self.stop()
+
+        output_file.write(
+            '%-40s %10s %10s\n' % ('import', 'total ms', 'self ms'))
+
+        for name, (total, own) in sorted(
+                self.__imports.items(), key=lambda item: -item[1][0]):
+
+            if total >= REPORT_THRESHOLD:
+
+                output_file.write('%-40s %10.1f %10.1f\n' % (
+                    name, 1000 * total, 1000 * own))
+
+        output_file.write('\n%-40s %10s\n' % ('initialization', 'ms'))
+
+        for name, seconds in self.__steps:
+
+            output_file.write('%-40s %10.1f\n' % (name, 1000 * seconds))
+
+        output_file.write('\n%-40s %10.1f\n' % (
+            'startup', 1000 * (timeit.default_timer() - self.__started)))
+
+
+# Startup happens once per process
+startup_profile = StartupProfile()
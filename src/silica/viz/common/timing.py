@@ -0,0 +1,341 @@
+# -*- coding: utf-8 -*-
+
+__all__ = [
+    'DrawCounter', 'draw_counter', 'have_timer_queries',
+    'TimedHandler', 'FrameTimings']
+
+import csv
+import timeit
+import collections
+import ctypes as c
+
+import numpy
+from pyglet import gl
+
+
+# The columns of the timings of a handler in a frame
+CPU_MS, GPU_MS, DRAW_CALLS, TRIANGLES = range(4)
+COLUMNS = ['cpu_ms', 'gpu_ms', 'draw_calls', 'triangles']
+
+DEFAULT_HISTORY = 120
+
+# GPU timings usually arrive a frame or two late. When more frames than this
+# wait for them, the oldest ones are waited for.
+MAX_PENDING_FRAMES = 4
+
+
+class DrawCounter(object):
+
+    """Counts the draw calls made and the triangles drawn by them."""
+
+    def __init__(self):
+
+        self.__calls, self.__triangles = 0, 0
+
+    def count(self, triangles):
+        """DC.count(triangles)
+
+        Record a draw call drawing the number of triangles.
+        """
+
+        self.__calls += 1
+        self.__triangles += triangles
+
+    def calls(self):
+        """DC.calls() -> number of draw calls made so far"""
+
+        return self.__calls
+
+    def triangles(self):
+        """DC.triangles() -> number of triangles drawn so far"""
+
+        return self.__triangles
+
+
+# There is a single OpenGL context per process
+draw_counter = DrawCounter()
+
+
+def have_timer_queries():
+    """have_timer_queries() -> bool
+
+    Can the time the GPU spends drawing be measured (ARB_timer_query)?
+    """
+
+    return (gl.gl_info.have_version(3, 3) or
+            gl.gl_info.have_extension('GL_ARB_timer_query'))
+
+
+class TimedHandler(object):
+
+    """Stands in for a window event handler, passing all the events on to it
+    and timing it's on_draw.
+    """
+
+    def __init__(self, name, handler, timings):
+
+        self.__name = name
+        self.__handler = handler
+        self.__timings = timings
+
+        for event in dir(handler):
+
+            if event.startswith('on_') and event != 'on_draw':
+
+                setattr(self, event, getattr(handler, event))
+
+        if hasattr(handler, 'on_draw'):
+
+            self.on_draw = self.__on_draw
+
+    def __on_draw(self):
+
+        self.__timings.begin(self.__name)
+
+        try:
+
+            return self.__handler.on_draw()
+
+        finally:
+
+            self.__timings.end(self.__name)
+
+
+class FrameTimings(object):
+
+    """Timings of the on_draw of window event handlers, frame by frame.
+
+    For each handler (wrapped with instrument) it records the time spent on the
+    CPU, the time spent by the GPU, where timer queries are available, and the
+    number of draw calls made and triangles drawn. The timings of the last
+    history frames are kept for statistics. They can also be written into a CSV
+    file, a row per frame.
+
+    Should be pushed onto the window below all the handlers it times, so that
+    it's on_draw marks the end of each frame.
+    """
+
+    def __init__(self, history=DEFAULT_HISTORY, csv_filename=None):
+
+        self.__names = []
+        self.__gpu = have_timer_queries()
+
+        self.__frame = None
+        self.__pending = collections.deque()
+        self.__history = collections.deque(maxlen=history)
+        self.__free_queries = []
+
+        self.__frame_no = 0
+
+        self.__csv_file, self.__csv = None, None
+
+        if csv_filename is not None:
+
+            self.__csv_file = open(csv_filename, 'w')
+            self.__csv = csv.writer(self.__csv_file)
+
+    def instrument(self, name, handler):
+        """FT.instrument(name, handler) -> TimedHandler
+
+        Wraps the handler, so that it gets timed under the name. All handlers
+        should be instrumented before the first frame gets drawn.
+        """
+
+        self.__names.append(name)
+
+        return TimedHandler(name, handler, self)
+
+    def names(self):
+        """FT.names() -> names of the timed handlers"""
+
+        return list(self.__names)
+
+    def __query(self):
+        """FT.__query() -> name of an unused timer query"""
+
+        if self.__free_queries:
+
+            return self.__free_queries.pop()
+
+        query = gl.GLuint(0)
+        gl.glGenQueries(1, c.byref(query))
+
+        return query.value
+
+    def begin(self, name):
+        """FT.begin(name)
+
+        Starts timing the handler with the name.
+        """
+
+        if self.__frame is None:
+            self.__frame = {}
+
+        query = None
+
+        if self.__gpu:
+
+            query = self.__query()
+            gl.glBeginQuery(gl.GL_TIME_ELAPSED, query)
+
+        self.__frame[name] = [
+            timeit.default_timer(), query,
+            draw_counter.calls(), draw_counter.triangles()]
+
+    def end(self, name):
+        """FT.end(name)
+
+        Stops timing the handler with the name.
+        """
+
+        if self.__gpu:
+            gl.glEndQuery(gl.GL_TIME_ELAPSED)
+
+        record = self.__frame[name]
+
+        record[CPU_MS] = 1000 * (timeit.default_timer() - record[CPU_MS])
+        record[DRAW_CALLS] = draw_counter.calls() - record[DRAW_CALLS]
+        record[TRIANGLES] = draw_counter.triangles() - record[TRIANGLES]
+
+    def on_draw(self):
+
+        if self.__frame is None:
+
+            return
+
+        self.__pending.append(self.__frame)
+        self.__frame = None
+
+        self.__collect()
+
+    def __available(self, frame):
+        """FT.__available(frame) -> bool
+
+        Are the results of all the frame's timer queries available?
+        """
+
+        available = gl.GLint(0)
+
+        for record in frame.values():
+
+            gl.glGetQueryObjectiv(
+                record[GPU_MS], gl.GL_QUERY_RESULT_AVAILABLE,
+                c.byref(available))
+
+            if not available.value:
+
+                return False
+
+        return True
+
+    def __collect(self, wait=False):
+        """FT.__collect(wait=False)
+
+        Finishes the pending frames whose GPU timings are available, in order.
+        With wait set, or when too many frames are pending, the GPU timings
+        are waited for.
+        """
+
+        while self.__pending:
+
+            frame = self.__pending[0]
+
+            if self.__gpu and not (
+                    wait or len(self.__pending) > MAX_PENDING_FRAMES or
+                    self.__available(frame)):
+
+                break
+
+            self.__pending.popleft()
+            self.__finish(frame)
+
+    def __finish(self, frame):
+        """FT.__finish(frame)
+
+        Reads the frame's GPU timings and records the frame.
+        """
+
+        row = numpy.empty((len(self.__names), len(COLUMNS)))
+        row.fill(numpy.nan)
+
+        elapsed = gl.GLuint64(0)
+
+        for i, name in enumerate(self.__names):
+
+            if name not in frame:
+
+                continue
+
+            record = frame[name]
+            query, record[GPU_MS] = record[GPU_MS], None
+
+            if query is not None:
+
+                gl.glGetQueryObjectui64v(
+                    query, gl.GL_QUERY_RESULT, c.byref(elapsed))
+
+                record[GPU_MS] = elapsed.value / 1e6
+                self.__free_queries.append(query)
+
+            row[i] = [numpy.nan if value is None else value
+                      for value in record]
+
+        self.__history.append(row)
+
+        if self.__csv is not None:
+
+            self.__write_row(row)
+
+        self.__frame_no += 1
+
+    def __write_row(self, row):
+        """FT.__write_row(row)
+
+        Writes the frame's timings into the CSV file.
+        """
+
+        if not self.__frame_no:
+
+            self.__csv.writerow(['frame'] + [
+                '%s_%s' % (name, column)
+                for name in self.__names for column in COLUMNS])
+
+        self.__csv.writerow([self.__frame_no] + [
+            '' if numpy.isnan(value) else
+            '%.3f' % value if column in (CPU_MS, GPU_MS) else
+            '%d' % value
+            for timings in row for column, value in enumerate(timings)])
+
+    def statistics(self, name, column, percentiles):
+        """FT.statistics(name, column, percentiles) -> list of values
+
+        The percentiles of one of the columns (CPU_MS, GPU_MS, DRAW_CALLS or
+        TRIANGLES) of the handler's timings over the recorded frames. Values
+        not measured are NaN.
+        """
+
+        values = numpy.array([
+            row[self.__names.index(name), column]
+            for row in self.__history])
+
+        values = values[~numpy.isnan(values)]
+
+        if not len(values):
+
+            return [numpy.nan] * len(percentiles)
+
+        return list(numpy.percentile(values, percentiles))
+
+    def close(self):
+        """FT.close()
+
+        Records the frames still waiting for their GPU timings and closes the
+        CSV file.
+        """
+
+        self.__collect(wait=True)
+
+        if self.__csv_file is not None:
+
+            self.__csv_file.close()
+            self.__csv_file, self.__csv = None, None
@@ -9,41 +9,93 @@ __all__ = [
 import math
 
 import numpy
-from pyglet import gl
 
 from silica.viz.common.constants import AXIS_COUNT
 from silica.viz.common import vector
+from silica.viz.common import quaternion
+from silica.viz.common.redraw import redraw
+
+
+# The number of changes made to all the transforms so far. While it stays the
+# same, the generations of the transforms can't have changed either.
+_changes = 0
 
 
 class Transform(object):
 
-    '''A linear transform of homogeneous coordinates.'''
+    '''A linear transform of homogeneous coordinates.
+
+    Every transform counts the changes made to it. The generation of a
+    transform is the sum of it's own count and the generations of the
+    transforms it depends on, so it changes whenever any of them does. The
+    matrices are only recalculated when they are read and the generation has
+    changed since they were last calculated.
+
+    The generations are cached until any transform changes, so reading the
+    matrices of unchanged transforms doesn't walk the transforms they depend
+    on.
+    '''
 
     def __init__(self):
 
-        self.__used_by = set()
+        self.__changes = 0
+        self.__dependencies = []
+
+        self.__generation = None
+        self.__generation_at = None
+
         self.__matrix = None
-        self.__gl_matrix = None
+        self.__calculated = None
+
+        # The float32 copy for OpenGL lives in the same memory for the whole
+        # life of the transform, only it's contents get refreshed
+        self.__gl_array = numpy.empty((4, 4), dtype=numpy.float32)
+        self.__gl_matrix = numpy.ctypeslib.as_ctypes(
+            self.__gl_array.reshape(-1))
+        self.__gl_calculated = None
 
     def dirty(self):
         """T.dirty()
 
-        Marks the transform as dirty, so that it will be recalculated next time
-        the matrix is requested.
+        Marks the transform as changed, so that it and the transforms using it
+        will be recalculated next time their matrices are requested, and the
+        scene gets redrawn.
         """
 
-        self.__matrix, self.__gl_matrix = None, None
+        global _changes
+
+        self.__changes += 1
+        _changes += 1
 
-        for user in self.__used_by:
-            user.dirty()
+        redraw.invalidate()
 
     def add_user(self, user):
         """T.add_user(user)
 
-        Add a transform that will cascadingly be made dirty when this one does.
+        Add a transform that depends on this one, so that it will be
+        recalculated after this one changes.
         """
 
-        self.__used_by.add(user)
+        user.__dependencies.append(self)
+        user.dirty()
+
+    def generation(self):
+        """T.generation() -> int
+
+        A number that changes whenever the transform or any of the transforms
+        it depends on changes.
+        """
+
+        if self.__generation_at != _changes:
+
+            generation = self.__changes
+
+            for dependency in self.__dependencies:
+                generation += dependency.generation()
+
+            self.__generation, self.__generation_at = generation, _changes
+
+        return self.__generation
 
     def set_matrix(self, matrix):
         """T.set_matrix(matrix)
@@ -62,24 +114,40 @@ class Transform(object):
         raise NotImplementedError(
             'A transform.Transform subtype must implement a calculate method')
 
-    def matrix(self):
-        """T.matrix() -> the transform matrix as a numpy array"""
+    def __refresh(self, generation):
+
+        if generation != self.__calculated:
 
-        if self.__matrix is None:
             self.calculate()
+            self.__calculated = generation
+
+    def matrix(self):
+        """T.matrix() -> the transform matrix as a numpy array
+
+        The array belongs to the transform and may get overwritten in place
+        when the transform is recalculated, so it should be copied to keep the
+        current values.
+        """
+
+        self.__refresh(self.generation())
 
         return self.__matrix
 
     def gl_matrix(self):
-        """T.gl_matrix() -> the matrix as a ctypes array ready for OpenGL"""
+        """T.gl_matrix() -> the matrix as a ctypes array ready for OpenGL
 
-        if self.__gl_matrix is None:
+        The same float32 array is returned every time, refreshed in place when
+        the transform has changed.
+        """
 
-            self.__gl_matrix = (gl.GLfloat * 16)()
+        generation = self.generation()
 
-            for i, elem in enumerate(self.matrix().flat):
+        if generation != self.__gl_calculated:
 
-                self.__gl_matrix[i] = elem
+            self.__refresh(generation)
+
+            self.__gl_array[...] = self.__matrix
+            self.__gl_calculated = generation
 
         return self.__gl_matrix
 
@@ -109,13 +177,19 @@ class Transform(object):
 
 class Product(Transform):
 
-    """A transform resulting from matrix multiplication of it's factors."""
+    """A transform resulting from matrix multiplication of it's factors.
+
+    The partial products of the first factors are kept, so when a factor
+    changes only the multiplications from that factor on get redone.
+    """
 
     def __init__(self):
 
         super(Product, self).__init__()
 
         self.__factors = []
+        self.__factor_generations = []
+        self.__partial_products = []
 
     def add_factor(self, factor):
         """P.add_factor(factor)
@@ -125,20 +199,45 @@ class Product(Transform):
         """
 
         factor.add_user(self)
+
         self.__factors.append(factor)
+        self.__factor_generations.append(None)
+        self.__partial_products.append(numpy.empty((4, 4)))
 
     def calculate(self):
         """P.calculate()
 
         Multiplies the factor matrices first to last and stores as the result
-        transform matrix.
+        transform matrix. The partial products before the first changed factor
+        are reused.
         """
 
-        mat = numpy.eye(4)
-        for factor in self.__factors:
-            mat = mat.dot(factor.matrix())
+        if not self.__factors:
+
+            self.set_matrix(numpy.eye(4))
+            return
+
+        generations = self.__factor_generations
+        products = self.__partial_products
+
+        changed = False
+
+        for i, factor in enumerate(self.__factors):
+
+            generation = factor.generation()
+
+            if not changed and generation == generations[i]:
+                continue
 
-        self.set_matrix(mat)
+            changed = True
+            generations[i] = generation
+
+            if i == 0:
+                products[0][...] = factor.matrix()
+            else:
+                numpy.dot(products[i - 1], factor.matrix(), out=products[i])
+
+        self.set_matrix(products[-1])
 
 
 class BasicAxisRotation(Transform):
@@ -198,57 +297,81 @@ class ChangeBasis(Transform):
 
     """A transform that changes vector coordinates from one Cartesian basis
     into another.
+
+    Both bases should be orthonormal and right-handed, so that the change is a
+    rotation. It is kept as a unit quaternion, which gets normalized after
+    each change, so that rounding errors do not pile up as it is rotated over
+    and over.
     """
 
     def __init__(self, e_0, e_1, e_2):
 
         super(ChangeBasis, self).__init__()
+
+        self.__rotation = numpy.eye(4)
         self.set_basis(e_0, e_1, e_2)
 
+    def orientation(self):
+        """CB.orientation() -> unit quaternion
+
+        The rotation taking the output base vectors into the input ones.
+        """
+
+        return self.__orientation
+
+    def set_orientation(self, orientation):
+        """CB.set_orientation(orientation)
+
+        Sets the rotation by a quaternion, like the one orientation returns.
+        """
+
+        self.__orientation = orientation.unit()
+        self.dirty()
+
     def basis(self):
         """CB.basis() -> tuple of three base vectors"""
 
-        return self.__basis
+        # The base vectors are the rows of the matrix
+        inverse = self.__orientation.conjugate()
+
+        return (
+            inverse.rotate(vector.E_X),
+            inverse.rotate(vector.E_Y),
+            inverse.rotate(vector.E_Z))
 
-    def set_basis(self, e_0, e_1, e_2, dirtify=True):
+    def set_basis(self, e_0, e_1, e_2):
         """CB.set_basis(e_0, e_1, e_2)
 
         Sets the new output basis. The base vectors should be expressed in
         coordinates of the input basis.
         """
 
-        self.__basis = e_0, e_1, e_2
-        if dirtify:
-            self.dirty()
+        self.set_orientation(quaternion.from_basis(e_0, e_1, e_2))
 
-    def calculate(self):
-
-        e_0, e_1, e_2 = self.__basis
-
-        start = numpy.array([
-            [e_0.x, e_0.y, e_0.z, 0],
-            [e_1.x, e_1.y, e_1.z, 0],
-            [e_2.x, e_2.y, e_2.z, 0],
-            [0,     0,     0, 1]])
+    def rotate(self, axis, angle):
+        """CB.rotate(axis, angle)
 
-        if self.__orthogonalize:
+        Rotates the output basis to the right around the axis direction (a
+        Vector in input coordinates) by the given angle.
+        """
 
-            orthogonal = numpy.eye(4)
+        self.set_orientation(
+            self.__orientation *
+            quaternion.from_axis_angle(axis, angle).conjugate())
 
-            U, S, V = numpy.linalg.svd(start)
-            orthogonal[:3, :3] = U.dot(V)[:3, :3]
+    def input_vector(self, v):
+        """CB.input_vector(v) -> vector
 
-            self.set_basis(
-                vector.Vector(*orthogonal[0, :3]),
-                vector.Vector(*orthogonal[1, :3]),
-                vector.Vector(*orthogonal[2, :3]),
-                dirtify=False)
+        The inverse of the change of basis: the vector v, given in output
+        coordinates, expressed in input coordinates.
+        """
 
-            self.set_matrix(orthogonal)
+        return self.__orientation.conjugate().rotate(v)
 
-        else:
+    def calculate(self):
 
-            self.set_matrix(start)
+        self.__orientation.write_matrix(self.__rotation)
+        self.set_matrix(self.__rotation)
 
 
 class Scale(Transform):
@@ -8,6 +8,8 @@ class Vector(object):
 
     """A 3D vector in some Cartesian basis"""
 
+    __slots__ = ('x', 'y', 'z')
+
     def __init__(self, x=0, y=0, z=0):
 
         if isinstance(x, numbers.Integral):
@@ -112,11 +114,18 @@ class Vector(object):
         Rotates V to the right around the axis direction by the given angle.
         """
 
-        parallel, orthogonal = self.decompose(axis)
+        length = abs(axis)
+        k_x, k_y, k_z = axis.x / length, axis.y / length, axis.z / length
+
+        cos, sin = math.cos(angle), math.sin(angle)
 
-        return parallel + abs(orthogonal) * (
-            math.cos(angle) * orthogonal.unit() +
-            math.sin(angle) * axis.unit().cross(orthogonal.unit()))
+        # Rodrigues' rotation formula
+        along = (k_x * self.x + k_y * self.y + k_z * self.z) * (1 - cos)
+
+        return Vector(
+            self.x * cos + (k_y * self.z - k_z * self.y) * sin + k_x * along,
+            self.y * cos + (k_z * self.x - k_x * self.z) * sin + k_y * along,
+            self.z * cos + (k_x * self.y - k_y * self.x) * sin + k_z * along)
 
 
 E_X, E_Y, E_Z = Vector(x=1), Vector(y=1), Vector(z=1)
@@ -1,99 +1,40 @@
 # -*- coding: utf-8 -*-
 
-import os.path
 import sys
-import math
-import logging
 
-import pyglet
-from pyglet import gl
-
-from silica.viz.common import shaders
-from silica.viz.common import transform
-from silica.viz.common.transform.dicts import common_transforms
-from silica.viz.common.constants import *
-from silica.viz.common.camera import Cameraman, cam_transforms
-from silica.viz.common.axes import Axes
-from silica.viz.glass.glass import Glass
-from silica.viz.glass.fog import Fog
-from silica.viz.glass.config import Config, ArgsParser
-from silica.viz.glass.particles import Particles
-
-
-class DisplayApp(object):
-
-    """Main object"""
-
-    def __init__(self, config):
-
-        self.__window = config.create_window()
-        keys = pyglet.window.key.KeyStateHandler()
-        transforms = {}
-
-        common_transforms(transforms, config, self.__window)
-        cam_transforms(transforms, config)
-
-        cam = transforms['camera']
-
-        self.__window.push_handlers(
-            Axes(config, transforms, self.__window))
-
-        self.__window.push_handlers(
-            Fog(config, cam))
-
-        if config.particle_file() is not None:
-
-            if not os.path.exists(config.particle_file()):
-
-                logging.error(
-                    "Specified particle file '%s' does not exits",
-                    config.particle_file())
+from silica.viz.common.startup import startup_profile
 
-            elif os.path.isdir(config.particle_file()):
+# The imports should be timed too, so the profile can't wait for the
+# arguments to be parsed
+if __name__ == '__main__' and '--startup-profile' in sys.argv[1:]:
+    startup_profile.start()
 
-                logging.error(
-                    "Specified particles file '%s' is a directory",
-                    config.particle_file())
-
-            else:
-
-                self.__window.push_handlers(
-                    Particles(config, cam))
-
-        if config.glass_specified():
-
-            self.__window.push_handlers(
-                Glass(config, cam))
-
-        self.__window.push_handlers(
-            Cameraman(config, keys, transforms))
-
-        self.__window.push_handlers(
-            keys)
+import pyglet
 
-        pyglet.clock.set_fps_limit(config.max_fps())
+from silica.viz.glass.config import Config, ArgsParser
 
-        self.__config = config
 
-    def run(self):
-        """DA.run()
+if __name__ == '__main__':
 
-        Runs the app.
-        """
+    args = ArgsParser().parse_args(sys.argv[1:])
+    config = Config(args)
 
-        if not gl.gl_info.have_version(2, 1):
+    if config.render_directory() is not None:
 
-            raise RuntimeError('OpenGL 2.1 required!')
+        # Has to be chosen before pyglet's OpenGL bindings get imported
+        pyglet.options['headless'] = True
 
-        gl.glEnable(gl.GL_DEPTH_TEST)
+        if config.render_workers() > 1:
 
-        pyglet.app.run()
+            from silica.viz.glass.batch import render_in_parallel
+            render_in_parallel(config)
 
+        else:
 
-if __name__ == '__main__':
+            from silica.viz.glass.render import render_frames
+            render_frames(config)
 
-    shaders.shader_path.append(os.path.dirname(__file__))
+    else:
 
-    args = ArgsParser().parse_args(sys.argv[1:])
-    config = Config(args)
-    DisplayApp(config).run()
+        from silica.viz.glass.app import DisplayApp
+        DisplayApp(config).run()
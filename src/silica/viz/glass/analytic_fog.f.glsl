@@ -0,0 +1,125 @@
+#version 120
+
+uniform mat4 inverse_camera;
+uniform vec2 viewport_size;
+uniform sampler2D scene_depth;
+
+// The outermost fog layer of the uncopied glass
+uniform vec3 low;
+uniform vec3 high;
+
+uniform float layer_count;
+uniform vec4 color;
+
+varying vec3 copy_offset;
+
+vec3 unproject(vec2 ndc, float window_depth) {
+
+	vec4 point = inverse_camera * vec4(ndc, 2.0 * window_depth - 1.0, 1.0);
+
+	return point.xyz / point.w;
+}
+
+// How far inside the outermost layer the point is. The i-th layer (counting
+// from 0) contains the points with an inset of at least i.
+float inset(vec3 point, vec3 lo, vec3 hi) {
+
+	vec3 below = point - lo;
+	vec3 above = hi - point;
+
+	return min(
+			min(min(below.x, below.y), below.z),
+			min(min(above.x, above.y), above.z));
+}
+
+float layers_containing(float point_inset) {
+
+	return clamp(floor(point_inset) + 1.0, 0.0, layer_count);
+}
+
+void main(void) {
+
+	vec3 lo = low + copy_offset;
+	vec3 hi = high + copy_offset;
+
+	vec2 screen = gl_FragCoord.xy / viewport_size;
+	vec2 ndc = 2.0 * screen - 1.0;
+
+	// The ray through the pixel goes from t = 0 at the near plane to t = 1 at
+	// the far plane
+	vec3 near = unproject(ndc, 0.0);
+	vec3 dir = unproject(ndc, 1.0) - near;
+
+	vec3 safe_dir = mix(dir, vec3(1e-30), vec3(equal(dir, vec3(0.0))));
+
+	// Where the ray enters and leaves the outermost layer
+	vec3 t_lo = (lo - near) / safe_dir;
+	vec3 t_hi = (hi - near) / safe_dir;
+
+	vec3 t_min = min(t_lo, t_hi);
+	vec3 t_max = max(t_lo, t_hi);
+
+	float t_enter = max(max(t_min.x, t_min.y), t_min.z);
+	float t_exit = min(min(t_max.x, t_max.y), t_max.z);
+
+	// Both the front and the back faces of the box get drawn, but each ray
+	// should only be accounted for once -- at the back face
+	vec3 fragment = unproject(ndc, gl_FragCoord.z);
+	float t_fragment = dot(fragment - near, dir) / dot(dir, dir);
+
+	if (abs(t_fragment - t_exit) > abs(t_fragment - t_enter)) {
+		discard;
+	}
+
+	vec3 scene = unproject(ndc, texture2D(scene_depth, screen).r);
+	float t_scene = dot(scene - near, dir) / dot(dir, dir);
+
+	float t_start = max(t_enter, 0.0);
+	float t_end = min(t_exit, t_scene);
+
+	if (t_end <= t_start) {
+		discard;
+	}
+
+	// The inset is the minimum of six linear functions of t. Along the ray it
+	// grows, peaks and then falls, so the peak lies at one of the ends or
+	// where two of the functions meet.
+	float a[6];
+	float b[6];
+
+	a[0] = near.x - lo.x; b[0] = dir.x;
+	a[1] = near.y - lo.y; b[1] = dir.y;
+	a[2] = near.z - lo.z; b[2] = dir.z;
+	a[3] = hi.x - near.x; b[3] = -dir.x;
+	a[4] = hi.y - near.y; b[4] = -dir.y;
+	a[5] = hi.z - near.z; b[5] = -dir.z;
+
+	float start_inset = inset(near + t_start * dir, lo, hi);
+	float end_inset = inset(near + t_end * dir, lo, hi);
+
+	float peak = max(start_inset, end_inset);
+
+	for (int i = 0; i < 6; i++) {
+		for (int j = i + 1; j < 6; j++) {
+
+			float slope = b[i] - b[j];
+
+			if (slope != 0.0) {
+
+				float t = clamp((a[j] - a[i]) / slope, t_start, t_end);
+
+				peak = max(peak, inset(near + t * dir, lo, hi));
+			}
+		}
+	}
+
+	// Entering or leaving the outermost layer is a crossing too
+	float start_layers = t_enter > 0.0 ? 0.0 : layers_containing(start_inset);
+	float end_layers = t_exit < t_scene ? 0.0 : layers_containing(end_inset);
+
+	// Each layer surface crossed in front of the scene blends the fog color in
+	// once
+	float crossings = 2.0 * layers_containing(peak) - start_layers - end_layers;
+
+	gl_FragColor = vec4(color.rgb, 1.0 - pow(1.0 - color.a, crossings));
+}
@@ -0,0 +1,14 @@
+#version 120
+
+uniform mat4 camera;
+
+attribute vec3 position;
+
+varying vec3 copy_offset;
+
+void main(void) {
+
+	copy_offset = shift();
+
+	gl_Position = camera * vec4(copy_offset + position, 1.0);
+}
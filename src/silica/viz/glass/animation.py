@@ -0,0 +1,725 @@
+# -*- coding: utf-8 -*-
+
+__all__ = [
+    'AnimationBuilder', 'ParticleAnimation', 'FrameSource',
+    'ArrayFrameSource', 'TextFrameSource', 'TrajectoryFrameSource',
+    'DeltaFrameSource', 'animation_from_file']
+
+import os
+import math
+import struct
+import logging
+import itertools
+import threading
+import collections
+
+import numpy
+
+from silica.viz.common.constants import *
+from silica.viz.glass import trajectory
+
+
+ANGLES_PER_ORIENTATION = 2
+COMPONENTS_PER_STATE = COORDINATES_PER_VERTEX + ANGLES_PER_ORIENTATION
+
+DEFAULT_CACHE_SIZE = 64
+DEFAULT_PREFETCH = 16
+
+SCAN_CHUNK_SIZE = 1 << 24
+
+DEFAULT_KEYFRAME_INTERVAL = 64
+DEFAULT_ANGLE_TOLERANCE = math.pi / 1024
+
+# The bytes that frame_offsets treats as whitespace, by value
+BLANK_BYTES = numpy.zeros(256, dtype=bool)
+BLANK_BYTES[[ord(c) for c in ' \t\n\r\v\f']] = True
+
+INDEX_SUFFIX = '.idx'
+INDEX_MAGIC = b'SILIDX\0\0'
+INDEX_HEADER = struct.Struct('<8sQdQQ')
+
+
+class FrameSource(object):
+
+    """Decodes the frames of a particle animation, one at a time.
+
+    A frame is an array of shape (particle_count, COMPONENTS_PER_STATE). The
+    first three components of each row hold the particle's position, the other
+    two -- it's orientation angles.
+    """
+
+    def particle_count(self):
+        """FS.particle_count() -> number of particles in each frame"""
+
+        raise NotImplementedError(
+            self.__class__.__name__, self.particle_count.__name__)
+
+    def frame_count(self):
+        """FS.frame_count() -> number of frames"""
+
+        raise NotImplementedError(
+            self.__class__.__name__, self.frame_count.__name__)
+
+    def read_frame(self, no):
+        """FS.read_frame(no) -> array
+
+        Decodes the no-th frame. Calls need not be thread safe.
+        """
+
+        raise NotImplementedError(
+            self.__class__.__name__, self.read_frame.__name__)
+
+
+class ArrayFrameSource(FrameSource):
+
+    """Frames already held in memory"""
+
+    def __init__(self, particle_count, frames):
+
+        self.__particle_count = particle_count
+        self.__frames = frames
+
+    def particle_count(self):
+
+        return self.__particle_count
+
+    def frame_count(self):
+
+        return len(self.__frames)
+
+    def read_frame(self, no):
+
+        return self.__frames[no]
+
+
+def frame_offsets(input_file, particle_count):
+    """frame_offsets(input_file, particle_count) -> array of byte offsets
+
+    Scans a particle animation text file (opened in binary mode) from it's
+    current position to the end. Returns the offset of each complete frame --
+    the start of the file or the end of the last line of the previous frame.
+    Blank lines are skipped, so they may precede the frame's first line.
+    """
+
+    if particle_count <= 0:
+
+        raise ValueError(
+            'Frames need a positive particle count, not %d' % particle_count)
+
+    offsets = [numpy.array([input_file.tell()], dtype=numpy.int64)]
+    line_count, position, pending = 0, input_file.tell(), 0
+
+    while True:
+
+        chunk = input_file.read(SCAN_CHUNK_SIZE)
+
+        if not chunk:
+            break
+
+        data = numpy.frombuffer(chunk, dtype=numpy.uint8)
+        newlines = numpy.flatnonzero(data == ord('\n'))
+
+        # The number of characters other than whitespace in the parts of the
+        # chunk starting at the beginning and after each newline. The first
+        # part continues the line left unfinished by the previous chunk.
+        starts = numpy.concatenate(([0], newlines + 1))
+        starts = starts[starts < len(data)]
+
+        filled = numpy.add.reduceat(
+            ~BLANK_BYTES[data], starts, dtype=numpy.int64)
+        filled[0] += pending
+
+        lines = filled[:len(newlines)] > 0
+        pending = filled[len(newlines)] if len(filled) > len(newlines) else 0
+
+        # Frames end with the newlines ending every particle_count-th line
+        numbers = line_count + numpy.cumsum(lines)
+        ends = lines & (numbers % particle_count == 0)
+
+        offsets.append((newlines[ends] + position + 1).astype(numpy.int64))
+
+        line_count += numpy.count_nonzero(lines)
+        position += len(chunk)
+
+    # The last line might not have a newline at it's end
+    if pending:
+        line_count += 1
+
+    frame_count = line_count // particle_count
+
+    return numpy.concatenate(offsets)[:frame_count]
+
+
+def read_frame_index(index_name, file_stat, particle_count):
+    """read_frame_index(index_name, file_stat, particle_count) -> offsets or None
+
+    Reads the frame offsets from an index file. Returns None when the index is
+    missing, damaged or was made for a file with a different size,
+    modification time or particle count.
+    """
+
+    try:
+
+        with open(index_name, 'rb') as index_file:
+
+            header = index_file.read(INDEX_HEADER.size)
+
+            if len(header) < INDEX_HEADER.size:
+                return None
+
+            magic, size, mtime, particles, frames = INDEX_HEADER.unpack(
+                header)
+
+            if (magic != INDEX_MAGIC or
+                    size != file_stat.st_size or
+                    mtime != file_stat.st_mtime or
+                    particles != particle_count):
+                return None
+
+            offsets = numpy.fromfile(
+                index_file, dtype=numpy.dtype('<i8'), count=frames)
+
+    except (IOError, OSError):
+
+        return None
+
+    if len(offsets) != frames:
+        return None
+
+    return offsets.astype(numpy.int64)
+
+
+def write_frame_index(index_name, file_stat, particle_count, offsets):
+    """write_frame_index(index_name, file_stat, particle_count, offsets)
+
+    Stores the frame offsets of a particle animation text file in an index
+    file. The index is written to a temporary file first and then moved into
+    place, so concurrent readers never see a partial index. Failures are only
+    logged -- the index is just an optimization.
+    """
+
+    temporary_name = '%s.%d.tmp' % (index_name, os.getpid())
+
+    try:
+
+        with open(temporary_name, 'wb') as index_file:
+
+            index_file.write(INDEX_HEADER.pack(
+                INDEX_MAGIC, file_stat.st_size, file_stat.st_mtime,
+                particle_count, len(offsets)))
+
+            offsets.astype(numpy.dtype('<i8')).tofile(index_file)
+
+        os.rename(temporary_name, index_name)
+
+    except (IOError, OSError) as err:
+
+        logging.info("Could not write frame index '%s': %s", index_name, err)
+
+        if os.path.exists(temporary_name):
+            os.remove(temporary_name)
+
+
+def indexed_frame_offsets(filename, input_file, particle_count):
+    """indexed_frame_offsets(filename, input_file, particle_count) -> offsets
+
+    Like frame_offsets, but reuses the offsets stored in the file's index
+    (the file name with INDEX_SUFFIX appended) when it is up to date.
+    Otherwise the file gets scanned and the index (re)written.
+    """
+
+    index_name = filename + INDEX_SUFFIX
+    file_stat = os.stat(filename)
+
+    offsets = read_frame_index(index_name, file_stat, particle_count)
+
+    if offsets is None:
+
+        offsets = frame_offsets(input_file, particle_count)
+        write_frame_index(index_name, file_stat, particle_count, offsets)
+
+    return offsets
+
+
+class TextFrameSource(FrameSource):
+
+    """Frames decoded on demand from a particle animation text file
+
+    The first line of the file holds the particle count. Each following line
+    describes a particle with six numbers -- it's position and magnetic
+    moment. Frames follow each other without any delimiters.
+
+    The byte offsets at which frames start are kept in an index file next to
+    the animation file, so only the first opening has to scan it all.
+    """
+
+    def __init__(self, filename):
+
+        self.__file = open(filename, 'rb')
+
+        self.__particle_count = trajectory.read_particle_count(self.__file)
+        self.__offsets = indexed_frame_offsets(
+            filename, self.__file, self.__particle_count)
+
+    def particle_count(self):
+
+        return self.__particle_count
+
+    def frame_count(self):
+
+        return len(self.__offsets)
+
+    def read_frame(self, no):
+
+        self.__file.seek(self.__offsets[no])
+
+        if no + 1 < len(self.__offsets):
+
+            text = self.__file.read(self.__offsets[no + 1] - self.__offsets[no])
+
+        else:
+
+            lines = (
+                line for line in iter(self.__file.readline, b'')
+                if line.strip())
+            text = b''.join(itertools.islice(lines, self.__particle_count))
+
+        return AnimationBuilder.states_to_frames(
+            trajectory.parse_states(text, self.__particle_count))
+
+
+class TrajectoryFrameSource(FrameSource):
+
+    """Frames read from a memory-mapped trajectory file
+
+    See README.mkd for the file format.
+    """
+
+    def __init__(self, filename):
+
+        self.__frames = trajectory.open_trajectory(filename)
+
+    def particle_count(self):
+
+        return self.__frames.shape[2]
+
+    def frame_count(self):
+
+        return self.__frames.shape[0]
+
+    def read_frame(self, no):
+
+        return AnimationBuilder.states_to_frames(self.__frames[no].T)
+
+
+def wrap_angles(angles):
+    """wrap_angles(angles) -> array
+
+    The angles brought into the range [-pi, pi).
+    """
+
+    return (angles + math.pi) % (2 * math.pi) - math.pi
+
+
+class DeltaFrameSource(FrameSource):
+
+    """Frames of another source, compressed in memory
+
+    Every keyframe_interval-th frame is kept whole. The other frames are kept
+    as differences from the frame before them, quantized to 16 bit integer
+    multiples of twice the position tolerance and 8 bit integer multiples of
+    twice the angle tolerance. The differences are taken against the frame as
+    it will be decoded, so the errors do not pile up along the animation and
+    stay within the tolerances. A frame whose differences do not fit the
+    integers is kept whole as well.
+
+    All the frames are read from the source and encoded up front.
+    """
+
+    def __init__(self, source, tolerance,
+                 angle_tolerance=DEFAULT_ANGLE_TOLERANCE,
+                 keyframe_interval=DEFAULT_KEYFRAME_INTERVAL):
+
+        if tolerance <= 0 or angle_tolerance <= 0:
+
+            raise ValueError('The tolerances must be positive')
+
+        self.__particle_count = source.particle_count()
+        self.__frame_count = source.frame_count()
+
+        self.__position_step = 2. * tolerance
+        self.__angle_step = 2. * angle_tolerance
+
+        shape = (self.__frame_count, self.__particle_count)
+
+        self.__position_deltas = numpy.zeros(
+            shape + (COORDINATES_PER_VERTEX, ), dtype=numpy.int16)
+        self.__angle_deltas = numpy.zeros(
+            shape + (ANGLES_PER_ORIENTATION, ), dtype=numpy.int8)
+
+        # Number of the keyframe each frame is encoded against
+        self.__keyframe_of = numpy.zeros(self.__frame_count, dtype=numpy.intp)
+        self.__keyframes = {}
+
+        self.__encode(source, keyframe_interval)
+
+    def __encode(self, source, keyframe_interval):
+        """DFS.__encode(source, keyframe_interval)
+
+        Reads and encodes all the frames of the source.
+        """
+
+        position_limit = numpy.iinfo(numpy.int16).max
+        angle_limit = numpy.iinfo(numpy.int8).max
+
+        since_keyframe = 0
+        for no in range(self.__frame_count):
+
+            frame = source.read_frame(no)
+
+            if no and since_keyframe < keyframe_interval:
+
+                position_delta = numpy.round(
+                    (frame[:, :COORDINATES_PER_VERTEX] - positions) /
+                    self.__position_step)
+
+                angle_delta = numpy.round(wrap_angles(
+                    frame[:, COORDINATES_PER_VERTEX:] - angles) /
+                    self.__angle_step)
+
+                if (numpy.abs(position_delta).max() <= position_limit and
+                        numpy.abs(angle_delta).max() <= angle_limit):
+
+                    self.__position_deltas[no] = position_delta
+                    self.__angle_deltas[no] = angle_delta
+                    self.__keyframe_of[no] = self.__keyframe_of[no - 1]
+
+                    # Follow the decoder, rather than the source
+                    positions = positions + position_delta * self.__position_step
+                    angles = angles + angle_delta * self.__angle_step
+
+                    since_keyframe += 1
+                    continue
+
+            keyframe = numpy.array(frame, dtype=numpy.float32)
+
+            self.__keyframes[no] = keyframe
+            self.__keyframe_of[no] = no
+
+            positions = keyframe[:, :COORDINATES_PER_VERTEX].astype(
+                numpy.float64)
+            angles = keyframe[:, COORDINATES_PER_VERTEX:].astype(numpy.float64)
+
+            since_keyframe = 1
+
+    def particle_count(self):
+
+        return self.__particle_count
+
+    def frame_count(self):
+
+        return self.__frame_count
+
+    def nbytes(self):
+        """DFS.nbytes() -> number of bytes taken up by the encoded frames"""
+
+        return (
+            self.__position_deltas.nbytes + self.__angle_deltas.nbytes +
+            self.__keyframe_of.nbytes +
+            sum(keyframe.nbytes for keyframe in self.__keyframes.values()))
+
+    def read_frame(self, no):
+
+        key_no = self.__keyframe_of[no]
+        keyframe = self.__keyframes[key_no]
+
+        if key_no == no:
+
+            return keyframe.copy()
+
+        position_sum = self.__position_deltas[key_no + 1:no + 1].sum(
+            axis=0, dtype=numpy.int64)
+        angle_sum = self.__angle_deltas[key_no + 1:no + 1].sum(
+            axis=0, dtype=numpy.int64)
+
+        frame = numpy.empty_like(keyframe)
+
+        frame[:, :COORDINATES_PER_VERTEX] = (
+            keyframe[:, :COORDINATES_PER_VERTEX] +
+            position_sum * self.__position_step)
+
+        frame[:, COORDINATES_PER_VERTEX:] = wrap_angles(
+            keyframe[:, COORDINATES_PER_VERTEX:] +
+            angle_sum * self.__angle_step)
+
+        return frame
+
+
+class AnimationBuilder(object):
+
+    """A builder object for ParticleAnimations"""
+
+    def __init__(self, particle_count):
+
+        self.__particle_count = particle_count
+        self.__in_current_frame = 0
+        self.__frames = []
+
+        self.__start_frame()
+
+    def __start_frame(self):
+        """AB.__start_frame()
+
+        Starts a new frame.
+        """
+
+        self.__in_current_frame = 0
+
+        self.__frames.append(numpy.zeros(
+            (self.__particle_count, COMPONENTS_PER_STATE),
+            dtype=numpy.float32))
+
+    @staticmethod
+    def vector_to_angles(vector):
+        """vector_to_angles((x, y, z)) -> rho, theta
+
+        Calculates the angular representation of the direction the vector with
+        the given components is pointing in.
+        """
+
+        x, y, z = vector
+
+        phi = math.atan2(y, x)
+        theta = math.atan2(z, math.sqrt(x ** 2 + y ** 2))
+
+        return phi, theta
+
+    @staticmethod
+    def vectors_to_angles(x, y, z):
+        """vectors_to_angles(x, y, z) -> rho, theta
+
+        Vectorized vector_to_angles. The arguments are arrays of vector
+        components, the results -- arrays of angles.
+        """
+
+        phi = numpy.arctan2(y, x)
+        theta = numpy.arctan2(z, numpy.hypot(x, y))
+
+        return phi, theta
+
+    @staticmethod
+    def states_to_frames(states):
+        """states_to_frames(states) -> float32 array
+
+        Converts particle states as found in files -- arrays with the position
+        and magnetic moment in the last axis -- into frame data, with the
+        moment replaced by it's orientation angles. Works on any number of
+        particles and frames at once.
+        """
+
+        r_x, r_y, r_z, m_x, m_y, m_z = numpy.rollaxis(states, -1)
+
+        phi, theta = AnimationBuilder.vectors_to_angles(m_x, m_y, m_z)
+
+        return numpy.stack(
+            (r_x, r_y, r_z, phi, theta), axis=-1).astype(numpy.float32)
+
+    def add_particle_state(self, position, orientation):
+        """AB.add_particle_state(pos, dir)
+
+        Both arguments are tuples. The first one is a particle's absolute space
+        position. The second -- it's orientation as angles of rotation around
+        the z and y axis.
+        """
+
+        if self.__in_current_frame == self.__particle_count:
+            self.__start_frame()
+
+        frame = self.__frames[-1]
+        frame[self.__in_current_frame, :COORDINATES_PER_VERTEX] = position
+        frame[self.__in_current_frame, COORDINATES_PER_VERTEX:] = orientation
+
+        self.__in_current_frame += 1
+
+    def build(self):
+        """AB.build() -> ParticleAnimation"""
+
+        return ParticleAnimation(
+            ArrayFrameSource(self.__particle_count, self.__frames),
+            prefetch=0)
+
+
+class ParticleAnimation(object):
+
+    """A sequence of frames
+
+    The frames are decoded from a FrameSource when first needed and kept in a
+    least-recently-used cache. A background thread decodes the frames that
+    will soon be needed, ahead of the last hinted frame in the direction of
+    playback.
+    """
+
+    def __init__(self, source, cache_size=DEFAULT_CACHE_SIZE,
+                 prefetch=DEFAULT_PREFETCH):
+
+        self.__source = source
+
+        # The cache must fit the prefetched frames and the current one
+        self.__cache_size = max(cache_size, prefetch + 1)
+        self.__prefetch = min(prefetch, source.frame_count() - 1)
+
+        self.__cache = collections.OrderedDict()
+        self.__cache_lock = threading.Lock()
+        self.__source_lock = threading.Lock()
+
+        self.__hint = None
+        self.__hinted = threading.Condition()
+
+        if self.__prefetch > 0:
+
+            prefetcher = threading.Thread(target=self.__prefetch_loop)
+            prefetcher.daemon = True
+            prefetcher.start()
+
+    @staticmethod
+    def test_animation(particle_count, frame_count):
+        """ParticleAnimation.test_animation(particle_count, frame_count) -> ParticleAnimation
+
+        An example ParticleAnimation"""
+
+        builder = AnimationBuilder(particle_count)
+
+        for frame_no in range(frame_count):
+            for particle_no in range(particle_count):
+
+                builder.add_particle_state(
+                    (6 * particle_no, 0, 0),
+                    (2 * math.pi / frame_count * (particle_no + frame_no), 0))
+
+        return builder.build()
+
+    def __cached(self, no):
+        """PA.__cached(no) -> array or None
+
+        The no-th frame if it's in the cache, None otherwise.
+        """
+
+        with self.__cache_lock:
+
+            frame = self.__cache.pop(no, None)
+
+            if frame is not None:
+                self.__cache[no] = frame
+
+            return frame
+
+    def __load(self, no):
+        """PA.__load(no) -> array
+
+        Decodes the no-th frame and puts it into the cache.
+        """
+
+        with self.__source_lock:
+
+            frame = self.__cached(no)
+
+            if frame is None:
+                frame = self.__source.read_frame(no)
+
+        with self.__cache_lock:
+
+            self.__cache[no] = frame
+
+            while len(self.__cache) > self.__cache_size:
+                self.__cache.popitem(last=False)
+
+        return frame
+
+    def frame(self, no):
+        """PA.frame(no) -> array of shape (particle_count, COMPONENTS_PER_STATE)
+
+        The state of all the particles in the no-th frame. The first three
+        components of each row hold the particle's position, the other two --
+        it's orientation angles.
+        """
+
+        frame = self.__cached(no)
+
+        if frame is None:
+            frame = self.__load(no)
+
+        return frame
+
+    def hint(self, no, direction):
+        """PA.hint(no, direction)
+
+        Let the animation know that the no-th frame is being shown and that
+        playback goes in the given direction (1 or -1), so that the following
+        frames can be prefetched.
+        """
+
+        with self.__hinted:
+
+            self.__hint = no, direction
+            self.__hinted.notify()
+
+    def __prefetch_loop(self):
+        """PA.__prefetch_loop()
+
+        Body of the prefetching thread.
+        """
+
+        while True:
+
+            with self.__hinted:
+
+                while self.__hint is None:
+                    self.__hinted.wait()
+
+                hint, self.__hint = self.__hint, None
+
+            no, direction = hint
+
+            for step in range(1, self.__prefetch + 1):
+
+                # Start over as soon as playback moves on
+                if self.__hint is not None:
+                    break
+
+                ahead = (no + direction * step) % self.frame_count()
+
+                if self.__cached(ahead) is None:
+                    self.__load(ahead)
+
+    def frame_count(self):
+        """PA.frame_count() -> number of frames"""
+
+        return self.__source.frame_count()
+
+    def particle_count(self):
+        """PA.particle_count() -> the number of particles being displayed"""
+
+        return self.__source.particle_count()
+
+
+def animation_from_file(filename, cache_size=DEFAULT_CACHE_SIZE,
+                        prefetch=DEFAULT_PREFETCH, tolerance=None,
+                        keyframe_interval=DEFAULT_KEYFRAME_INTERVAL):
+    """animation_from_file(filename, cache_size=DEFAULT_CACHE_SIZE, prefetch=DEFAULT_PREFETCH, tolerance=None, keyframe_interval=DEFAULT_KEYFRAME_INTERVAL) -> ParticleAnimation
+
+    Open a paticle animation file -- either a text file or a trajectory
+    file. The frames get decoded from it on demand. When a position tolerance
+    is given, the whole animation is loaded into memory up front, compressed
+    with a DeltaFrameSource.
+    """
+
+    if trajectory.is_trajectory(filename):
+        source = TrajectoryFrameSource(filename)
+    else:
+        source = TextFrameSource(filename)
+
+    if tolerance is not None:
+        source = DeltaFrameSource(
+            source, tolerance, keyframe_interval=keyframe_interval)
+
+    return ParticleAnimation(source, cache_size, prefetch)
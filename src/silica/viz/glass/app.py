@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+
+__all__ = ['DisplayApp']
+
+import os.path
+import logging
+
+import pyglet
+from pyglet import gl
+
+from silica.viz.common import shaders
+from silica.viz.common.transform.dicts import common_transforms
+from silica.viz.common.glstate import gl_state
+from silica.viz.common.timing import FrameTimings
+from silica.viz.common.hud import TimingOverlay
+from silica.viz.common.startup import startup_profile
+from silica.viz.common.redraw import redraw
+from silica.viz.common.camera import Cameraman, cam_transforms
+from silica.viz.common.axes import Axes
+from silica.viz.glass.glass import Glass
+from silica.viz.glass.fog import Fog, AnalyticFog
+from silica.viz.glass.particles import Particles
+
+
+class DisplayApp(object):
+
+    """Main object"""
+
+    def __init__(self, config, window=None):
+
+        if window is None:
+
+            with startup_profile.step('window'):
+                window = config.create_window()
+
+        self.__window = window
+
+        # The window is only redrawn when the scene changes
+        redraw.watch(self.__window)
+
+        keys = pyglet.window.key.KeyStateHandler()
+        transforms = {}
+
+        common_transforms(transforms, config, self.__window)
+        cam_transforms(transforms, config)
+
+        cam = transforms['camera']
+
+        self.__transforms = transforms
+        self.__particles = None
+
+        # The overlay and the end of the frame timings go below everything
+        # else, so that they come last
+        self.__timings = FrameTimings(csv_filename=config.timing_csv())
+
+        self.__window.push_handlers(
+            TimingOverlay(self.__timings, self.__window))
+
+        self.__window.push_handlers(
+            self.__timings)
+
+        with startup_profile.step('axes'):
+
+            self.__push(
+                'axes', Axes(config, transforms, self.__window))
+
+        with startup_profile.step('fog'):
+
+            if config.fog_mode() == 'layers':
+
+                self.__push(
+                    'fog', Fog(config, cam))
+
+            elif config.fog_mode() == 'analytic':
+
+                self.__push(
+                    'fog', AnalyticFog(config, cam))
+
+        if config.particle_file() is not None:
+
+            if not os.path.exists(config.particle_file()):
+
+                logging.error(
+                    "Specified particle file '%s' does not exits",
+                    config.particle_file())
+
+            elif os.path.isdir(config.particle_file()):
+
+                logging.error(
+                    "Specified particles file '%s' is a directory",
+                    config.particle_file())
+
+            else:
+
+                with startup_profile.step('particles'):
+
+                    self.__particles = Particles(config, cam)
+
+                self.__push(
+                    'particles', self.__particles)
+
+        if config.glass_specified():
+
+            with startup_profile.step('glass'):
+
+                self.__push(
+                    'glass', Glass(config, cam))
+
+        self.__push(
+            'camera', Cameraman(config, keys, transforms))
+
+        self.__window.push_handlers(
+            keys)
+
+        self.__config = config
+
+    def __push(self, name, handler):
+        """DA.__push(name, handler)
+
+        Pushes the handler onto the window, timed under the name.
+        """
+
+        self.__window.push_handlers(
+            self.__timings.instrument(name, handler))
+
+    def window(self):
+        """DA.window() -> the window the app draws into"""
+
+        return self.__window
+
+    def transforms(self):
+        """DA.transforms() -> dict of the app's transforms"""
+
+        return self.__transforms
+
+    def particles(self):
+        """DA.particles() -> Particles or None
+
+        None when no particles are displayed.
+        """
+
+        return self.__particles
+
+    def prepare_gl(self):
+        """DA.prepare_gl()
+
+        Checks the OpenGL version and sets up the state needed for drawing.
+        """
+
+        if not gl.gl_info.have_version(2, 1):
+
+            raise RuntimeError('OpenGL 2.1 required!')
+
+        gl_state.enable(gl.GL_DEPTH_TEST)
+
+    def run(self):
+        """DA.run()
+
+        Runs the app.
+        """
+
+        self.prepare_gl()
+
+        startup_profile.report()
+
+        pyglet.app.run()
+
+        self.finish()
+
+    def finish(self):
+        """DA.finish()
+
+        Writes out the timings of the frames drawn.
+        """
+
+        self.__timings.close()
+
+
+shaders.shader_path.append(os.path.dirname(__file__))
@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+
+__all__ = ['shard_frames', 'render_in_parallel']
+
+import os
+import os.path
+import shutil
+import logging
+import tempfile
+import multiprocessing
+
+import numpy
+
+from silica.viz.glass import trajectory
+from silica.viz.glass.animation import TrajectoryFrameSource
+from silica.viz.glass.config import Config
+from silica.viz.glass.mesh import generate_mesh, chunk_mesh, save_mesh
+
+
+SHARED_TRAJECTORY = 'particles.traj'
+SHARED_MESH = 'mesh'
+
+
+def shard_frames(frame_count, workers):
+    """shard_frames(frame_count, workers) -> list of (start, stop) tuples
+
+    Splits the frames into at most the given number of consecutive ranges of
+    nearly equal lengths. Each range should be rendered by one worker, which
+    then mostly moves from a frame to the next one.
+    """
+
+    bounds = numpy.linspace(0, frame_count, workers + 1).round().astype(int)
+
+    return [
+        (start, stop) for start, stop in zip(bounds[:-1], bounds[1:])
+        if start < stop]
+
+
+def share_particles(config, directory):
+    """share_particles(config, directory) -> trajectory filename or None
+
+    The particle animation as a trajectory file the workers can map into
+    memory. Text animations get converted into the directory first, with
+    double precision so that the frames come out exactly as they would from
+    the text. None is returned when there is no animation to share.
+    """
+
+    filename = config.particle_file()
+
+    if filename is None or not os.path.isfile(filename):
+
+        return None
+
+    if trajectory.is_trajectory(filename):
+
+        return filename
+
+    shared = os.path.join(directory, SHARED_TRAJECTORY)
+
+    trajectory.convert_text(filename, shared, numpy.float64)
+
+    return shared
+
+
+def share_glass(config, directory):
+    """share_glass(config, directory) -> directory of the saved mesh or None
+
+    Generates and chunks the glass mesh once and saves it for the workers.
+    The chunks are views of the saved arrays, so the workers share them. None
+    is returned when there is no glass to show.
+    """
+
+    if not config.glass_specified():
+
+        return None
+
+    mesh_directory = os.path.join(directory, SHARED_MESH)
+    os.mkdir(mesh_directory)
+
+    names, arrays = generate_mesh(config)
+
+    save_mesh(
+        mesh_directory, names, *chunk_mesh(config.chunk_size(), arrays))
+
+    return mesh_directory
+
+
+def render_shard(args, start, stop):
+    """render_shard(args, start, stop)
+
+    Renders the range of frames in a worker process, configured by the parsed
+    command line options.
+    """
+
+    # Every worker needs an OpenGL context of it's own, so OpenGL may only be
+    # loaded once the worker process is running
+    from silica.viz.glass.render import FrameRenderer
+
+    config = Config(args)
+    renderer = FrameRenderer(config)
+
+    for frame_no in range(start, stop):
+
+        renderer.render_to(config.render_directory(), frame_no)
+
+    renderer.finish()
+
+    logging.info('Rendered frames %d to %d', start + 1, stop)
+
+
+def render_in_parallel(config):
+    """render_in_parallel(config)
+
+    Renders all the frames of the configured particle animation into PNG files
+    like render.render_frames, but splits the work among the configured number
+    of worker processes. The glass mesh and the particle animation are
+    prepared once and shared through memory-mapped files. The process calling
+    this must not have loaded OpenGL.
+    """
+
+    directory = config.render_directory()
+
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+
+    shared_directory = tempfile.mkdtemp(prefix='silica-render-')
+
+    try:
+
+        particle_file = share_particles(config, shared_directory)
+
+        # The workers can't all write the same timings file
+        args = config.parsed_args(
+            particles=particle_file,
+            glass_mesh=share_glass(config, shared_directory),
+            timing_csv=None)
+
+        if particle_file is None:
+            frame_count = 1
+        else:
+            frame_count = TrajectoryFrameSource(particle_file).frame_count()
+
+        workers = [
+            multiprocessing.Process(
+                target=render_shard, args=(args, start, stop))
+            for start, stop in shard_frames(
+                frame_count, config.render_workers())]
+
+        for worker in workers:
+            worker.start()
+
+        for worker in workers:
+            worker.join()
+
+        if any(worker.exitcode for worker in workers):
+
+            raise RuntimeError('Some of the frames could not be rendered')
+
+    finally:
+
+        shutil.rmtree(shared_directory)
@@ -5,11 +5,10 @@ __all__ = ['ArgsParser', 'Config']
 
 import os.path
 import re
+import copy
 import math
 import argparse
 
-import pyglet
-from pyglet import gl
 import numpy
 
 from silica.viz.common.constants import *
@@ -69,12 +68,112 @@ class ArgsParser(SlicedGridArgsParser):
             help='length and width of a particle in glass grid units',
             nargs=2, type=float, default=(1, 0.5))
 
+        self.add_argument(
+            '--lod-pixels',
+            help=''.join([
+                'particles shorter on screen than this many pixels are drawn',
+                ' as flat impostors; 0 always draws the full model']),
+            type=float, default=6)
+
+        self.add_argument(
+            '--start-frame',
+            help='number of the particle animation frame to start at',
+            type=int, default=0)
+
+        self.add_argument(
+            '--frame-cache',
+            help='number of decoded particle animation frames kept in memory',
+            type=int, default=64)
+
+        self.add_argument(
+            '--prefetch',
+            help=''.join([
+                'number of particle animation frames decoded in the',
+                ' background ahead of the current one']),
+            type=int, default=16)
+
+        self.add_argument(
+            '--compress-trajectory',
+            help=''.join([
+                'load the whole particle animation into memory, compressed',
+                ' with positions kept to within the given tolerance (in glass',
+                ' grid units)']),
+            metavar='TOLERANCE', type=float, default=None)
+
+        self.add_argument(
+            '--keyframe-interval',
+            help=''.join([
+                'number of frames between the full frames of a compressed',
+                ' particle animation']),
+            type=int, default=64)
+
         self.add_argument(
             '-f', '--fog-color',
             help='RGBA color of the fog',
             nargs=4, type=float,
             default=(0, 1, 1, 0.125))
 
+        self.add_argument(
+            '--render-frames',
+            help=''.join([
+                'render every particle animation frame offscreen into PNG',
+                ' files in the given directory instead of opening a window']),
+            metavar='OUT_DIR', default=None)
+
+        self.add_argument(
+            '--render-size',
+            help='width and height of the rendered frames in pixels',
+            nargs=2, type=int, default=(800, 600))
+
+        self.add_argument(
+            '--render-orbit',
+            help=''.join([
+                'angle in degrees the camera circles around the glass by',
+                ' between rendered frames']),
+            type=float, default=0.5)
+
+        self.add_argument(
+            '--render-workers',
+            help=''.join([
+                'number of processes rendering frames at the same time,',
+                ' each taking an equal share of the animation']),
+            metavar='N', type=int, default=1)
+
+        self.add_argument(
+            '--timing-csv',
+            help=''.join([
+                'write how long each part of the scene took to draw in each',
+                ' frame into the given CSV file']),
+            metavar='FILE', default=None)
+
+        self.add_argument(
+            '--startup-profile',
+            help=''.join([
+                'report how long importing each module and each step of the',
+                ' initialization took']),
+            action='store_true')
+
+        # A glass mesh saved by the parent of the rendering processes
+        self.add_argument(
+            '--glass-mesh',
+            help=argparse.SUPPRESS, default=None)
+
+        self.add_argument(
+            '--ambient-occlusion',
+            help=''.join([
+                'darken the glass surface in corners and crevices, by at most',
+                ' the given fraction (0.5 when not given)']),
+            metavar='STRENGTH', nargs='?', type=float,
+            const=0.5, default=None)
+
+        self.add_argument(
+            '--fog-mode',
+            help=''.join([
+                'how to draw the fog: as nested blended layers, in a single',
+                ' pass computing the layers crossed by each ray or not at',
+                ' all']),
+            choices=['layers', 'analytic', 'none'], default='layers')
+
         self.add_argument(
             '-r', '--repeat',
             help=''.join(
@@ -82,6 +181,18 @@ class ArgsParser(SlicedGridArgsParser):
             nargs=3, type=int,
             default=(1, 1, 1))
 
+        self.add_argument(
+            '--no-culling',
+            help='draw all glass copies, even those outside of the view',
+            dest='culling', action='store_false')
+
+        self.add_argument(
+            '--chunk-size',
+            help=''.join([
+                'edge length of the cubical chunks the glass is split into',
+                ' for culling; 0 disables the split']),
+            type=int, default=32)
+
 
 class Config(SliceGridConfig):
 
@@ -144,6 +255,22 @@ class Config(SliceGridConfig):
 
         return tuple(-(dim * rep) / 2.0 for dim, rep in zip(dimmensions, repetitions))
 
+    def frustum_culling(self):
+        """C.frustum_culling() -> bool
+
+        Should objects outside of the view frustum be skipped when drawing?
+        """
+
+        return self._args.culling
+
+    def chunk_size(self):
+        """C.chunk_size() -> edge length of a glass chunk or None
+
+        None means the glass should not be split into chunks.
+        """
+
+        return self._args.chunk_size or None
+
     def glass_color(self):
         """C.glass_color() -> the RGB glass color"""
 
@@ -157,16 +284,118 @@ class Config(SliceGridConfig):
 
         return self._args.particle_dimmensions
 
+    def lod_pixels(self):
+        """C.lod_pixels() -> on screen length below which particles get simplified
+
+        Zero means the particles are always drawn in full detail.
+        """
+
+        return self._args.lod_pixels
+
     def fog_color(self):
         """C.fog_color() -> the RGBA fog color"""
 
         return self._args.fog_color
 
+    def render_directory(self):
+        """C.render_directory() -> directory to render frames into or None
+
+        None means the frames should be displayed in a window instead.
+        """
+
+        return self._args.render_frames
+
+    def render_size(self):
+        """C.render_size() -> width, height of rendered frames"""
+
+        return tuple(self._args.render_size)
+
+    def render_orbit(self):
+        """C.render_orbit() -> camera angle step between rendered frames
+
+        In radians.
+        """
+
+        return math.radians(self._args.render_orbit)
+
+    def render_workers(self):
+        """C.render_workers() -> number of processes to render frames in"""
+
+        return max(1, self._args.render_workers)
+
+    def glass_mesh(self):
+        """C.glass_mesh() -> directory with a saved glass mesh or None
+
+        None means the glass mesh should be generated from the glass file.
+        """
+
+        return self._args.glass_mesh
+
+    def timing_csv(self):
+        """C.timing_csv() -> name of the frame timings CSV file or None"""
+
+        return self._args.timing_csv
+
+    def parsed_args(self, **overrides):
+        """C.parsed_args(**overrides) -> argparse.Namespace
+
+        A copy of the parsed command line options the configuration was made
+        from, with some of the options replaced by the keyword arguments.
+        """
+
+        args = copy.copy(self._args)
+
+        for name, value in overrides.items():
+            setattr(args, name, value)
+
+        return args
+
+    def ambient_occlusion(self):
+        """C.ambient_occlusion() -> strength of the ambient occlusion or None
+
+        None means no ambient occlusion should be applied.
+        """
+
+        return self._args.ambient_occlusion
+
+    def fog_mode(self):
+        """C.fog_mode() -> 'layers', 'analytic' or 'none'"""
+
+        return self._args.fog_mode
+
     def particle_file(self):
         """C.particle_file() -> name of the particle file or None"""
 
         return self._args.particles
 
+    def start_frame(self):
+        """C.start_frame() -> number of the first frame to show"""
+
+        return self._args.start_frame
+
+    def frame_cache_size(self):
+        """C.frame_cache_size() -> number of decoded frames to keep around"""
+
+        return self._args.frame_cache
+
+    def prefetch_window(self):
+        """C.prefetch_window() -> number of frames to decode ahead of time"""
+
+        return self._args.prefetch
+
+    def trajectory_tolerance(self):
+        """C.trajectory_tolerance() -> position tolerance or None
+
+        None means the particle animation should not be compressed.
+        """
+
+        return self._args.compress_trajectory
+
+    def keyframe_interval(self):
+        """C.keyframe_interval() -> frames between full compressed frames"""
+
+        return self._args.keyframe_interval
+
     def particle_animation_fps(self):
         """C.particle_animation_fps() -> frame rate for particle animation"""
 
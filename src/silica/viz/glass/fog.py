@@ -1,11 +1,71 @@
 # -*- coding: utf-8 -*-
 
-__all__ = ['Fog']
+__all__ = ['Fog', 'AnalyticFog', 'fog_layer_count']
 
+import ctypes as c
+
+import numpy
 from pyglet import gl
 
 from silica.viz.common import shaders
 from silica.viz.common import cube
+from silica.viz.common.glstate import gl_state
+from silica.viz.glass.repetitions import Repetitions
+
+
+def slice_bounds(config):
+    """slice_bounds(config) -> x_min, x_max, y_min, y_max, z_min, z_max
+
+    The bounds of the displayed part of the glass grid.
+    """
+
+    W, H, D = config.grid_size()
+    x_min, x_max, y_min, y_max, z_min, z_max = config.slice()
+
+    x_min = 0 if x_min is None else x_min
+    y_min = 0 if y_min is None else y_min
+    z_min = 0 if z_min is None else z_min
+
+    x_max = W - 1 if x_max is None else x_max
+    y_max = H - 1 if y_max is None else y_max
+    z_max = D - 1 if z_max is None else z_max
+
+    return x_min, x_max, y_min, y_max, z_min, z_max
+
+
+def fog_layer_count(config):
+    """fog_layer_count(config) -> number of nested fog layers
+
+    The i-th layer (counting from 0) is the box inset by i from the outermost
+    one on all sides. There are as many as fit inside the displayed glass.
+    """
+
+    x_min, x_max, y_min, y_max, z_min, z_max = slice_bounds(config)
+
+    extent = min(x_max - x_min, y_max - y_min, z_max - z_min)
+
+    return max(0, (extent + 1) // 2)
+
+
+def box_triangles(program, low, high):
+    """box_triangles(program, low, high) -> TriangleList
+
+    The faces of an axis-aligned box, given by it's minimal and maximal
+    corner, for drawing with the program.
+    """
+
+    positions = cube.CUBE_FACES.copy()
+
+    positions *= numpy.subtract(high, low)
+    positions += low
+
+    t_list = program.triangle_list(
+        cube.SQUARES_PER_CUBE *
+        cube.TRIANGLES_PER_SQUARE)
+
+    t_list.from_arrays(dict(position=positions))
+
+    return t_list
 
 
 class Fog(object):
@@ -17,7 +77,9 @@ class Fog(object):
         self.__config = config
         self.__cam = cam
 
-        self.__program = shaders.Program('fog')
+        self.__repetitions = Repetitions(config, cam)
+
+        self.__program = self.__repetitions.program('fog')
 
         self.__camera = self.__program.uniform(
             'camera',
@@ -27,10 +89,6 @@ class Fog(object):
             'color',
             shaders.GLSLType(shaders.GLSLType.Vector(4)))
 
-        self.__copy_shift = self.__program.uniform(
-            'copy_shift',
-            shaders.GLSLType(shaders.GLSLType.Vector(3)))
-
         self.__program.attribute(
             'position',
             shaders.GLSLType(shaders.GLSLType.Vector(3)))
@@ -38,9 +96,10 @@ class Fog(object):
         self.__layers = self.__fog_layers()
 
     def __fog_layers(self):
-        """F.__fog_layers() -> list of TriangleListS
+        """F.__fog_layers() -> list of (TriangleList, low, high)
 
-        They should all be drawn in order.
+        They should all be drawn in order. The low and high corners bound the
+        layer in space.
         """
 
         i, done, layers = 0, False, []
@@ -60,30 +119,14 @@ class Fog(object):
 
         return layers
 
-    def __slice(self):
-        """F.__slice() -> x_min, x_max, y_min, y_max, z_min, z_max"""
-
-        W, H, D = self.__config.grid_size()
-        x_min, x_max, y_min, y_max, z_min, z_max = self.__config.slice()
-
-        x_min = 0 if x_min is None else x_min
-        y_min = 0 if y_min is None else y_min
-        z_min = 0 if z_min is None else z_min
-
-        x_max = W - 1 if x_max is None else x_max
-        y_max = H - 1 if y_max is None else y_max
-        z_max = D - 1 if z_max is None else z_max
-
-        return x_min, x_max, y_min, y_max, z_min, z_max
-
     def __fog_layer(self, i):
-        """F.__fog_layer(i) -> TriangleList or None
+        """F.__fog_layer(i) -> (TriangleList, low, high) or None
 
-        Returns the i-th layer TriangleList or None when one of the dimmesions
-        would be 0.
+        Returns the i-th layer TriangleList with it's bounds or None when one
+        of the dimmesions would be 0.
         """
 
-        x_min, x_max, y_min, y_max, z_min, z_max = self.__slice()
+        x_min, x_max, y_min, y_max, z_min, z_max = slice_bounds(self.__config)
 
         w = x_max - x_min - 2 * i
         h = y_max - y_min - 2 * i
@@ -96,63 +139,255 @@ class Fog(object):
         y = y_min + i + 0.5
         z = z_min + i + 0.5
 
-        positions = cube.CUBE_FACES.copy()
+        low, high = (x, y, z), (x + w, y + h, z + d)
+
+        return box_triangles(self.__program, low, high), low, high
+
+    def on_draw(self):
+        """F.on_draw()
+
+        Renders the fog."""
+
+        gl_state.enable(gl.GL_BLEND)
+        gl.glBlendFunc(gl.GL_SRC_ALPHA, gl.GL_ONE_MINUS_SRC_ALPHA)
+
+        gl_state.depth_mask(False)
+
+        self.__repetitions.start_frame()
+
+        with self.__program:
+
+            for layer, low, high in self.__layers:
+
+                with layer:
+
+                    self.__camera.load(self.__cam.gl_matrix())
+                    self.__camera.set()
+
+                    if not self.__color.filled():
+                        self.__color.add(*self.__config.fog_color())
+                    self.__color.set()
+
+                    self.__repetitions.draw(layer, low, high)
+
+        gl_state.depth_mask(True)
+        gl_state.disable(gl.GL_BLEND)
+
+    def culling(self):
+        """F.culling() -> CullingCounter
+
+        Counts the layer copies drawn and culled during the last frame.
+        """
+
+        return self.__repetitions.culling()
+
+
+class SceneDepth(object):
+
+    """A copy of the depth buffer in a texture, for shaders to read."""
+
+    def __init__(self):
+
+        self.__texture = None
+        self.__size = None
+
+    def texture(self):
+        """SD.texture() -> OpenGL name of the texture"""
+
+        return self.__texture.value
+
+    def __allocate(self, width, height):
+        """SD.__allocate(width, height)
+
+        (Re)creates the texture storage for the given viewport size.
+        """
+
+        if self.__texture is None:
 
-        positions[:, :, :, 0] *= w
-        positions[:, :, :, 1] *= h
-        positions[:, :, :, 2] *= d
+            self.__texture = gl.GLuint(0)
+            gl.glGenTextures(1, c.byref(self.__texture))
 
-        positions[:, :, :, 0] += x
-        positions[:, :, :, 1] += y
-        positions[:, :, :, 2] += z
+        gl.glBindTexture(gl.GL_TEXTURE_2D, self.__texture)
 
-        t_list = self.__program.triangle_list(
-            cube.SQUARES_PER_CUBE *
-            cube.TRIANGLES_PER_SQUARE)
+        for parameter, value in [
+                (gl.GL_TEXTURE_MIN_FILTER, gl.GL_NEAREST),
+                (gl.GL_TEXTURE_MAG_FILTER, gl.GL_NEAREST),
+                (gl.GL_TEXTURE_WRAP_S, gl.GL_CLAMP_TO_EDGE),
+                (gl.GL_TEXTURE_WRAP_T, gl.GL_CLAMP_TO_EDGE)]:
 
-        t_list.from_arrays(dict(position=positions))
+            gl.glTexParameteri(gl.GL_TEXTURE_2D, parameter, value)
 
-        return t_list
+        gl.glTexImage2D(
+            gl.GL_TEXTURE_2D, 0, gl.GL_DEPTH_COMPONENT24,
+            width, height, 0,
+            gl.GL_DEPTH_COMPONENT, gl.GL_UNSIGNED_INT, None)
+
+        self.__size = width, height
+
+    def copy(self, width, height):
+        """SD.copy(width, height)
+
+        Copies the depth buffer of a viewport of the given size into the
+        texture and leaves it bound to the active texture unit.
+        """
+
+        if self.__size != (width, height):
+
+            self.__allocate(width, height)
+
+        gl.glBindTexture(gl.GL_TEXTURE_2D, self.__texture)
+        gl.glCopyTexSubImage2D(
+            gl.GL_TEXTURE_2D, 0, 0, 0, 0, 0, width, height)
+
+
+class AnalyticFog(object):
+
+    """The same fog as Fog, drawn in a single pass per glass copy.
+
+    Instead of drawing every nested layer, only the outermost box is drawn. For
+    each pixel the fragment shader works out how many layer surfaces the ray
+    through it crosses in front of the already drawn scene and blends the fog
+    color in as if that many layers were drawn.
+    """
+
+    def __init__(self, config, cam):
+
+        self.__config = config
+        self.__cam = cam
+
+        self.__repetitions = Repetitions(config, cam)
+
+        self.__program = self.__repetitions.program('analytic_fog')
+
+        self.__camera = self.__program.uniform(
+            'camera',
+            shaders.GLSLType(shaders.GLSLType.Matrix(4)))
+
+        self.__inverse_camera = self.__program.uniform(
+            'inverse_camera',
+            shaders.GLSLType(shaders.GLSLType.Matrix(4)))
+
+        self.__viewport_size = self.__program.uniform(
+            'viewport_size',
+            shaders.GLSLType(shaders.GLSLType.Vector(2)))
+
+        self.__scene_depth = self.__program.uniform(
+            'scene_depth',
+            shaders.GLSLType(element_type=shaders.GLSLType.INT))
+
+        self.__low = self.__program.uniform(
+            'low',
+            shaders.GLSLType(shaders.GLSLType.Vector(3)))
+
+        self.__high = self.__program.uniform(
+            'high',
+            shaders.GLSLType(shaders.GLSLType.Vector(3)))
+
+        self.__layer_count = self.__program.uniform(
+            'layer_count', shaders.GLSLType())
+
+        self.__color = self.__program.uniform(
+            'color',
+            shaders.GLSLType(shaders.GLSLType.Vector(4)))
+
+        self.__program.attribute(
+            'position',
+            shaders.GLSLType(shaders.GLSLType.Vector(3)))
+
+        x_min, x_max, y_min, y_max, z_min, z_max = slice_bounds(config)
+
+        self.__bounds = (
+            (x_min + 0.5, y_min + 0.5, z_min + 0.5),
+            (x_max + 0.5, y_max + 0.5, z_max + 0.5))
+
+        self.__box = box_triangles(self.__program, *self.__bounds)
+
+        self.__scene = SceneDepth()
+        self.__viewport = None
+
+        self.__inverse, self.__inverted = None, None
+
+    def on_resize(self, width, height):
+
+        self.__viewport = width, height
+
+    def __inverse_camera_matrix(self):
+        """AF.__inverse_camera_matrix() -> numpy array
+
+        The inverse of the camera matrix in float32, only recalculated when
+        the camera has changed.
+        """
+
+        generation = self.__cam.generation()
+
+        if generation != self.__inverted:
+
+            self.__inverse = numpy.linalg.inv(
+                self.__cam.matrix()).astype(numpy.float32)
+            self.__inverted = generation
+
+        return self.__inverse
 
     def on_draw(self):
-        """F.on_draw()
+        """AF.on_draw()
 
         Renders the fog."""
 
-        gl.glEnable(gl.GL_BLEND)
+        if self.__viewport is None or not fog_layer_count(self.__config):
+
+            return
+
+        self.__scene.copy(*self.__viewport)
+
+        gl_state.enable(gl.GL_BLEND)
         gl.glBlendFunc(gl.GL_SRC_ALPHA, gl.GL_ONE_MINUS_SRC_ALPHA)
 
-        gl.glDepthMask(gl.GL_FALSE)
+        # The shader compares against the scene depth by itself
+        gl_state.disable(gl.GL_DEPTH_TEST)
+        gl_state.depth_mask(False)
+
+        self.__repetitions.start_frame()
+
+        with self.__box as box:
 
-        x_rep, y_rep, z_rep = self.__config.glass_repetitions()
-        w, h, d = self.__config.grid_size()
+            self.__camera.load(self.__cam.gl_matrix())
+            self.__camera.set()
 
-        for layer in self.__layers:
+            self.__inverse_camera.load(self.__inverse_camera_matrix())
+            self.__inverse_camera.set()
 
-            with layer:
+            self.__viewport_size.clear()
+            self.__viewport_size.add(*self.__viewport)
+            self.__viewport_size.set()
 
-                self.__camera.clear()
-                self.__camera.add(*self.__cam.gl_matrix())
-                self.__camera.set()
+            if not self.__scene_depth.filled():
+                self.__scene_depth.add(0)
+            self.__scene_depth.set()
 
-                if not self.__color.filled():
-                    self.__color.add(*self.__config.fog_color())
-                self.__color.set()
+            low, high = self.__bounds
 
-                for x_copy in range(x_rep):
-                    for y_copy in range(y_rep):
-                        for z_copy in range(z_rep):
+            if not self.__low.filled():
+                self.__low.add(*low)
+                self.__high.add(*high)
+                self.__layer_count.add(fog_layer_count(self.__config))
+            self.__low.set()
+            self.__high.set()
+            self.__layer_count.set()
 
-                            shift = (
-                                w * x_copy,
-                                h * y_copy,
-                                d * z_copy)
+            if not self.__color.filled():
+                self.__color.add(*self.__config.fog_color())
+            self.__color.set()
 
-                            self.__copy_shift.clear()
-                            self.__copy_shift.add(*shift)
-                            self.__copy_shift.set()
+            self.__repetitions.draw(box, low, high)
 
-                            layer.draw()
+        gl_state.depth_mask(True)
+        gl_state.enable(gl.GL_DEPTH_TEST)
+        gl_state.disable(gl.GL_BLEND)
+
+    def culling(self):
+        """AF.culling() -> CullingCounter
+
+        Counts the fog copies drawn and culled during the last frame.
+        """
 
-        gl.glDepthMask(gl.GL_TRUE)
-        gl.glDisable(gl.GL_BLEND)
+        return self.__repetitions.culling()
@@ -8,6 +8,10 @@ uniform float diffuse = 0.7;
 
 varying vec3 f_normal;
 
+#ifdef AMBIENT_OCCLUSION
+varying float f_occlusion;
+#endif
+
 void main(void) {
 
 	vec3 act_normal = normalize(f_normal);
@@ -20,5 +24,9 @@ void main(void) {
 		ambient +
 		diffuse * diffuse_product;
 
+#ifdef AMBIENT_OCCLUSION
+	intensity *= 1.0 - f_occlusion;
+#endif
+
 	gl_FragColor = vec4(color * intensity, 1);
 }
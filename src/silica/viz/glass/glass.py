@@ -2,49 +2,26 @@
 
 __all__ = ['Glass']
 
-import os.path
-
-import numpy
-from pyglet import gl
-
 from silica.viz.common import shaders
-from silica.viz.common.grid.surface import SurfaceDataGenerator
-from silica.viz.common.grid.load import (
-    GridCubeLoader, Sizer,
-    InclusionCondition, AndCondition, Slice3D)
 from silica.viz.common.constants import *
 from silica.viz.common.cube import *
+from silica.viz.glass.repetitions import Repetitions
+from silica.viz.glass.mesh import glass_mesh
 
 
-def grid_lines(filename):
-    """grid_lines(filename) -> iter
+def bounds(positions):
+    """bounds(positions) -> low, high
 
-    Returns an iterator ranging over the lines of a grid file.
+    The minimal and maximal corner of the axis-aligned box enclosing all the
+    positions.
     """
 
-    with open(filename) as grid_file:
-        for line in grid_file:
-
-            yield tuple(map(int, line.split(' ')))
-
-
-class Sizer(Sizer):
-
-    def __init__(self, size):
-        self.__size = size
+    positions = positions.reshape((-1, COORDINATES_PER_VERTEX))
 
-    def size(self):
-        return self.__size
+    return positions.min(axis=0), positions.max(axis=0)
 
 
-class ValueEqual(InclusionCondition):
-
-    def __init__(self, value):
-        self.__value = value
-
-    def include(self, x, y, z, v):
-
-        return v == self.__value
+AMBIENT_OCCLUSION = 'AMBIENT_OCCLUSION'
 
 
 class Glass(object):
@@ -56,7 +33,13 @@ class Glass(object):
         self.__config = config
         self.__cam = cam
 
-        self.__program = shaders.Program('glass')
+        self.__repetitions = Repetitions(config, cam)
+
+        self.__occlusion = config.ambient_occlusion()
+
+        self.__program = self.__repetitions.program(
+            'glass',
+            () if self.__occlusion is None else (AMBIENT_OCCLUSION, ))
 
         self.__camera = self.__program.uniform(
             'camera',
@@ -70,10 +53,6 @@ class Glass(object):
             'color',
             shaders.GLSLType(shaders.GLSLType.Vector(3)))
 
-        self.__copy_shift = self.__program.uniform(
-            'copy_shift',
-            shaders.GLSLType(shaders.GLSLType.Vector(3)))
-
         self.__program.attribute(
             'position',
             shaders.GLSLType(shaders.GLSLType.Vector(3)))
@@ -82,56 +61,30 @@ class Glass(object):
             'normal',
             shaders.GLSLType(shaders.GLSLType.Vector(3)))
 
-        includer = AndCondition(
-            ValueEqual(1),
-            Slice3D(*self.__config.slice()))
-
-        with open(self.__config.grid_file()) as input_file:
-
-            grid, cubes = GridCubeLoader(
-                input_file, includer,
-                Sizer(self.__config.grid_size())).load()
-
-        positions, normals = SurfaceDataGenerator(
-            grid, cubes).positions_and_normals()
-
-        SIDES = positions.shape[0]
-        TRIANGLES = SIDES * TRIANGLES_PER_SQUARE
-
-        self.__triangles = self.__program.triangle_list(TRIANGLES)
+        if self.__occlusion is not None:
 
-        self.__triangles.from_arrays(dict(
-            position=positions,
-            normal=normals))
+            self.__program.attribute('occlusion', shaders.GLSLType())
 
-    def __grid_n_cubes(self):
-        """G.__grid_n_cubes() -> grid, cubes
+        names, arrays, offsets = glass_mesh(self.__config)
 
-        Loads the glass grid and cube coordinates from the file specified by
-        the configuration.
-        """
-
-        filename = self.__config.grid_file()
-
-        w, h, d = self.__config.grid_size()
+        self.__chunks = []
 
-        grid, cubes = numpy.zeros((w, h, d)), []
+        for start, stop in zip(offsets[:-1], offsets[1:]):
 
-        for x, y, z, solid in grid_lines(filename):
+            # Slicing keeps the chunks views of a mapped mesh
+            chunk_arrays = [array[start:stop] for array in arrays]
+            chunk_positions = chunk_arrays[0]
 
-            # Assuming solid is always either 1 or 0...
-            if solid:
+            SIDES = chunk_positions.shape[0]
+            TRIANGLES = SIDES * TRIANGLES_PER_SQUARE
 
-                cubes.append((x, y, z))
+            triangles = self.__program.triangle_list(TRIANGLES)
 
-            grid[x, y, z] = solid
+            triangles.from_arrays(dict(zip(names, chunk_arrays)))
 
-        # The sort ensures that the application of limits later on will not
-        # depend upon the order in which the cubes were specified in the file.
-        cubes.sort()
-        cubes = numpy.array(cubes)
+            low, high = bounds(chunk_positions)
 
-        return grid, cubes
+            self.__chunks.append((triangles, low, high))
 
     def on_draw(self):
         """G.on_draw()
@@ -139,13 +92,11 @@ class Glass(object):
         Renders the glass piece.
         """
 
-        x_rep, y_rep, z_rep = self.__config.glass_repetitions()
-        w, h, d = self.__config.grid_size()
+        self.__repetitions.start_frame()
 
-        with self.__triangles as triangles:
+        with self.__program:
 
-            self.__camera.clear()
-            self.__camera.add(*self.__cam.gl_matrix())
+            self.__camera.load(self.__cam.gl_matrix())
             self.__camera.set()
 
             if not self.__color.filled():
@@ -156,17 +107,16 @@ class Glass(object):
                 self.__sun.add(*self.__config.sun_direction())
             self.__sun.set()
 
-            for x_copy in range(x_rep):
-                for y_copy in range(y_rep):
-                    for z_copy in range(z_rep):
+            for triangles, low, high in self.__chunks:
 
-                        shift = (
-                            w * x_copy,
-                            h * y_copy,
-                            d * z_copy)
+                with triangles:
 
-                        self.__copy_shift.clear()
-                        self.__copy_shift.add(*shift)
-                        self.__copy_shift.set()
+                    self.__repetitions.draw(triangles, low, high)
+
+    def culling(self):
+        """G.culling() -> CullingCounter
+
+        Counts the chunk copies drawn and culled during the last frame.
+        """
 
-                        triangles.draw()
+        return self.__repetitions.culling()
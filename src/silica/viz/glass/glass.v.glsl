@@ -1,7 +1,6 @@
 #version 120
 
 uniform mat4 camera;
-uniform vec3 copy_shift;
 
 attribute vec3 position;
 attribute vec3 normal;
@@ -9,10 +8,20 @@ attribute vec3 normal;
 varying vec3 f_normal;
 varying vec3 f_position;
 
+#ifdef AMBIENT_OCCLUSION
+attribute float occlusion;
+
+varying float f_occlusion;
+#endif
+
 void main(void) {
 
-	gl_Position = camera * vec4(copy_shift + position, 1.0);
+	gl_Position = camera * vec4(shift() + position, 1.0);
 
 	f_normal = normal;
 	f_position = position;
+
+#ifdef AMBIENT_OCCLUSION
+	f_occlusion = occlusion;
+#endif
 }
@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+
+__all__ = [
+    'generate_mesh', 'chunk_mesh', 'save_mesh', 'load_mesh', 'glass_mesh']
+
+import os.path
+
+import numpy
+
+from silica.viz.common.constants import *
+from silica.viz.common.cube import TRIANGLES_PER_SQUARE
+from silica.viz.common.grid.surface import SurfaceDataGenerator
+from silica.viz.common.grid.load import (
+    GridCubeLoader, Sizer,
+    InclusionCondition, AndCondition, Slice3D)
+
+
+# The per-vertex arrays making up a glass mesh, in the order they are kept in
+MESH_ARRAYS = ['position', 'normal', 'occlusion']
+
+MESH_SUFFIX = '.npy'
+
+# The file of a saved mesh holding the offsets of it's chunks
+CHUNKS = 'chunks'
+
+SQUARE_VERTICES = (TRIANGLES_PER_SQUARE, VERTICES_PER_TRIANGLE)
+
+
+class Sizer(Sizer):
+
+    def __init__(self, size):
+        self.__size = size
+
+    def size(self):
+        return self.__size
+
+
+class ValueEqual(InclusionCondition):
+
+    def __init__(self, value):
+        self.__value = value
+
+    def include(self, x, y, z, v):
+
+        return v == self.__value
+
+
+def generate_mesh(config):
+    """generate_mesh(config) -> names, arrays
+
+    Loads the configured glass file and computes the per-vertex arrays of the
+    visible glass surface: the positions, the normals and, when ambient
+    occlusion is enabled, the occlusion.
+    """
+
+    includer = AndCondition(
+        ValueEqual(1),
+        Slice3D(*config.slice()))
+
+    with open(config.grid_file()) as input_file:
+
+        grid, cubes = GridCubeLoader(
+            input_file, includer,
+            Sizer(config.grid_size())).load()
+
+    generator = SurfaceDataGenerator(grid, cubes)
+    positions, normals = generator.positions_and_normals()
+
+    names, arrays = ['position', 'normal'], [positions, normals]
+
+    if config.ambient_occlusion() is not None:
+
+        names.append('occlusion')
+        arrays.append(
+            config.ambient_occlusion() *
+            generator.occlusion(positions, normals))
+
+    return names, arrays
+
+
+def chunk_mesh(chunk_size, arrays):
+    """chunk_mesh(chunk_size, arrays) -> arrays, offsets
+
+    Groups the squares making up the surface by the cubical chunk of space
+    with the given edge length they lie in. The per-vertex arrays (positions
+    first) are returned reordered and reshaped to a square per row, so that
+    each chunk is a consecutive range of rows. The offsets are the rows the
+    chunks start at, followed by the number of rows. A chunk_size of None puts
+    everything into a single chunk. Empty chunks are left out.
+    """
+
+    positions = arrays[0].reshape(
+        (-1, ) + SQUARE_VERTICES + (COORDINATES_PER_VERTEX, ))
+
+    # Arrays with a component per vertex lack the last axis of the positions.
+    # The components are given explicitly, as they can't be inferred from an
+    # empty array.
+    arrays = [positions] + [
+        array.reshape(positions.shape[:3] + (
+            1 if array.ndim < arrays[0].ndim else array.shape[-1], ))
+        for array in arrays[1:]]
+
+    square_count = positions.shape[0]
+
+    if not square_count:
+
+        return arrays, numpy.zeros(1, dtype=numpy.int64)
+
+    if chunk_size is None:
+
+        return arrays, numpy.array([0, square_count], dtype=numpy.int64)
+
+    corners = positions.min(axis=2).min(axis=1)
+    keys = numpy.floor(corners / chunk_size).astype(numpy.int64)
+
+    order = numpy.lexsort(keys.T[::-1])
+    keys = keys[order]
+
+    breaks = numpy.flatnonzero(
+        (numpy.diff(keys, axis=0) != 0).any(axis=1)) + 1
+
+    offsets = numpy.concatenate([[0], breaks, [square_count]])
+
+    return [array[order] for array in arrays], offsets.astype(numpy.int64)
+
+
+def mesh_filename(directory, name):
+    """mesh_filename(directory, name) -> file the named mesh array is kept in"""
+
+    return os.path.join(directory, name + MESH_SUFFIX)
+
+
+def save_mesh(directory, names, arrays, offsets):
+    """save_mesh(directory, names, arrays, offsets)
+
+    Saves the chunked mesh arrays (see chunk_mesh) into the directory, one
+    .npy file per array, along with the chunk offsets. The arrays are saved as
+    the single precision floats they are drawn as, so that each chunk can be
+    drawn straight from the files, once mapped.
+    """
+
+    numpy.save(mesh_filename(directory, CHUNKS), offsets)
+
+    for name, array in zip(names, arrays):
+
+        numpy.save(
+            mesh_filename(directory, name),
+            numpy.ascontiguousarray(array, dtype=numpy.float32))
+
+
+def load_mesh(directory):
+    """load_mesh(directory) -> names, arrays, offsets
+
+    Maps a mesh saved with save_mesh into memory, read-only. Processes mapping
+    the same mesh share the memory it takes up, as the chunks are views of the
+    mapped arrays.
+    """
+
+    names = [
+        name for name in MESH_ARRAYS
+        if os.path.exists(mesh_filename(directory, name))]
+
+    arrays = [
+        numpy.load(mesh_filename(directory, name), mmap_mode='r')
+        for name in names]
+
+    return names, arrays, numpy.load(mesh_filename(directory, CHUNKS))
+
+
+def glass_mesh(config):
+    """glass_mesh(config) -> names, arrays, offsets
+
+    The chunked glass mesh to display (see chunk_mesh) -- a saved one when the
+    configuration names one, a freshly generated one otherwise.
+    """
+
+    if config.glass_mesh() is not None:
+
+        return load_mesh(config.glass_mesh())
+
+    names, arrays = generate_mesh(config)
+
+    return (names, ) + tuple(chunk_mesh(config.chunk_size(), arrays))
@@ -0,0 +1,25 @@
+#version 120
+
+uniform vec3 sun;
+
+uniform float ambient = 0.3;
+uniform float diffuse = 0.7;
+
+varying float along;
+varying vec3 normal;
+
+void main(void) {
+
+	// The same pole colours as on the full particle model
+	vec3 colour = along < 0 ? vec3(0, 0, 1) : vec3(1, 0, 0);
+
+	float diffuse_product = dot(
+			normalize(sun),
+			normalize(normal));
+
+	diffuse_product *= - float(diffuse_product < 0);
+
+	float intensity = ambient + diffuse * diffuse_product;
+
+	gl_FragColor = vec4(colour * intensity, 1);
+}
@@ -0,0 +1,47 @@
+#version 120
+
+uniform mat4 camera;
+uniform vec3 eye;
+uniform vec2 size;
+
+// Corners of the billboard, the same for all instances
+attribute vec2 corner;
+
+// The state of a particle, one per instance
+attribute vec3 position;
+attribute vec4 rotation;
+
+varying float along;
+varying vec3 normal;
+
+void main(void) {
+
+	// Where the rotation takes the model's x axis
+	vec3 axis = vec3(
+			1.0 - 2.0 * (rotation.y * rotation.y + rotation.z * rotation.z),
+			2.0 * (rotation.x * rotation.y + rotation.w * rotation.z),
+			2.0 * (rotation.x * rotation.z - rotation.w * rotation.y));
+
+	vec3 to_eye = eye - position;
+
+	// The billboard contains the axis and faces the eye as much as it can
+	vec3 across = cross(axis, to_eye);
+
+	if (length(across) < 1e-6 * length(to_eye)) {
+
+		across = abs(axis.z) < 0.9 ?
+			cross(axis, vec3(0, 0, 1)) :
+			cross(axis, vec3(1, 0, 0));
+	}
+
+	across = normalize(across);
+
+	along = corner.x;
+	normal = normalize(to_eye);
+
+	vec3 world_position = position +
+		axis * corner.x * size.x / 2 +
+		across * corner.y * size.y / 2;
+
+	gl_Position = camera * vec4(world_position, 1);
+}
@@ -2,11 +2,6 @@
 
 __all__ = ['Particles']
 
-import os
-import os.path
-import math
-import string
-
 import numpy
 from pyglet.window import key
 from pyglet import clock
@@ -14,12 +9,8 @@ from pyglet import clock
 from silica.viz.common import cube
 from silica.viz.common import shaders
 from silica.viz.common.constants import *
-
-
-ANGLES_PER_ORIENTATION = 2
-
-TEMPLATE_DIR = os.path.abspath(os.path.dirname(__file__))
-SHADER_DIR = os.path.abspath(os.getcwd())
+from silica.viz.common.redraw import redraw
+from silica.viz.glass.animation import animation_from_file
 
 
 class ParticleModel(object):
@@ -52,13 +43,6 @@ class ParticleModel(object):
 
         self.__vertex_count = self.__positions.size / COORDINATES_PER_VERTEX
 
-    def generate_shader_source(self, template):
-        """PM.generate_shader_source(template) -> shader source"""
-
-        return template.substitute({
-            'vertex_count': self.__vertex_count,
-        })
-
     def vertex_count(self):
         """PM.vertex_count() -> number of triangle vertices in the model"""
 
@@ -69,212 +53,155 @@ class ParticleModel(object):
 
         return self.vertex_count() / VERTICES_PER_TRIANGLE
 
-    def populate(self, positions, normals, colours):
-        """PM.populate(position, normals, colours)
+    def arrays(self):
+        """PM.arrays() -> dict of arrays
 
-        Sets appropriate values for the model-dependant uniforms.
+        The per-vertex data of the model, ready for TriangleList.from_arrays.
         """
 
-        if not positions.filled():
-            for position in self.__positions:
-                positions.add(*position.flatten())
-        positions.set()
-
-        if not normals.filled():
-            for normal in self.__normals:
-                normals.add(*normal.flatten())
-        normals.set()
-
-        if not colours.filled():
-            for colour in self.__colours:
-                colours.add(*colour.flatten())
-        colours.set()
-
+        return {
+            'vertex_position': self.__positions.astype(numpy.float32),
+            'vertex_normal': self.__normals.astype(numpy.float32),
+            'vertex_colour': self.__colours.astype(numpy.float32),
+        }
 
-class AnimationBuilder(object):
-
-    """A builder object for ParticleAnimations"""
-
-    def __init__(self, program, model, particle_count):
-
-        self.__program, self.__model = program, model
-
-        self.__particle_count = particle_count
-        self.__in_current_frame = 0
-        self.__frames = []
-
-        self.__start_frame()
-
-    def __start_frame(self):
-        """AB.__start_frame()
-
-        Starts a new frame.
-        """
 
-        self.__in_current_frame = 0
+class ParticleImpostor(object):
 
-        self.__frames.append({
+    """A flat stand-in for the particle model, for particles seen from afar
 
-            'ix_float': numpy.zeros((
-                self.__particle_count,
-                self.__model.vertex_count())),
-
-            'position': numpy.zeros((
-                self.__particle_count,
-                self.__model.vertex_count(),
-                COORDINATES_PER_VERTEX)),
-
-            'orientation': numpy.zeros((
-                self.__particle_count,
-                self.__model.vertex_count(),
-                ANGLES_PER_ORIENTATION)),
-        })
-        self.__frames[-1]['ix_float'][:] = numpy.arange(
-            self.__model.vertex_count())
-
-    @staticmethod
-    def vector_to_angles(vector):
-        """vector_to_angles((x, y, z)) -> rho, theta
-
-        Calculates the angular representation of the direction the vector with
-        the given components is pointing in.
-        """
+    It is a rectangle, spanned by the particle's axis and the direction across
+    it that faces the camera best. The vertex shader turns it around, so the
+    model itself only holds the corners.
+    """
 
-        x, y, z = vector
+    CORNERS = numpy.array([
+        [-1, -1], [1, -1], [1, 1],
+        [-1, -1], [1, 1], [-1, 1]], dtype=numpy.float32)
 
-        phi = math.atan2(y, x)
-        theta = math.atan2(z, math.sqrt(x ** 2 + y ** 2))
+    def triangle_count(self):
+        """PI.triangle_count() -> number of triangles in the impostor"""
 
-        return phi, theta
+        return len(self.CORNERS) / VERTICES_PER_TRIANGLE
 
-    def add_particle_state(self, position, orientation):
-        """AB.add_particle_state(pos, dir)
+    def arrays(self):
+        """PI.arrays() -> dict of arrays
 
-        Both arguments are tuples. The first one is a particle's absolute space
-        position. The second -- it's orientation as angles of rotation around
-        the z and y axis.
+        The per-vertex data of the impostor, ready for TriangleList.from_arrays.
         """
 
-        if self.__in_current_frame == self.__particle_count:
-            self.__start_frame()
-
-        frame = self.__frames[-1]
-        frame['position'][self.__in_current_frame, :] = position
-        frame['orientation'][self.__in_current_frame, :] = orientation
+        return {'corner': self.CORNERS}
 
-        self.__in_current_frame += 1
 
-    def build(self):
-        """AB.build() -> ParticleAnimation"""
+def rotation_quaternions(orientations):
+    """rotation_quaternions(orientations) -> array of shape (N, 4)
 
-        t_lists = []
-        for frame_data in self.__frames:
-
-            t_list = self.__program.triangle_list(
-                self.__particle_count * self.__model.triangle_count())
-            t_list.from_arrays(frame_data)
+    Turns particle orientations -- rows of angles of rotation around the z and
+    y axis -- into the unit quaternions (x, y, z, w) of the same rotations.
+    """
 
-            t_lists.append(t_list)
+    half_rho = orientations[:, 0] / 2.
+    half_theta = orientations[:, 1] / 2.
 
-        return ParticleAnimation(self.__particle_count, t_lists)
+    c_1, s_1 = numpy.cos(half_rho), numpy.sin(half_rho)
+    c_2, s_2 = numpy.cos(half_theta), numpy.sin(half_theta)
 
+    return numpy.stack(
+        (s_1 * s_2, -c_1 * s_2, s_1 * c_2, c_1 * c_2), axis=-1)
 
-class ParticleAnimation(object):
 
-    """A sequence of frames"""
+def instance_states(states):
+    """instance_states(states) -> float32 array of shape (N, 7)
 
-    def __init__(self, particle_count, frames):
+    Turns the particle states of a frame into the per-instance data the
+    particle shaders need -- the position followed by the rotation quaternion.
+    """
 
-        self.__particle_count = particle_count
-        self.__frames = frames
+    instances = numpy.empty(
+        (len(states), COORDINATES_PER_VERTEX + 4), dtype=numpy.float32)
 
-    @staticmethod
-    def test_animation(program, model, particle_count, frame_count):
-        """ParticleAnimation.test_animation(program, model, particle_count, frame_count) -> ParticleAnimation
+    instances[:, :COORDINATES_PER_VERTEX] = states[:, :COORDINATES_PER_VERTEX]
+    instances[:, COORDINATES_PER_VERTEX:] = rotation_quaternions(
+        states[:, COORDINATES_PER_VERTEX:])
 
-        An example ParticleAnimation"""
+    return instances
 
-        builder = AnimationBuilder(program, model, particle_count)
 
-        for frame_no in range(frame_count):
-            for particle_no in range(particle_count):
+def instance_buffer(particle_count):
+    """instance_buffer(particle_count) -> array, dict of arrays
 
-                builder.add_particle_state(
-                    (6 * particle_no, 0, 0),
-                    (2 * math.pi / frame_count * (particle_no + frame_no), 0))
+    An array with room for the per-instance data of all the particles, as made
+    by instance_states, and the views of it to load as the position and
+    rotation attributes.
+    """
 
-        return builder.build()
+    states = numpy.empty(
+        (particle_count, COORDINATES_PER_VERTEX + 4), dtype=numpy.float32)
 
-    def __generate_frame(self, program, model, no):
-        """PA.__generate_frame(program, model, no) -> triangle list
+    return states, dict(
+        position=states[:, :COORDINATES_PER_VERTEX],
+        rotation=states[:, COORDINATES_PER_VERTEX:])
 
-        No-th frame.
-        """
 
-        frame = program.triangle_list(
-            self.particle_count() * model.triangle_count())
+def projected_lengths(camera, positions, length, viewport_height):
+    """projected_lengths(camera, positions, length, viewport_height) -> array
 
-        arrays = {}
+    Estimates how many pixels long a segment of the given length appears on
+    screen at each of the positions (an array of shape (N, 3)). The camera is
+    the camera transform's matrix. Positions behind the camera get a length of
+    zero.
+    """
 
-        arrays['ix_float'] = numpy.zeros((
-            self.particle_count(),
-            model.vertex_count()))
-        arrays['ix_float'][:] = numpy.arange(model.vertex_count())
+    w = positions.dot(camera[3, :3]) + camera[3, 3]
+    scale = numpy.linalg.norm(camera[1, :3]) * length * viewport_height / 2.
 
-        arrays['position'] = numpy.zeros((
-            self.particle_count(),
-            model.vertex_count(),
-            COORDINATES_PER_VERTEX))
+    with numpy.errstate(divide='ignore'):
 
-        for particle_no, particle in enumerate(arrays['position']):
-            particle[:, 0] += 6 * particle_no
+        return numpy.where(w > 0, scale / w, 0)
 
-        arrays['orientation'] = numpy.zeros((
-            self.particle_count(),
-            model.vertex_count(),
-            ANGLES_PER_ORIENTATION))
 
-        for particle_no, particle in enumerate(arrays['orientation']):
-            particle[:, 0] = 2 * math.pi / \
-                self.frame_count() * (particle_no + no)
+def gather_rows(mask, rows, out):
+    """gather_rows(mask, rows, out) -> number of rows gathered
 
-        frame.from_arrays(arrays)
+    Copies the rows selected by the boolean mask to the start of the out
+    array, which must have room for all of the rows.
+    """
 
-        return frame
+    count = numpy.count_nonzero(mask)
+    numpy.compress(mask, rows, axis=0, out=out[:count])
 
-    def frame(self, no):
-        """PA.frame(no) -> triangle list
+    return count
 
-        Data to render for the no-th current frame.
-        """
 
-        return self.__frames[no]
+def eye_position(camera):
+    """eye_position(camera) -> array of shape (3, )
 
-    def frame_count(self):
-        """PA.frame_count() -> number of frames"""
-
-        return len(self.__frames)
+    The point the camera transform (given by it's matrix) looks from.
+    """
 
-    def particle_count(self):
-        """PA.particle_count() -> the number of particles being displayed"""
+    eye = numpy.linalg.solve(camera, [0, 0, 1, 0])
 
-        return self.__particle_count
+    return eye[:3] / eye[3]
 
 
 class ParticlePlayer(object):
 
-    """Controls triangle list choice for the current frame."""
+    """Controls frame choice for the current moment of the animation."""
 
-    def __init__(self, animation, fps):
+    def __init__(self, animation, fps, start_frame=0):
 
         self.__animation = animation
 
         self.__loop, self.__playing = True, True
-        self.__current_frame = 0
+        self.__current_frame = start_frame % animation.frame_count()
+        self.__direction = 1
 
         self.__frame_dt = 1 / fps
         self.__since_last_frame = 0
 
+        self.__animation.hint(self.__current_frame, self.__direction)
+
+        # Ticking makes the window redraw, so it only happens while playing
         clock.schedule_interval(self.tick, self.__frame_dt)
 
     def toggle_playback(self):
@@ -284,18 +211,48 @@ class ParticlePlayer(object):
         """
 
         if self.__playing:
+
+            self.__stop()
+
+        else:
+
+            clock.schedule_interval(self.tick, self.__frame_dt)
+            self.__playing = True
+
+    def __stop(self):
+        """PP.__stop()
+
+        Pauses the animation, so that it stops ticking.
+        """
+
+        if self.__playing:
+
             self.__since_last_frame = 0
+            clock.unschedule(self.tick)
 
-        self.__playing = not self.__playing
+            self.__playing = False
 
     def frame(self):
-        """PP.frame() -> triangle list
+        """PP.frame() -> array
 
-        Data to render for the current frame.
+        The particle states in the current frame.
         """
 
         return self.__animation.frame(self.__current_frame)
 
+    def seek(self, frame_no):
+        """PP.seek(frame_no)
+
+        Jump to the given frame.
+        """
+
+        self.__current_frame = frame_no % self.frame_count()
+        self.__since_last_frame = 0
+
+        self.__animation.hint(self.__current_frame, self.__direction)
+
+        redraw.invalidate()
+
     def tick(self, dt):
         """PP.tick(dt)
 
@@ -306,7 +263,8 @@ class ParticlePlayer(object):
 
             self.__since_last_frame += dt
 
-            while self.__since_last_frame > self.__frame_dt:
+            while self.__playing and \
+                    self.__since_last_frame > self.__frame_dt:
 
                 self.__since_last_frame -= self.__frame_dt
                 self.next_frame()
@@ -345,46 +303,50 @@ class ParticlePlayer(object):
         Move the animation forward in time by one frame.
         """
 
-        self.__current_frame += 1
+        self.__direction = 1
+
+        if self.__current_frame < self.__last_frame():
+            self.__go_to(self.__current_frame + 1)
 
-        if self.__current_frame >= self.frame_count():
+        elif self.__loop:
+            self.__go_to(self.__first_frame())
 
-            self.__current_frame = self.__first_frame(
-            ) if self.__loop else self.__last_frame()
+        else:
+            self.__stop()
+            self.__go_to(self.__last_frame())
 
     def previous_frame(self):
         """PP.previous_frame()
 
         Move the animation backward in time by one frame.
         """
-        self.__current_frame -= 1
-
-        if self.__current_frame < 0:
-
-            self.__current_frame = self.__last_frame(
-            ) if self.__loop else self.__first_frame()
 
+        self.__direction = -1
 
-def animation_from_file(program, model, filename):
-    """animation_from_file(program, model, filename) -> ParticleAnimation
+        if self.__current_frame > self.__first_frame():
+            self.__go_to(self.__current_frame - 1)
 
-    Load up a paticle animation from a file.
-    """
+        elif self.__loop:
+            self.__go_to(self.__last_frame())
 
-    with open(filename) as input_file:
+        else:
+            self.__stop()
+            self.__go_to(self.__first_frame())
 
-        particle_count = int(input_file.readline().strip())
+    def __go_to(self, frame_no):
+        """PP.__go_to(frame_no)
 
-        builder = AnimationBuilder(program, model, particle_count)
+        Makes the frame current. The scene only gets redrawn when the frame
+        changed -- at the end of an animation that doesn't loop it doesn't.
+        """
 
-        for r_x, r_y, r_z, m_x, m_y, m_z in (
-                map(float, line.strip().split(' ')) for line in input_file.readlines()):
+        changed = frame_no != self.__current_frame
+        self.__current_frame = frame_no
 
-            builder.add_particle_state(
-                (r_x, r_y, r_z),
-                AnimationBuilder.vector_to_angles((m_x, m_y, m_z)))
+        self.__animation.hint(self.__current_frame, self.__direction)
 
-        return builder.build()
+        if changed:
+            redraw.invalidate()
 
 
 class Particles(object):
@@ -399,8 +361,6 @@ class Particles(object):
         height, width = config.particle_dimmensions()
         self.__model = ParticleModel(height, width)
 
-        self.__generate_shaders(self.__model)
-
         self.__program = shaders.Program('particles')
 
         self.__camera = self.__program.uniform(
@@ -411,59 +371,108 @@ class Particles(object):
             'sun',
             shaders.GLSLType(shaders.GLSLType.Vector(3)))
 
-        self.__positions = self.__program.uniform(
-            'positions',
-            shaders.GLSLType(shaders.GLSLType.Vector(3)),
-            self.__model.vertex_count())
-
-        self.__normals = self.__program.uniform(
-            'normals',
-            shaders.GLSLType(shaders.GLSLType.Vector(3)),
-            self.__model.vertex_count())
+        self.__program.attribute(
+            'vertex_position',
+            shaders.GLSLType(shaders.GLSLType.Vector(3)))
 
-        self.__colours = self.__program.uniform(
-            'colours',
-            shaders.GLSLType(shaders.GLSLType.Vector(3)),
-            self.__model.vertex_count())
+        self.__program.attribute(
+            'vertex_normal',
+            shaders.GLSLType(shaders.GLSLType.Vector(3)))
 
-        self.__ix = self.__program.attribute(
-            'ix_float',
-            shaders.GLSLType(shaders.GLSLType.Scalar()))
+        self.__program.attribute(
+            'vertex_colour',
+            shaders.GLSLType(shaders.GLSLType.Vector(3)))
 
-        self.__position = self.__program.attribute(
+        self.__program.attribute(
             'position',
-            shaders.GLSLType(shaders.GLSLType.Vector(3)))
+            shaders.GLSLType(shaders.GLSLType.Vector(3)),
+            per_instance=True)
 
-        self.__orientation = self.__program.attribute(
-            'orientation',
-            shaders.GLSLType(shaders.GLSLType.Vector(2)))
+        self.__program.attribute(
+            'rotation',
+            shaders.GLSLType(shaders.GLSLType.Vector(4)),
+            per_instance=True)
 
         animation = animation_from_file(
-            self.__program, self.__model, config.particle_file())
+            config.particle_file(),
+            config.frame_cache_size(),
+            config.prefetch_window(),
+            config.trajectory_tolerance(),
+            config.keyframe_interval())
         self.__player = ParticlePlayer(
-            animation, config.particle_animation_fps())
+            animation, config.particle_animation_fps(),
+            config.start_frame())
+
+        # The model's geometry is shared by all the particles in all frames
+        self.__triangles = self.__program.triangle_list(
+            self.__model.triangle_count(), animation.particle_count())
+        self.__triangles.from_arrays(self.__model.arrays())
+
+        self.__particle_count = animation.particle_count()
+
+        # The instances drawn with the model are gathered into the same buffer
+        # every frame, so the triangle list keeps the attribute setup
+        self.__near_states, self.__near_arrays = instance_buffer(
+            self.__particle_count)
 
-    def __generate_shaders(self, model):
-        """P.__generate_shaders(model)
+        self.__shown_frame, self.__instances = None, None
 
-        Generate tha shader sources.
+        self.__viewport_height = None
+        self.__lod_pixels = config.lod_pixels()
+
+        if self.__lod_pixels:
+            self.__init_impostors(animation.particle_count())
+
+    def __init_impostors(self, particle_count):
+        """P.__init_impostors(particle_count)
+
+        Prepares for drawing the distant particles as impostors.
         """
 
-        for letter in ('v', 'f'):
+        self.__impostor_program = shaders.Program('particle_impostors')
+
+        self.__impostor_camera = self.__impostor_program.uniform(
+            'camera',
+            shaders.GLSLType(shaders.GLSLType.Matrix(4)))
+
+        self.__impostor_sun = self.__impostor_program.uniform(
+            'sun',
+            shaders.GLSLType(shaders.GLSLType.Vector(3)))
+
+        self.__eye = self.__impostor_program.uniform(
+            'eye',
+            shaders.GLSLType(shaders.GLSLType.Vector(3)))
+
+        self.__size = self.__impostor_program.uniform(
+            'size',
+            shaders.GLSLType(shaders.GLSLType.Vector(2)))
+
+        self.__impostor_program.attribute(
+            'corner',
+            shaders.GLSLType(shaders.GLSLType.Vector(2)))
+
+        self.__impostor_program.attribute(
+            'position',
+            shaders.GLSLType(shaders.GLSLType.Vector(3)),
+            per_instance=True)
 
-            shader_filename = "particles.%s.glsl" % letter
-            template_filename = "template.%s" % shader_filename
+        self.__impostor_program.attribute(
+            'rotation',
+            shaders.GLSLType(shaders.GLSLType.Vector(4)),
+            per_instance=True)
 
-            shader_filename = os.path.join(SHADER_DIR, shader_filename)
-            template_filename = os.path.join(TEMPLATE_DIR, template_filename)
+        self.__far_states, self.__far_arrays = instance_buffer(particle_count)
 
-            with open(template_filename) as input:
-                template = string.Template(input.read())
+        impostor = ParticleImpostor()
 
-            shader_code = model.generate_shader_source(template)
+        self.__impostors = self.__impostor_program.triangle_list(
+            impostor.triangle_count(), particle_count)
+        self.__impostors.from_arrays(impostor.arrays())
 
-            with open(shader_filename, 'w') as output:
-                output.write(shader_code)
+    def player(self):
+        """P.player() -> the ParticlePlayer choosing the frames shown"""
+
+        return self.__player
 
     def on_key_press(self, symbol, modifiers):
 
@@ -483,28 +492,116 @@ class Particles(object):
 
             self.__player.toggle_playback()
 
+    def on_resize(self, width, height):
+
+        self.__viewport_height = height
+
+    def __near(self, states):
+        """P.__near(states) -> boolean array
+
+        Tells which of the particles look big enough on screen to be drawn with
+        the full model.
+        """
+
+        if not self.__lod_pixels or self.__viewport_height is None:
+
+            return numpy.ones(len(states), dtype=bool)
+
+        length, __ = self.__config.particle_dimmensions()
+
+        pixels = projected_lengths(
+            self.__cam.matrix(), states[:, :COORDINATES_PER_VERTEX],
+            length, self.__viewport_height)
+
+        return pixels >= self.__lod_pixels
+
+    def __instance_states(self):
+        """P.__instance_states() -> array
+
+        The per-instance data for the current frame, see instance_states. It
+        only gets computed when the frame changes.
+        """
+
+        frame = self.__player.frame()
+
+        if frame is not self.__shown_frame:
+
+            self.__shown_frame = frame
+            self.__instances = instance_states(frame)
+
+        return self.__instances
+
     def on_draw(self):
         """P.on_draw()
 
-        Renders the particles.
+        Renders the particles. The distant ones are drawn as impostors.
+        """
+
+        states = self.__instance_states()
+
+        near = self.__near(states)
+
+        self.__draw_models(gather_rows(near, states, self.__near_states))
+
+        if self.__lod_pixels:
+
+            self.__draw_impostors(
+                gather_rows(~near, states, self.__far_states))
+
+    def __draw_models(self, count):
+        """P.__draw_models(count)
+
+        Draws the particles with the full model. Their per-instance data are
+        the first count rows of the near states buffer.
         """
 
-        with self.__player.frame() as frame:
+        if not count:
 
-            self.__camera.clear()
-            self.__camera.add(*self.__cam.gl_matrix())
+            return
+
+        self.__triangles.from_instance_arrays(
+            self.__near_arrays, self.__particle_count)
+
+        with self.__triangles as triangles:
+
+            self.__camera.load(self.__cam.gl_matrix())
             self.__camera.set()
 
             if not self.__sun.filled():
                 self.__sun.add(*self.__config.sun_direction())
             self.__sun.set()
 
-            self.__model.populate(
-                self.__positions,
-                self.__normals,
-                self.__colours)
+            triangles.draw(count)
+
+    def __draw_impostors(self, count):
+        """P.__draw_impostors(count)
+
+        Draws the particles as impostors. Their per-instance data are the
+        first count rows of the far states buffer.
+        """
+
+        if not count:
+
+            return
+
+        self.__impostors.from_instance_arrays(
+            self.__far_arrays, self.__particle_count)
+
+        with self.__impostors as impostors:
+
+            self.__impostor_camera.load(self.__cam.gl_matrix())
+            self.__impostor_camera.set()
+
+            if not self.__impostor_sun.filled():
+                self.__impostor_sun.add(*self.__config.sun_direction())
+            self.__impostor_sun.set()
 
-            frame.draw()
+            self.__eye.clear()
+            self.__eye.add(*eye_position(self.__cam.matrix()))
+            self.__eye.set()
 
+            if not self.__size.filled():
+                self.__size.add(*self.__config.particle_dimmensions())
+            self.__size.set()
 
-shaders.shader_path.insert(0, SHADER_DIR)
+            impostors.draw(count)
@@ -0,0 +1,30 @@
+#version 120
+
+uniform mat4 camera;
+
+// The particle model, the same for all instances
+attribute vec3 vertex_position;
+attribute vec3 vertex_normal;
+attribute vec3 vertex_colour;
+
+// The state of a particle, one per instance
+attribute vec3 position;
+attribute vec4 rotation;
+
+varying vec3 normal;
+varying vec3 colour;
+
+// Rotates the vector by the unit quaternion
+vec3 rotate(vec4 q, vec3 v) {
+
+	return v + 2.0 * cross(q.xyz, cross(q.xyz, v) + q.w * v);
+}
+
+void main(void) {
+
+	normal = rotate(rotation, vertex_normal);
+	colour = vertex_colour;
+
+	vec3 local_position = rotate(rotation, vertex_position);
+	gl_Position = camera * vec4(local_position + position, 1);
+}
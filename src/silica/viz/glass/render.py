@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+
+__all__ = ['FrameRenderer', 'render_frames', 'write_png']
+
+import os
+import os.path
+import zlib
+import struct
+import logging
+import ctypes as c
+
+import numpy
+import pyglet
+from pyglet import gl
+
+from silica.viz.common.startup import startup_profile
+from silica.viz.glass.app import DisplayApp
+
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+PNG_COMPRESSION = 6
+
+FRAME_FILENAME = 'frame-%06d.png'
+
+
+def png_chunk(kind, data):
+    """png_chunk(kind, data) -> bytes of a PNG chunk"""
+
+    checksum = zlib.crc32(kind + data) & 0xffffffff
+
+    return struct.pack('>I', len(data)) + kind + data + \
+        struct.pack('>I', checksum)
+
+
+def write_png(filename, pixels, compression=PNG_COMPRESSION):
+    """write_png(filename, pixels, compression=PNG_COMPRESSION)
+
+    Saves an RGB image, given as an array of unsigned bytes of shape (height,
+    width, 3) with the top row first, as a PNG file. The same pixels always
+    give the same file.
+    """
+
+    height, width, __ = pixels.shape
+
+    # Each row starts with the number of the filter it was encoded with --
+    # 0 stands for none
+    rows = numpy.zeros((height, 1 + 3 * width), dtype=numpy.uint8)
+    rows[:, 1:] = pixels.reshape((height, -1))
+
+    header = struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)
+
+    with open(filename, 'wb') as png_file:
+
+        png_file.write(PNG_SIGNATURE)
+        png_file.write(png_chunk(b'IHDR', header))
+        png_file.write(png_chunk(
+            b'IDAT', zlib.compress(rows.tobytes(), compression)))
+        png_file.write(png_chunk(b'IEND', b''))
+
+
+def frame_filename(directory, frame_no):
+    """frame_filename(directory, frame_no) -> name of the frame's PNG file"""
+
+    return os.path.join(directory, FRAME_FILENAME % frame_no)
+
+
+class FrameRenderer(object):
+
+    """Renders the frames of a particle animation offscreen.
+
+    The camera circles around the glass, turning by a fixed angle between
+    consecutive frames, so each frame looks the same no matter in what order
+    and by which process it is rendered.
+    """
+
+    def __init__(self, config):
+
+        self.__config = config
+
+        width, height = config.render_size()
+
+        # Nothing shows up on screen, so nothing needs to wait for it either
+        with startup_profile.step('window'):
+
+            self.__window = pyglet.window.Window(
+                width=width, height=height, visible=False, vsync=False)
+
+        self.__app = DisplayApp(config, self.__window)
+        self.__app.prepare_gl()
+
+        self.__window.switch_to()
+        self.__window.dispatch_event('on_resize', width, height)
+
+        self.__rot = self.__app.transforms()['rot']
+
+    def frame_count(self):
+        """FR.frame_count() -> number of frames to render
+
+        When there are no particles, there is a single frame to render.
+        """
+
+        particles = self.__app.particles()
+
+        if particles is None:
+
+            return 1
+
+        return particles.player().frame_count()
+
+    def __place_camera(self, frame_no):
+        """FR.__place_camera(frame_no)
+
+        Moves the camera to where it should be for the frame.
+        """
+
+        horiz, up, forward = self.__config.init_rot_basis()
+
+        self.__rot.set_basis(horiz, up, forward)
+        self.__rot.rotate(up, frame_no * self.__config.render_orbit())
+
+    def render(self, frame_no):
+        """FR.render(frame_no) -> array of shape (height, width, 3)
+
+        Renders the frame and returns it's pixels, with the top row first.
+        """
+
+        particles = self.__app.particles()
+
+        if particles is not None:
+            particles.player().seek(frame_no)
+
+        self.__place_camera(frame_no)
+
+        self.__window.switch_to()
+        self.__window.dispatch_event('on_draw')
+
+        width, height = self.__window.get_framebuffer_size()
+
+        pixels = numpy.empty((height, width, 3), dtype=numpy.uint8)
+
+        gl.glPixelStorei(gl.GL_PACK_ALIGNMENT, 1)
+        gl.glReadPixels(
+            0, 0, width, height, gl.GL_RGB, gl.GL_UNSIGNED_BYTE,
+            pixels.ctypes.data_as(c.c_void_p))
+
+        # OpenGL puts the bottom row first
+        return pixels[::-1]
+
+    def render_to(self, directory, frame_no):
+        """FR.render_to(directory, frame_no)
+
+        Renders the frame into a PNG file in the directory.
+        """
+
+        write_png(frame_filename(directory, frame_no), self.render(frame_no))
+
+    def finish(self):
+        """FR.finish()
+
+        Writes out the timings of the frames rendered.
+        """
+
+        self.__app.finish()
+
+
+def render_frames(config):
+    """render_frames(config)
+
+    Renders all the frames of the configured particle animation into PNG files
+    in the configured directory, as fast as possible.
+    """
+
+    directory = config.render_directory()
+
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+
+    renderer = FrameRenderer(config)
+
+    startup_profile.report()
+
+    frame_count = renderer.frame_count()
+
+    for frame_no in range(frame_count):
+
+        renderer.render_to(directory, frame_no)
+
+        logging.info('Rendered frame %d of %d', frame_no + 1, frame_count)
+
+    renderer.finish()
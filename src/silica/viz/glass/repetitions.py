@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+
+__all__ = ['Repetitions']
+
+import numpy
+
+from silica.viz.common import shaders
+from silica.viz.common.frustum import Frustum, CullingCounter
+
+
+INSTANCED = 'INSTANCED'
+
+# The vertex shader source defining the shift function
+SHIFT_SOURCE = 'repetitions'
+
+
+class Repetitions(object):
+
+    """Draws the copies of something repeated along with the glass piece.
+
+    When the OpenGL implementation supports ARB_draw_instanced the copies get
+    drawn with instanced draw calls and the vertex shader works out the shift
+    of each copy from gl_InstanceIDARB. Otherwise every copy is drawn
+    separately, with it's shift passed through the copy_shift uniform.
+
+    Copies whose bounding boxes lie outside of the camera's view frustum are
+    not drawn at all (unless culling is disabled in the config).
+    """
+
+    def __init__(self, config, cam):
+
+        self.__config = config
+        self.__instanced = shaders.have_instancing()
+
+        self.__frustum = Frustum(cam)
+        self.__counter = CullingCounter()
+
+        self.__shifts = None
+
+        self.__copy_shift = None
+        self.__copy_size = None
+        self.__repetitions = None
+        self.__first_copy = None
+
+    def instanced(self):
+        """R.instanced() -> bool
+
+        Are the copies drawn with instanced draw calls?
+        """
+
+        return self.__instanced
+
+    def culling(self):
+        """R.culling() -> CullingCounter
+
+        Counts the copies drawn and culled since the last call to start_frame.
+        """
+
+        return self.__counter
+
+    def defines(self):
+        """R.defines() -> tuple of names
+
+        Preprocessor symbols the shaders of the program should be built with.
+        """
+
+        return (INSTANCED, ) if self.__instanced else ()
+
+    def program(self, name, defines=()):
+        """R.program(name, defines=()) -> shaders.Program
+
+        Builds the named program, so that it can be used to draw the copies,
+        and sets up the uniforms it needs for that. The vertex shader gets the
+        shift function (from repetitions.v.glsl) put in front of it, giving
+        the shift of the copy being drawn. The program gets built with the
+        given preprocessor symbols on top of those needed for drawing the
+        copies.
+        """
+
+        shift, __ = shaders.find_shader_source(SHIFT_SOURCE, 'v')
+        vertex, __ = shaders.find_shader_source(name, 'v')
+
+        program = shaders.Program(
+            name, self.defines() + tuple(defines),
+            {'v': shaders.add_prelude(vertex, shift)})
+
+        if self.__instanced:
+
+            self.__copy_size = program.uniform(
+                'copy_size',
+                shaders.GLSLType(shaders.GLSLType.Vector(3)))
+
+            self.__repetitions = program.uniform(
+                'repetitions',
+                shaders.GLSLType(shaders.GLSLType.Vector(3)))
+
+            self.__first_copy = program.uniform(
+                'first_copy', shaders.GLSLType())
+
+        else:
+
+            self.__copy_shift = program.uniform(
+                'copy_shift',
+                shaders.GLSLType(shaders.GLSLType.Vector(3)))
+
+        return program
+
+    def copy_count(self):
+        """R.copy_count() -> total number of copies"""
+
+        x_rep, y_rep, z_rep = self.__config.glass_repetitions()
+
+        return x_rep * y_rep * z_rep
+
+    def shifts(self):
+        """R.shifts() -> array of shape (copies, 3)
+
+        The shifts of all the copies, ordered by x, then y, then z copy index.
+        """
+
+        if self.__shifts is None:
+
+            copy_indices = numpy.indices(
+                self.__config.glass_repetitions()).reshape((3, -1)).T
+
+            self.__shifts = copy_indices * numpy.array(
+                self.__config.grid_size())
+
+        return self.__shifts
+
+    def start_frame(self):
+        """R.start_frame()
+
+        Prepares for drawing a new frame.
+        """
+
+        self.__counter.reset()
+
+    def visible(self, low, high):
+        """R.visible(low, high) -> array of copy numbers
+
+        Numbers of the copies of an axis-aligned box (given by it's minimal and
+        maximal corner) that might be visible, in ascending order.
+        """
+
+        if not self.__config.frustum_culling():
+
+            return numpy.arange(self.copy_count())
+
+        shifts = self.shifts()
+
+        mask = self.__frustum.boxes_visible(
+            shifts + numpy.array(low),
+            shifts + numpy.array(high))
+
+        return numpy.flatnonzero(mask)
+
+    def draw(self, triangles, low, high):
+        """R.draw(triangles, low, high)
+
+        Draws all the potentially visible copies of the triangle list. The low
+        and high corners bound the triangle list in space. Must be called while
+        the triangle list is in use.
+        """
+
+        visible = self.visible(low, high)
+
+        self.__counter.count(
+            len(visible), self.copy_count() - len(visible))
+
+        if not len(visible):
+
+            return
+
+        if self.__instanced:
+
+            self.__copy_size.clear()
+            self.__copy_size.add(*self.__config.grid_size())
+            self.__copy_size.set()
+
+            self.__repetitions.clear()
+            self.__repetitions.add(*self.__config.glass_repetitions())
+            self.__repetitions.set()
+
+            # Each run of consecutively numbered copies takes one draw call
+            breaks = numpy.flatnonzero(numpy.diff(visible) != 1) + 1
+
+            for run in numpy.split(visible, breaks):
+
+                self.__first_copy.clear()
+                self.__first_copy.add(float(run[0]))
+                self.__first_copy.set()
+
+                triangles.draw_instanced(len(run))
+
+        else:
+
+            for shift in self.shifts()[visible]:
+
+                self.__copy_shift.clear()
+                self.__copy_shift.add(*shift)
+                self.__copy_shift.set()
+
+                triangles.draw()
@@ -0,0 +1,31 @@
+// The shift of the copy being drawn, put into the vertex shaders of the
+// programs drawing repeated copies by Repetitions.program
+
+#ifdef INSTANCED
+#extension GL_ARB_draw_instanced : require
+#endif
+
+#ifdef INSTANCED
+uniform vec3 copy_size;
+uniform vec3 repetitions;
+uniform float first_copy;
+#else
+uniform vec3 copy_shift;
+#endif
+
+vec3 shift(void) {
+
+#ifdef INSTANCED
+	// The copies are numbered by x, then y, then z copy index
+	float copy = first_copy + float(gl_InstanceIDARB) + 0.5;
+
+	float x_copy = floor(copy / (repetitions.y * repetitions.z));
+	float yz_copy = floor(copy - x_copy * repetitions.y * repetitions.z);
+	float y_copy = floor((yz_copy + 0.5) / repetitions.z);
+	float z_copy = yz_copy - y_copy * repetitions.z;
+
+	return copy_size * vec3(x_copy, y_copy, z_copy);
+#else
+	return copy_shift;
+#endif
+}
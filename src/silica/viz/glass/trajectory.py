@@ -0,0 +1,239 @@
+# -*- coding: utf-8 -*-
+
+__all__ = [
+    'MAGIC', 'is_trajectory', 'open_trajectory', 'TrajectoryWriter',
+    'read_particle_count', 'parse_states', 'convert_text']
+
+import sys
+import struct
+import argparse
+import itertools
+
+import numpy
+
+
+# See README.mkd for a description of the format
+MAGIC = b'SILTRAJ\0'
+VERSION = 1
+
+COMPONENTS_PER_PARTICLE = 6
+
+HEADER = struct.Struct('<8sII8sQQ')
+HEADER_SIZE = 64
+
+
+def is_trajectory(filename):
+    """is_trajectory(filename) -> bool
+
+    Does the file look like a trajectory file?
+    """
+
+    with open(filename, 'rb') as input_file:
+
+        return input_file.read(len(MAGIC)) == MAGIC
+
+
+def open_trajectory(filename):
+    """open_trajectory(filename) -> memory-mapped array
+
+    Maps the payload of a trajectory file into memory as a read-only array of
+    shape (frames, COMPONENTS_PER_PARTICLE, particles).
+    """
+
+    with open(filename, 'rb') as input_file:
+
+        header = input_file.read(HEADER.size)
+
+    if len(header) < HEADER.size:
+
+        raise ValueError('%s is too short to be a trajectory' % filename)
+
+    magic, version, components, dtype, particles, frames = HEADER.unpack(
+        header)
+
+    if magic != MAGIC:
+
+        raise ValueError('%s is not a trajectory file' % filename)
+
+    if version != VERSION or components != COMPONENTS_PER_PARTICLE:
+
+        raise ValueError(
+            '%s is a trajectory of an unsupported version' % filename)
+
+    dtype = numpy.dtype(dtype.rstrip(b'\0').decode('ascii'))
+    shape = (frames, COMPONENTS_PER_PARTICLE, particles)
+
+    # Empty files can't be mapped
+    if not frames or not particles:
+        return numpy.zeros(shape, dtype=dtype)
+
+    return numpy.memmap(
+        filename, mode='r',
+        dtype=dtype, offset=HEADER_SIZE, shape=shape)
+
+
+class TrajectoryWriter(object):
+
+    """Writes a trajectory file frame by frame."""
+
+    def __init__(self, filename, particle_count, dtype=numpy.float32):
+
+        self.__file = open(filename, 'wb')
+        self.__particle_count = particle_count
+        self.__dtype = numpy.dtype(dtype)
+        self.__frame_count = 0
+
+        self.__write_header()
+
+    def __write_header(self):
+        """TW.__write_header()
+
+        (Re)writes the header at the start of the file.
+        """
+
+        self.__file.seek(0)
+
+        header = HEADER.pack(
+            MAGIC, VERSION, COMPONENTS_PER_PARTICLE,
+            self.__dtype.str.encode('ascii'),
+            self.__particle_count, self.__frame_count)
+
+        self.__file.write(header.ljust(HEADER_SIZE, b'\0'))
+
+    def write_frame(self, states):
+        """TW.write_frame(states)
+
+        Appends a frame. The states are an array of shape (particles,
+        COMPONENTS_PER_PARTICLE), as found in particle animation text files.
+        """
+
+        states = numpy.asarray(states).reshape(
+            (self.__particle_count, COMPONENTS_PER_PARTICLE))
+
+        numpy.ascontiguousarray(
+            states.T, dtype=self.__dtype).tofile(self.__file)
+
+        self.__frame_count += 1
+
+    def close(self):
+        """TW.close()
+
+        Fills in the frame count and closes the file.
+        """
+
+        self.__write_header()
+        self.__file.close()
+
+    def __enter__(self):
+
+        return self
+
+    def __exit__(self, type, value, traceback):
+
+        self.close()
+
+
+def read_particle_count(input_file):
+    """read_particle_count(input_file) -> int
+
+    Reads the particle count from the first line of a particle animation text
+    file.
+    """
+
+    line = input_file.readline()
+
+    try:
+        particle_count = int(line)
+    except ValueError:
+        particle_count = 0
+
+    if particle_count <= 0:
+
+        raise ValueError(
+            'A particle animation must start with a positive particle count, '
+            'not %r' % line.strip())
+
+    return particle_count
+
+
+def parse_states(text, particle_count):
+    """parse_states(text, particle_count) -> array of shape (particles, 6)
+
+    Parses whole lines of a particle animation text file in one go. Blank
+    lines are skipped. The number of particles must be a multiple of the
+    particle count.
+    """
+
+    try:
+        states = numpy.array(text.split(), dtype=numpy.float64)
+    except ValueError as err:
+        raise ValueError('Malformed particle data: %s' % err)
+
+    if states.size % (particle_count * COMPONENTS_PER_PARTICLE):
+
+        raise ValueError(
+            'Particle data does not make up whole frames of %d particles' %
+            particle_count)
+
+    return states.reshape((-1, COMPONENTS_PER_PARTICLE))
+
+
+def convert_text(source, destination, dtype=numpy.float32):
+    """convert_text(source, destination, dtype=numpy.float32) -> frame count
+
+    Converts a particle animation text file into a trajectory file.
+    """
+
+    with open(source, 'rb') as input_file:
+
+        particle_count = read_particle_count(input_file)
+        lines = (line for line in input_file if line.strip())
+
+        with TrajectoryWriter(
+                destination, particle_count, dtype) as writer:
+
+            frame_no = 0
+            while True:
+
+                frame = list(itertools.islice(lines, particle_count))
+
+                if len(frame) < particle_count:
+                    break
+
+                writer.write_frame(
+                    parse_states(b''.join(frame), particle_count))
+                frame_no += 1
+
+    return frame_no
+
+
+def main(argv):
+    """main(argv)
+
+    Runs the converter with the given command line arguments.
+    """
+
+    parser = argparse.ArgumentParser(
+        description='convert a particle animation into a trajectory file')
+
+    parser.add_argument(
+        'source', help='particle animation text file')
+
+    parser.add_argument(
+        'destination', help='trajectory file to write')
+
+    parser.add_argument(
+        '-d', '--dtype',
+        help='type of the stored numbers',
+        choices=['float32', 'float64'], default='float32')
+
+    args = parser.parse_args(argv)
+
+    frames = convert_text(args.source, args.destination, args.dtype)
+
+    sys.stdout.write('%d frames written to %s\n' % (frames, args.destination))
+
+
+if __name__ == '__main__':
+
+    main(sys.argv[1:])
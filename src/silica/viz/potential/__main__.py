@@ -12,6 +12,8 @@ from silica.viz.common import shaders
 from silica.viz.common import transform
 from silica.viz.common.transform.dicts import common_transforms
 from silica.viz.common.constants import *
+from silica.viz.common.glstate import gl_state
+from silica.viz.common.redraw import redraw
 from silica.viz.common.camera import Cameraman, cam_transforms
 from silica.viz.common.axes import Axes
 from silica.viz.potential.potential import ArgsParser, Config, Potential
@@ -24,6 +26,8 @@ class DisplayApp(object):
     def __init__(self, config):
 
         self.__window = config.create_window()
+        redraw.watch(self.__window)
+
         keys = pyglet.window.key.KeyStateHandler()
         transforms = {}
 
@@ -44,8 +48,6 @@ class DisplayApp(object):
         self.__window.push_handlers(
             keys)
 
-        pyglet.clock.set_fps_limit(config.max_fps())
-
         self.__config = config
 
     def run(self):
@@ -58,7 +60,7 @@ class DisplayApp(object):
 
             raise RuntimeError('OpenGL 2.1 required!')
 
-        gl.glEnable(gl.GL_DEPTH_TEST)
+        gl_state.enable(gl.GL_DEPTH_TEST)
 
         pyglet.app.run()
 
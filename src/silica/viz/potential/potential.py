@@ -163,8 +163,7 @@ class Potential(object):
 
         with self.__triangles as triangles:
 
-            self.__camera.clear()
-            self.__camera.add(*self.__cam.gl_matrix())
+            self.__camera.load(self.__cam.gl_matrix())
             self.__camera.set()
 
             if not self.__color.filled():
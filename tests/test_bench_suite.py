@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+
+from silica.bench import suite
+
+
+def result(stage, case, **measurements):
+
+    measurements.update(stage=stage, case=case)
+
+    return measurements
+
+
+class RegressionsTest(unittest.TestCase):
+
+    def setUp(self):
+
+        self.baseline = [
+            result('meshing', 'size=32', seconds=1.0, peak_rss_mb=100.0),
+            result('grid_load', 'size=32', seconds=2.0, peak_rss_mb=0)]
+
+    def test_slower_beyond_the_threshold(self):
+
+        found = suite.regressions(
+            [result('meshing', 'size=32', seconds=1.5, peak_rss_mb=105.0)],
+            self.baseline, 0.1)
+
+        self.assertEqual(len(found), 1)
+        self.assertEqual(found[0]['measurement'], 'seconds')
+        self.assertEqual(found[0]['baseline'], 1.0)
+        self.assertEqual(found[0]['value'], 1.5)
+        self.assertAlmostEqual(found[0]['change'], 0.5)
+
+    def test_within_the_threshold_or_faster(self):
+
+        self.assertEqual(suite.regressions(
+            [result('meshing', 'size=32', seconds=1.05, peak_rss_mb=50.0)],
+            self.baseline, 0.1), [])
+
+    def test_unknown_cases_and_missing_measurements_skipped(self):
+
+        self.assertEqual(suite.regressions(
+            [result('meshing', 'size=64', seconds=10.0),
+             result('grid_load', 'size=32', seconds=1.0, peak_rss_mb=10.0),
+             result('meshing', 'size=32', peak_rss_mb=100.0)],
+            self.baseline, 0.1), [])
+
+
+class BenchmarkCasesTest(unittest.TestCase):
+
+    def test_case_names_do_not_depend_on_order(self):
+
+        self.assertEqual(
+            suite.case_name({'size': 32, 'porosity': 0.5}),
+            'porosity=0.5 size=32')
+
+    def test_cases_for_the_chosen_stages(self):
+
+        args = suite.ArgsParser().parse_args([
+            '--stages', 'meshing', 'animation',
+            '--sizes', '8', '16', '--porosities', '0.5',
+            '--particles', '10', '--frames', '3'])
+
+        self.assertEqual(suite.benchmark_cases(args), [
+            ('meshing', {'size': 8, 'porosity': 0.5}),
+            ('meshing', {'size': 16, 'porosity': 0.5}),
+            ('animation', {'particles': 10, 'frames': 3})])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+
+import math
+import unittest
+
+import numpy
+
+from silica.viz.glass import animation
+
+
+TOLERANCE = 1e-3
+ANGLE_TOLERANCE = 1e-2
+
+
+def random_walk(frame_count, particle_count, step, seed=0):
+    """random_walk(frame_count, particle_count, step, seed=0) -> frames
+
+    An animation of particles making random steps, with the angles wrapped
+    into [-pi, pi).
+    """
+
+    random = numpy.random.RandomState(seed)
+
+    steps = random.uniform(
+        -step, step,
+        (frame_count, particle_count, animation.COMPONENTS_PER_STATE))
+
+    frames = steps.cumsum(axis=0)
+    frames[..., 3:] = animation.wrap_angles(frames[..., 3:])
+
+    return frames
+
+
+class DeltaFrameSourceTest(unittest.TestCase):
+
+    def encode(self, frames, keyframe_interval=8):
+
+        return animation.DeltaFrameSource(
+            animation.ArrayFrameSource(frames.shape[1], frames),
+            TOLERANCE, ANGLE_TOLERANCE, keyframe_interval)
+
+    def assertWithinTolerances(self, decoded, frame):
+
+        # Leave room for the single precision of the decoded frames
+        positions = numpy.abs(decoded[:, :3] - frame[:, :3])
+        angles = numpy.abs(
+            animation.wrap_angles(decoded[:, 3:] - frame[:, 3:]))
+
+        self.assertLessEqual(positions.max(), TOLERANCE * 1.01)
+        self.assertLessEqual(angles.max(), ANGLE_TOLERANCE * 1.01)
+
+    def test_frames_within_tolerances(self):
+
+        frames = random_walk(40, 10, 0.05)
+        source = self.encode(frames)
+
+        self.assertEqual(source.particle_count(), 10)
+        self.assertEqual(source.frame_count(), 40)
+
+        for no in range(40):
+            self.assertWithinTolerances(source.read_frame(no), frames[no])
+
+    def test_errors_do_not_pile_up(self):
+
+        frames = random_walk(300, 4, 0.05, seed=1)
+        source = self.encode(frames, keyframe_interval=1000)
+
+        self.assertWithinTolerances(source.read_frame(299), frames[299])
+
+    def test_angles_wrap_around(self):
+
+        frames = numpy.zeros((3, 1, animation.COMPONENTS_PER_STATE))
+        frames[:, 0, 3] = [math.pi - 0.01, -math.pi + 0.01, math.pi - 0.02]
+
+        source = self.encode(frames)
+
+        for no in range(3):
+            self.assertWithinTolerances(source.read_frame(no), frames[no])
+
+    def test_keyframes_are_exact(self):
+
+        frames = random_walk(20, 5, 0.05, seed=2)
+        source = self.encode(frames, keyframe_interval=8)
+
+        for no in (0, 8, 16):
+
+            numpy.testing.assert_array_equal(
+                source.read_frame(no), frames[no].astype(numpy.float32))
+
+    def test_large_jump_becomes_a_keyframe(self):
+
+        frames = random_walk(6, 3, 0.05, seed=3)
+        frames[3:, :, :3] += 1000
+
+        source = self.encode(frames)
+
+        numpy.testing.assert_array_equal(
+            source.read_frame(3), frames[3].astype(numpy.float32))
+
+        for no in range(6):
+            self.assertWithinTolerances(source.read_frame(no), frames[no])
+
+    def test_smaller_than_the_frames(self):
+
+        frames = random_walk(64, 100, 0.05, seed=4)
+        source = self.encode(frames, keyframe_interval=16)
+
+        self.assertLess(
+            source.nbytes(), frames.astype(numpy.float32).nbytes / 2)
+
+    def test_tolerances_must_be_positive(self):
+
+        source = animation.ArrayFrameSource(1, random_walk(2, 1, 0.1))
+
+        self.assertRaises(
+            ValueError, animation.DeltaFrameSource, source, 0)
+        self.assertRaises(
+            ValueError, animation.DeltaFrameSource, source, 1e-3, -1)
+
+
+if __name__ == '__main__':
+    unittest.main()
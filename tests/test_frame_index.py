@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy
+
+from silica.viz.glass import animation
+
+
+def write_animation(filename, frames):
+    """write_animation(filename, frames)
+
+    Writes the frames (an array of shape (frames, particles, 6)) as a
+    particle animation text file.
+    """
+
+    with open(filename, 'wb') as output_file:
+
+        output_file.write(b'%d\n' % frames.shape[1])
+
+        for states in frames:
+            for state in states:
+                output_file.write(
+                    b' '.join(repr(value).encode('ascii')
+                              for value in state) + b'\n')
+
+
+class FrameIndexTest(unittest.TestCase):
+
+    def setUp(self):
+
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, 'particles.txt')
+        self.index_name = self.filename + animation.INDEX_SUFFIX
+
+        self.frames = numpy.random.RandomState(0).rand(5, 3, 6)
+        write_animation(self.filename, self.frames)
+
+    def tearDown(self):
+
+        shutil.rmtree(self.directory)
+
+    def test_round_trip(self):
+
+        file_stat = os.stat(self.filename)
+        offsets = numpy.array([2, 40, 80], dtype=numpy.int64)
+
+        animation.write_frame_index(self.index_name, file_stat, 3, offsets)
+
+        numpy.testing.assert_array_equal(
+            animation.read_frame_index(self.index_name, file_stat, 3),
+            offsets)
+
+    def test_missing_stale_or_damaged(self):
+
+        file_stat = os.stat(self.filename)
+
+        self.assertIsNone(
+            animation.read_frame_index(self.index_name, file_stat, 3))
+
+        animation.write_frame_index(
+            self.index_name, file_stat, 3, numpy.arange(4))
+
+        # Made for another particle count
+        self.assertIsNone(
+            animation.read_frame_index(self.index_name, file_stat, 4))
+
+        # Made before the file changed
+        with open(self.filename, 'ab') as output_file:
+            output_file.write(b'\n')
+
+        self.assertIsNone(animation.read_frame_index(
+            self.index_name, os.stat(self.filename), 3))
+
+        # Cut short
+        with open(self.index_name, 'r+b') as index_file:
+            index_file.truncate(animation.INDEX_HEADER.size + 8)
+
+        self.assertIsNone(
+            animation.read_frame_index(self.index_name, file_stat, 3))
+
+    def test_frames_read_through_the_index(self):
+
+        source = animation.TextFrameSource(self.filename)
+
+        self.assertTrue(os.path.exists(self.index_name))
+        self.assertEqual(source.frame_count(), 5)
+
+        scan = animation.frame_offsets
+
+        def fail(input_file, particle_count):
+            raise AssertionError('The index was not used')
+
+        animation.frame_offsets = fail
+
+        try:
+            source = animation.TextFrameSource(self.filename)
+        finally:
+            animation.frame_offsets = scan
+
+        self.assertEqual(source.particle_count(), 3)
+
+        for no in (4, 0, 2):
+
+            numpy.testing.assert_allclose(
+                source.read_frame(no),
+                animation.AnimationBuilder.states_to_frames(self.frames[no]),
+                rtol=1e-6)
+
+
+if __name__ == '__main__':
+    unittest.main()
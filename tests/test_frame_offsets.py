@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+
+import io
+import unittest
+
+import numpy
+
+from silica.viz.glass import animation
+from silica.viz.glass import trajectory
+
+
+LINE = b'1 2 3 4 5 6\n'
+
+
+class FrameOffsetsTest(unittest.TestCase):
+
+    def setUp(self):
+
+        self.chunk_size = animation.SCAN_CHUNK_SIZE
+
+    def tearDown(self):
+
+        animation.SCAN_CHUNK_SIZE = self.chunk_size
+
+    def offsets(self, text, particle_count):
+        """Scans the text in chunks of every size from one byte up."""
+
+        found = []
+
+        for chunk_size in range(1, len(text) + 2):
+
+            animation.SCAN_CHUNK_SIZE = chunk_size
+            found.append(list(animation.frame_offsets(
+                io.BytesIO(text), particle_count)))
+
+        for offsets in found[1:]:
+            self.assertEqual(offsets, found[0])
+
+        return found[0]
+
+    def test_whole_frames(self):
+
+        self.assertEqual(
+            self.offsets(LINE * 6, 2),
+            [0, 2 * len(LINE), 4 * len(LINE)])
+
+    def test_unfinished_frame_left_out(self):
+
+        self.assertEqual(self.offsets(LINE * 5, 2), [0, 2 * len(LINE)])
+
+    def test_last_line_without_newline(self):
+
+        self.assertEqual(
+            self.offsets(LINE * 3 + LINE.rstrip(), 2), [0, 2 * len(LINE)])
+
+    def test_blank_lines_skipped(self):
+
+        first = b'\n' + LINE + b' \t\r\n' + LINE
+        text = first + b'\n\n' + LINE + LINE
+
+        # The second frame starts with the blank lines before it
+        self.assertEqual(self.offsets(text, 2), [0, len(first)])
+
+    def test_starts_at_the_current_position(self):
+
+        input_file = io.BytesIO(b'2\n' + LINE * 4)
+
+        self.assertEqual(trajectory.read_particle_count(input_file), 2)
+        self.assertEqual(
+            list(animation.frame_offsets(input_file, 2)),
+            [2, 2 + 2 * len(LINE)])
+
+    def test_empty(self):
+
+        self.assertEqual(self.offsets(b'', 3), [])
+
+    def test_invalid_particle_count(self):
+
+        self.assertRaises(
+            ValueError, animation.frame_offsets, io.BytesIO(LINE), 0)
+
+        for header in (b'0\n', b'-1\n', b'\n', b'one\n'):
+
+            self.assertRaises(
+                ValueError, trajectory.read_particle_count,
+                io.BytesIO(header + LINE))
+
+
+class ParseStatesTest(unittest.TestCase):
+
+    def test_parses_whole_frames(self):
+
+        states = trajectory.parse_states(LINE + b'\n' + LINE, 2)
+
+        self.assertEqual(states.shape, (2, 6))
+        numpy.testing.assert_array_equal(states[1], [1, 2, 3, 4, 5, 6])
+
+    def test_rejects_partial_frames(self):
+
+        self.assertRaises(ValueError, trajectory.parse_states, LINE * 3, 2)
+        self.assertRaises(ValueError, trajectory.parse_states, b'1 2 3', 1)
+
+    def test_rejects_malformed_numbers(self):
+
+        self.assertRaises(
+            ValueError, trajectory.parse_states, b'1 2 3 4 5 x\n', 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
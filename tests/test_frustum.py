@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+
+import numpy
+
+from silica.viz.common import transform
+from silica.viz.common.frustum import Frustum, CullingCounter
+
+
+class FrustumTest(unittest.TestCase):
+
+    def setUp(self):
+
+        # The identity transform sees the cube -1 <= x, y, z <= 1
+        self.frustum = Frustum(transform.Product())
+
+    def visible(self, lows, highs):
+
+        return list(self.frustum.boxes_visible(
+            numpy.array(lows, dtype=float), numpy.array(highs, dtype=float)))
+
+    def test_planes_of_the_identity(self):
+
+        planes = self.frustum.planes()
+
+        self.assertEqual(planes.shape, (6, 4))
+
+        inside = numpy.array([0.5, -0.5, 0.9, 1])
+        outside = numpy.array([0, 0, 1.5, 1])
+
+        self.assertTrue((planes.dot(inside) >= 0).all())
+        self.assertFalse((planes.dot(outside) >= 0).all())
+
+    def test_boxes_inside_and_straddling_are_visible(self):
+
+        self.assertEqual(
+            self.visible(
+                [(-0.5, -0.5, -0.5), (0.5, 0.5, 0.5), (-3, -3, -3)],
+                [(0.5, 0.5, 0.5), (2, 2, 2), (3, 3, 3)]),
+            [True, True, True])
+
+    def test_boxes_outside_are_culled(self):
+
+        self.assertEqual(
+            self.visible(
+                [(2, -0.5, -0.5), (-0.5, -3, -0.5), (-0.5, -0.5, 1.1)],
+                [(3, 0.5, 0.5), (0.5, -2, 0.5), (0.5, 0.5, 2)]),
+            [False, False, False])
+
+    def test_planes_follow_the_camera(self):
+
+        shift = transform.Translate(0, 0, 0)
+
+        camera = transform.Product()
+        camera.add_factor(shift)
+
+        frustum = Frustum(camera)
+        low, high = numpy.array([(2, 0, 0)]), numpy.array([(2.5, 0.5, 0.5)])
+
+        self.assertFalse(frustum.boxes_visible(low, high)[0])
+
+        shift.set_r(-2, 0, 0)
+
+        self.assertTrue(frustum.boxes_visible(low, high)[0])
+
+
+class CullingCounterTest(unittest.TestCase):
+
+    def test_counts_until_reset(self):
+
+        counter = CullingCounter()
+
+        counter.count(3, 1)
+        counter.count(2, 4)
+
+        self.assertEqual((counter.drawn(), counter.culled()), (5, 5))
+
+        counter.reset()
+
+        self.assertEqual((counter.drawn(), counter.culled()), (0, 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
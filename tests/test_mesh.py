@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+
+import shutil
+import tempfile
+import unittest
+
+import numpy
+
+from silica.viz.glass import mesh
+from silica.viz.glass.batch import shard_frames
+
+
+# The vertices of a unit square in the z = 0 plane, as two triangles
+SQUARE = numpy.array([
+    (0, 0, 0), (1, 0, 0), (1, 1, 0),
+    (0, 0, 0), (1, 1, 0), (0, 1, 0)], dtype=float)
+
+
+def squares(corners):
+    """squares(corners) -> positions, normals, occlusion
+
+    The per-vertex arrays of unit squares with the given minimal corners.
+    The normals and occlusion hold the square's number, to follow them.
+    """
+
+    corners = numpy.asarray(corners, dtype=float)
+    numbers = numpy.arange(len(corners), dtype=float).repeat(len(SQUARE))
+
+    positions = (corners[:, None, :] + SQUARE[None, :, :]).reshape((-1, 3))
+    normals = numbers[:, None].repeat(3, axis=1)
+
+    return positions, normals, numbers
+
+
+class ChunkMeshTest(unittest.TestCase):
+
+    def setUp(self):
+
+        self.corners = [(5, 0, 0), (0, 0, 0), (0, 3, 0), (6, 1, 0), (1, 0, 0)]
+        self.arrays = squares(self.corners)
+
+    def test_squares_grouped_by_chunk(self):
+
+        arrays, offsets = mesh.chunk_mesh(4, self.arrays)
+        positions, normals, occlusion = arrays
+
+        self.assertEqual(positions.shape, (5, 2, 3, 3))
+        self.assertEqual(list(offsets), [0, 3, 5])
+
+        # Squares 1, 2 and 4 lie in the first chunk, 0 and 3 in the second
+        self.assertEqual(
+            sorted(normals[:3, 0, 0, 0]), [1, 2, 4])
+        self.assertEqual(
+            sorted(normals[3:, 0, 0, 0]), [0, 3])
+
+        # The arrays are reordered together
+        numpy.testing.assert_array_equal(
+            occlusion[..., 0], normals[..., 0])
+
+        for start, stop in zip(offsets[:-1], offsets[1:]):
+
+            chunks = numpy.floor(positions[start:stop].min(axis=(1, 2)) / 4)
+
+            self.assertTrue((chunks == chunks[0]).all())
+
+    def test_single_chunk(self):
+
+        arrays, offsets = mesh.chunk_mesh(None, self.arrays)
+
+        self.assertEqual(list(offsets), [0, 5])
+        numpy.testing.assert_array_equal(
+            arrays[0].reshape((-1, 3)), self.arrays[0])
+
+    def test_no_squares(self):
+
+        # Shaped like the arrays of a glass without any cubes
+        positions = numpy.zeros((0, 6, 2, 3, 3))
+
+        arrays, offsets = mesh.chunk_mesh(
+            4, [positions, positions, positions[..., 0]])
+
+        self.assertEqual(list(offsets), [0])
+        self.assertEqual(
+            [array.shape for array in arrays],
+            [(0, 2, 3, 3), (0, 2, 3, 3), (0, 2, 3, 1)])
+
+    def test_save_and_load(self):
+
+        directory = tempfile.mkdtemp()
+
+        try:
+
+            arrays, offsets = mesh.chunk_mesh(4, self.arrays)
+            mesh.save_mesh(directory, mesh.MESH_ARRAYS, arrays, offsets)
+
+            names, loaded, loaded_offsets = mesh.load_mesh(directory)
+
+            self.assertEqual(names, mesh.MESH_ARRAYS)
+            numpy.testing.assert_array_equal(loaded_offsets, offsets)
+
+            for array, loaded_array in zip(arrays, loaded):
+
+                self.assertIsInstance(loaded_array, numpy.memmap)
+                self.assertEqual(loaded_array.dtype, numpy.float32)
+                numpy.testing.assert_array_equal(loaded_array, array)
+
+            del loaded
+
+        finally:
+
+            shutil.rmtree(directory)
+
+
+class ShardFramesTest(unittest.TestCase):
+
+    def test_consecutive_nearly_equal_ranges(self):
+
+        shards = shard_frames(10, 3)
+
+        self.assertEqual(len(shards), 3)
+        self.assertEqual(shards[0][0], 0)
+        self.assertEqual(shards[-1][1], 10)
+
+        for (__, stop), (start, __) in zip(shards[:-1], shards[1:]):
+            self.assertEqual(stop, start)
+
+        lengths = [stop - start for start, stop in shards]
+        self.assertLessEqual(max(lengths) - min(lengths), 1)
+
+    def test_more_workers_than_frames(self):
+
+        self.assertEqual(shard_frames(2, 5), [(0, 1), (1, 2)])
+
+    def test_no_frames(self):
+
+        self.assertEqual(shard_frames(0, 4), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+
+import math
+import unittest
+
+import numpy
+
+from silica.viz.common import quaternion
+from silica.viz.common import transform
+from silica.viz.common.vector import Vector, E_X, E_Y, E_Z
+
+
+AXES = [Vector(1, 2, 3), Vector(-1, 0, 0.5), Vector(0, 0, 2), E_Y]
+ANGLES = [0.3, -2.5, math.pi, 1e-4]
+
+
+def as_array(v):
+
+    return numpy.array([v.x, v.y, v.z])
+
+
+class QuaternionTest(unittest.TestCase):
+
+    def assertVectorsEqual(self, a, b):
+
+        numpy.testing.assert_allclose(as_array(a), as_array(b), atol=1e-12)
+
+    def test_rotation_matches_the_vector_rotation(self):
+
+        v = Vector(0.5, -1, 2)
+
+        for axis in AXES:
+            for angle in ANGLES:
+
+                self.assertVectorsEqual(
+                    quaternion.from_axis_angle(axis, angle).rotate(v),
+                    v.rotate(axis, angle))
+
+    def test_rotation_to_the_right(self):
+
+        q = quaternion.from_axis_angle(E_Z, math.pi / 2)
+
+        self.assertVectorsEqual(q.rotate(E_X), E_Y)
+
+    def test_matrix_matches_the_rotation(self):
+
+        v = Vector(0.5, -1, 2)
+        matrix = numpy.eye(4)
+
+        for axis in AXES:
+            for angle in ANGLES:
+
+                q = quaternion.from_axis_angle(axis, angle)
+                q.write_matrix(matrix)
+
+                numpy.testing.assert_allclose(
+                    matrix[:3, :3].dot(as_array(v)), as_array(q.rotate(v)),
+                    atol=1e-12)
+
+        # Only the upper left corner is written
+        numpy.testing.assert_array_equal(matrix[3], [0, 0, 0, 1])
+        numpy.testing.assert_array_equal(matrix[:3, 3], [0, 0, 0])
+
+    def test_product_composes_rotations(self):
+
+        p = quaternion.from_axis_angle(AXES[0], 0.7)
+        q = quaternion.from_axis_angle(AXES[1], -1.2)
+        v = Vector(3, 1, -2)
+
+        self.assertVectorsEqual((p * q).rotate(v), p.rotate(q.rotate(v)))
+        self.assertVectorsEqual((q * q.conjugate()).rotate(v), v)
+
+    def test_unit(self):
+
+        q = quaternion.Quaternion(1, 2, 3, 4)
+
+        self.assertAlmostEqual(abs(q.unit()), 1)
+
+    def test_from_basis_round_trip(self):
+
+        matrix = numpy.eye(4)
+
+        for axis in AXES:
+            for angle in ANGLES + [math.pi - 1e-3]:
+
+                q = quaternion.from_axis_angle(axis, angle)
+                basis = [q.rotate(e) for e in (E_X, E_Y, E_Z)]
+
+                quaternion.from_basis(*basis).write_matrix(matrix)
+
+                # The base vectors are the rows of the matrix
+                numpy.testing.assert_allclose(
+                    matrix[:3, :3], [as_array(e) for e in basis], atol=1e-12)
+
+    def test_from_basis_evens_out_deviations(self):
+
+        q = quaternion.from_basis(
+            Vector(1, 1e-6, 0), Vector(0, 1, 0), Vector(0, 0, 1.00001))
+
+        self.assertAlmostEqual(abs(q), 1)
+
+
+class ChangeBasisTest(unittest.TestCase):
+
+    def setUp(self):
+
+        self.basis = [E_Z, E_X, E_Y]
+        self.change = transform.ChangeBasis(*self.basis)
+
+    def assertBasis(self, basis):
+
+        numpy.testing.assert_allclose(
+            [as_array(e) for e in self.change.basis()],
+            [as_array(e) for e in basis], atol=1e-12)
+
+        numpy.testing.assert_allclose(
+            self.change.matrix()[:3, :3],
+            [as_array(e) for e in basis], atol=1e-12)
+
+    def test_basis(self):
+
+        self.assertBasis(self.basis)
+
+    def test_rotate(self):
+
+        axis = Vector(1, -1, 2)
+
+        self.change.rotate(axis, 0.4)
+        self.change.rotate(E_X, -1.3)
+
+        self.assertBasis([
+            e.rotate(axis, 0.4).rotate(E_X, -1.3) for e in self.basis])
+
+    def test_input_vector_inverts_the_matrix(self):
+
+        self.change.rotate(Vector(2, 1, 0), 0.8)
+
+        v = Vector(0.5, 2, -1)
+
+        numpy.testing.assert_allclose(
+            as_array(self.change.input_vector(v)),
+            numpy.linalg.inv(self.change.matrix()[:3, :3]).dot(as_array(v)),
+            atol=1e-12)
+
+    def test_stays_a_rotation(self):
+
+        for turn in range(1000):
+            self.change.rotate(Vector(1, 2, 3), 0.1)
+
+        rotation = self.change.matrix()[:3, :3]
+
+        numpy.testing.assert_allclose(
+            rotation.dot(rotation.T), numpy.eye(3), atol=1e-12)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy
+
+from silica.viz.glass import trajectory
+
+
+class TrajectoryTest(unittest.TestCase):
+
+    def setUp(self):
+
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, 'particles.traj')
+
+    def tearDown(self):
+
+        shutil.rmtree(self.directory)
+
+    def write(self, frames, particle_count, dtype=numpy.float32):
+
+        with trajectory.TrajectoryWriter(
+                self.filename, particle_count, dtype) as writer:
+
+            for states in frames:
+                writer.write_frame(states)
+
+    def test_round_trip(self):
+
+        frames = numpy.random.RandomState(0).rand(4, 3, 6)
+
+        self.write(frames, 3, numpy.float64)
+
+        self.assertTrue(trajectory.is_trajectory(self.filename))
+
+        read = trajectory.open_trajectory(self.filename)
+
+        self.assertEqual(read.shape, (4, 6, 3))
+        self.assertEqual(read.dtype, numpy.float64)
+        numpy.testing.assert_array_equal(read.transpose((0, 2, 1)), frames)
+
+    def test_single_precision(self):
+
+        frames = numpy.random.RandomState(1).rand(2, 5, 6)
+
+        self.write(frames, 5)
+
+        read = trajectory.open_trajectory(self.filename)
+
+        self.assertEqual(read.dtype, numpy.float32)
+        numpy.testing.assert_allclose(
+            read.transpose((0, 2, 1)), frames, rtol=1e-6)
+
+    def test_no_frames(self):
+
+        self.write([], 7)
+
+        self.assertEqual(
+            trajectory.open_trajectory(self.filename).shape, (0, 6, 7))
+
+    def test_not_a_trajectory(self):
+
+        with open(self.filename, 'wb') as output_file:
+            output_file.write(b'3\n' + b'0 ' * 100)
+
+        self.assertFalse(trajectory.is_trajectory(self.filename))
+        self.assertRaises(
+            ValueError, trajectory.open_trajectory, self.filename)
+
+    def test_convert_text(self):
+
+        frames = numpy.random.RandomState(2).rand(3, 2, 6)
+        text_name = os.path.join(self.directory, 'particles.txt')
+
+        with open(text_name, 'wb') as text_file:
+
+            text_file.write(b'2\n')
+
+            for states in frames:
+                for state in states:
+                    text_file.write(
+                        b' '.join(repr(value).encode('ascii')
+                                  for value in state) + b'\n')
+
+            # An unfinished frame is left out
+            text_file.write(b'1 2 3 4 5 6\n')
+
+        self.assertEqual(
+            trajectory.convert_text(text_name, self.filename, numpy.float64),
+            3)
+
+        numpy.testing.assert_array_equal(
+            trajectory.open_trajectory(self.filename).transpose((0, 2, 1)),
+            frames)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+
+import numpy
+
+from silica.viz.common import transform
+from silica.viz.common.constants import X_AXIS, Z_AXIS
+
+
+class CountingScale(transform.Scale):
+
+    """A scale counting how many times it got calculated."""
+
+    def __init__(self, scale):
+
+        super(CountingScale, self).__init__(scale)
+        self.calculated = 0
+
+    def calculate(self):
+
+        self.calculated += 1
+        super(CountingScale, self).calculate()
+
+
+class GenerationTest(unittest.TestCase):
+
+    def test_changes_with_the_dependencies(self):
+
+        scale = transform.Scale(2)
+        shift = transform.Translate(1, 2, 3)
+        product = scale * shift
+
+        generation = product.generation()
+        self.assertEqual(product.generation(), generation)
+
+        shift.set_r(0, 0, 0)
+        self.assertNotEqual(product.generation(), generation)
+
+        generation = product.generation()
+        transform.Translate(0, 0, 0).set_r(1, 1, 1)
+        self.assertEqual(product.generation(), generation)
+
+    def test_recalculated_only_after_changes(self):
+
+        scale = CountingScale(2)
+        product = transform.Translate(1, 0, 0) * scale
+
+        product.matrix()
+        product.matrix()
+        product.gl_matrix()
+
+        self.assertEqual(scale.calculated, 1)
+
+        scale.set_scale(3)
+        product.matrix()
+
+        self.assertEqual(scale.calculated, 2)
+
+    def test_gl_matrix_refreshed_in_place(self):
+
+        scale = transform.Scale(2)
+
+        gl_matrix = scale.gl_matrix()
+        self.assertEqual(gl_matrix[0], 2)
+
+        scale.set_scale(5)
+
+        self.assertIs(scale.gl_matrix(), gl_matrix)
+        self.assertEqual(gl_matrix[0], 5)
+        self.assertEqual(len(gl_matrix), 16)
+
+
+class ProductTest(unittest.TestCase):
+
+    def setUp(self):
+
+        self.factors = [
+            transform.BasicAxisRotation(0.3, X_AXIS),
+            transform.Translate(1, -2, 3),
+            transform.Scale(1.5),
+            transform.BasicAxisRotation(-1.1, Z_AXIS),
+            transform.FlipHandedness(Z_AXIS)]
+
+        self.product = transform.Product()
+
+        for factor in self.factors:
+            self.product.add_factor(factor)
+
+    def expected(self):
+
+        matrix = numpy.eye(4)
+
+        for factor in self.factors:
+            matrix = matrix.dot(factor.matrix())
+
+        return matrix
+
+    def test_empty_product_is_identity(self):
+
+        numpy.testing.assert_array_equal(
+            transform.Product().matrix(), numpy.eye(4))
+
+    def test_matches_the_factors(self):
+
+        numpy.testing.assert_allclose(self.product.matrix(), self.expected())
+
+    def test_follows_changed_factors(self):
+
+        self.product.matrix()
+
+        for changes in range(3):
+
+            self.factors[1].set_r(changes, 0, -changes)
+            numpy.testing.assert_allclose(
+                self.product.matrix(), self.expected())
+
+            self.factors[3].set_angle(changes)
+            numpy.testing.assert_allclose(
+                self.product.matrix(), self.expected())
+
+            self.factors[0].set_angle(-changes)
+            self.factors[2].set_scale(changes + 1)
+            numpy.testing.assert_allclose(
+                self.product.matrix(), self.expected())
+
+    def test_nested_products(self):
+
+        outer = transform.Product()
+        outer.add_factor(transform.Scale(2))
+        outer.add_factor(self.product)
+
+        self.factors[2].set_scale(4)
+
+        numpy.testing.assert_allclose(
+            outer.matrix(), numpy.diag([2, 2, 2, 1]).dot(self.expected()))
+
+
+if __name__ == '__main__':
+    unittest.main()